@@ -3,8 +3,9 @@ import database as db
 from PIL import Image
 import base64
 from io import BytesIO
-import reminder_service
 import user_database as udb
+import db_connections
+import entity_cache
 
 st.set_page_config(
     page_title="KinderCare - Child Health & Vaccination",
@@ -37,11 +38,14 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Each script run has its own thread; release connections of finished runs
+db_connections.close_dead_thread_connections()
+# Reads within this run share one identity map (see entity_cache)
+entity_cache.begin_request()
+
 db.init_database()
 
-# Check and send reminders for logged-in users
-if st.session_state.get('logged_in') and st.session_state.get('user_id'):
-    reminder_service.check_and_send_reminders()
+# Reminder emails are sent by the standalone scheduler process (python -m scheduler)
 
 if 'current_page' not in st.session_state:
     st.session_state.current_page = "Home"
@@ -0,0 +1,105 @@
+"""Benchmark of cohort schedule generation against the per-child path.
+
+For a seeded cohort of dates of birth, compares:
+
+    per-child   generate_vaccination_schedule for each child + add_vaccination_schedules
+    cohort      generate_cohort_schedules (NumPy datetime64) + add_cohort_schedules
+
+and reports generation and insert wall time for each, checking that both
+paths produce the same (child, vaccine, due date) rows.
+
+    python benchmarks/cohort_schedule.py                    # 10k children
+    python benchmarks/cohort_schedule.py --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    value = func(*args)
+    return value, round(time.perf_counter() - started, 3)
+
+
+def run_size(children: int, guideline: str, seed: int, workdir: str) -> dict:
+    import database as db
+    import db_connections
+    from vaccination_guidelines import generate_vaccination_schedule, generate_cohort_schedules
+
+    db_connections.close_all()
+    size_dir = os.path.join(workdir, str(children))
+    os.makedirs(size_dir, exist_ok=True)
+    db.DATABASE_PATH = os.path.join(size_dir, "vaccination_health.db")
+    if os.path.exists(db.DATABASE_PATH):
+        os.remove(db.DATABASE_PATH)
+    db.init_database()
+
+    rng = random.Random(seed)
+    today = date.today()
+    dobs = [today - timedelta(days=rng.randrange(0, 6 * 365)) for _ in range(children)]
+    per_child_ids = list(range(1, children + 1))
+    cohort_ids = list(range(children + 1, 2 * children + 1))
+
+    schedules, per_child_generate = timed(
+        lambda: {child_id: generate_vaccination_schedule(dob, guideline)
+                 for child_id, dob in zip(per_child_ids, dobs)}
+    )
+    _, per_child_insert = timed(db.add_vaccination_schedules, schedules)
+    cohort, cohort_generate = timed(generate_cohort_schedules, dobs, guideline)
+    _, cohort_insert = timed(db.add_cohort_schedules, cohort_ids, cohort)
+
+    conn = db.get_connection()
+    mismatches = conn.execute("""
+        SELECT COUNT(*) FROM vaccinations a
+        LEFT JOIN vaccinations b ON b.child_id = a.child_id + ? AND b.vaccine_code = a.vaccine_code
+                                AND b.due_date = a.due_date
+        WHERE a.child_id <= ? AND b.id IS NULL
+    """, (children, children)).fetchone()[0]
+    if mismatches:
+        raise RuntimeError(f"{mismatches} per-child rows missing from the cohort insert")
+
+    return {
+        "doses": len(cohort["due_date"]),
+        "per_child": {"generate_seconds": per_child_generate, "insert_seconds": per_child_insert},
+        "cohort": {"generate_seconds": cohort_generate, "insert_seconds": cohort_insert},
+        "generate_speedup": round(per_child_generate / max(cohort_generate, 1e-6), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cohort schedule generation benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000],
+                        help="Numbers of children to benchmark (default: 10000)")
+    parser.add_argument("--guideline", default="India (UIP)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None,
+                        help="Directory for the generated database (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="kindercare-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # The app modules create their databases and read data/ relative to the
+    # working directory, so import them from inside the scratch directory.
+    if not os.path.exists(os.path.join(workdir, "data")):
+        os.symlink(os.path.join(REPO_ROOT, "data"), os.path.join(workdir, "data"))
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    for children in args.sizes:
+        result = run_size(children, args.guideline, args.seed, workdir)
+        for path in ("per_child", "cohort"):
+            print(f"{children:>9} children  {path:<9} doses={result['doses']}  " +
+                  "  ".join(f"{key}={value}" for key, value in result[path].items()))
+        print(f"{children:>9} children  generation speed-up x{result['generate_speedup']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
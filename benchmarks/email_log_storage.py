@@ -0,0 +1,141 @@
+"""Benchmark of the email log storage: rendered HTML vs template references.
+
+Logs a seeded year of synthetic emails (reminder digests and health
+updates from email_templates, plus a share of free-form mail) into fresh
+user databases in three ways and reports the file size, the time of an
+online backup (sqlite3 backup API) and the time to list one account's
+emails with their content:
+
+- rendered: the full HTML in emails.content, as logged before template
+  references;
+- templated: user_database.log_email (template id and parameters, or a
+  zlib-compressed body);
+- archived: templated, then email_archive.archive_emails keeping 90 days.
+
+    python benchmarks/email_log_storage.py                  # 100k emails
+    python benchmarks/email_log_storage.py --sizes 100000 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYOUTS = ("rendered", "templated", "archived")
+ACCOUNTS = 500
+FREE_FORM_SHARE = 0.1
+VACCINES = ["BCG", "OPV 1", "DTP 1", "Hepatitis B 2", "Measles 1", "MMR 2", "Rotavirus 3", "PCV Booster"]
+
+
+def make_emails(rows: int, seed: int):
+    """(user_id, template, params) tuples; template None means free-form content in params."""
+    import email_templates
+    rng = random.Random(seed)
+    for number in range(rows):
+        user_id = 1 + number % ACCOUNTS
+        children = [f"Child {user_id}-{index}" for index in range(rng.randint(1, 3))]
+        if rng.random() < FREE_FORM_SHARE:
+            content = "<html><body>" + "".join(
+                f"<p>Note {index} for {children[0]}: {rng.random():.6f}</p>" for index in range(20)
+            ) + "</body></html>"
+            yield user_id, None, {"subject": f"Message for {children[0]}", "content": content}
+        elif rng.random() < 0.2:
+            yield user_id, email_templates.HEALTH_UPDATE, {
+                "child_name": children[0], "event_type": "illness",
+                "event_title": rng.choice(["Fever", "Cough", "Ear infection"]), "event_date": "2025-03-01",
+            }
+        else:
+            reminders = [{"child_name": child, "vaccine_name": rng.choice(VACCINES),
+                          "due_date": f"March {rng.randint(1, 28):02d}, 2025"}
+                         for child in children for _ in range(rng.randint(1, 2))]
+            yield user_id, email_templates.VACCINATION_DIGEST, email_templates.digest_params(reminders)
+
+
+def fill(layout: str, rows: int, seed: int):
+    import email_templates
+    import user_database as udb
+    conn = udb.get_user_connection()
+    for user_id, template, params in make_emails(rows, seed):
+        if template:
+            subject, content = email_templates.render(template, params)
+        else:
+            subject, content = params["subject"], params["content"]
+        if layout == "rendered":
+            conn.execute("""
+                INSERT INTO emails (user_id, child_id, recipient_email, subject, content, status)
+                VALUES (?, ?, ?, ?, ?, 'sent')
+            """, (user_id, user_id, f"parent{user_id}@example.com", subject, content))
+            conn.commit()
+        else:
+            udb.log_email(user_id, user_id, f"parent{user_id}@example.com", subject, content,
+                          template=template, params=params)
+    # Spread the emails over the last year
+    conn.execute("UPDATE emails SET sent_at = datetime('now', printf('-%f days', 365.0 * (? - id) / ?))",
+                 (rows, rows))
+    conn.commit()
+
+
+def run_layout(layout: str, rows: int, seed: int, workdir: str) -> dict:
+    import db_connections
+    import email_archive
+    import user_database as udb
+
+    db_connections.close_all()
+    layout_dir = os.path.join(workdir, f"{rows}-{layout}")
+    shutil.rmtree(layout_dir, ignore_errors=True)
+    os.makedirs(layout_dir)
+    udb.USER_DATABASE_PATH = os.path.join(layout_dir, "user_database.db")
+    udb.init_user_database()
+
+    started = time.perf_counter()
+    fill(layout, rows, seed)
+    result = {"log_seconds": round(time.perf_counter() - started, 2)}
+    if layout == "archived":
+        summary = email_archive.archive_emails(90, os.path.join(layout_dir, "archive"))
+        result["archived"] = summary["archived"]
+        result["archive_mb"] = round(os.path.getsize(summary["archive"]) / 2 ** 20, 2)
+    udb.reclaim_free_pages()
+
+    result["db_mb"] = round(os.path.getsize(udb.USER_DATABASE_PATH) / 2 ** 20, 2)
+    backup_path = os.path.join(layout_dir, "backup.db")
+    started = time.perf_counter()
+    with sqlite3.connect(backup_path) as backup:
+        udb.get_user_connection().backup(backup)
+    backup.close()
+    result["backup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    emails = udb.get_sent_emails(user_id=1)
+    result["list_account_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    result["account_emails"] = len(emails)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Email log storage benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000],
+                        help="Numbers of logged emails to benchmark (default: 100000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None,
+                        help="Directory for the generated databases (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="kindercare-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # The app modules create their databases relative to the working directory
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    for rows in args.sizes:
+        for layout in LAYOUTS:
+            result = run_layout(layout, rows, args.seed, workdir)
+            print(f"{rows:>9} emails  {layout:<9}  " + "  ".join(f"{key}={value}" for key, value in result.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Benchmark of database.search_health_events (FTS5 with bm25 ranking).
+
+Fills a fresh vaccination_health.db with a seeded synthetic history (clinical
+terms drawn from a Zipf-like vocabulary, a few hundred events per child),
+then times searches scoped to one child for common, rare, prefix and phrase
+queries, reporting the median and 95th percentile in milliseconds next to
+the old way of finding an event: loading all of the child's events.
+
+    python benchmarks/health_event_search.py                   # 100k events
+    python benchmarks/health_event_search.py --sizes 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS_PER_CHILD = 300
+CLINICAL_TERMS = (
+    "fever cough rash vomiting diarrhea earache headache wheezing allergy sneezing fatigue "
+    "conjunctivitis bronchiolitis croup eczema otitis tonsillitis pneumonia dehydration "
+    "constipation teething colic jaundice thrush impetigo chickenpox measles mumps rubella "
+    "asthma nebulizer antibiotic paracetamol ibuprofen amoxicillin saline inhaler"
+).split()
+QUERIES = ("fever", "cough fever", "measles", "bronch*", '"runny nose"', "amoxicillin otitis")
+
+
+def make_vocabulary(rng: random.Random, size: int):
+    syllables = ["ka", "lo", "mi", "ne", "ra", "tu", "si", "po", "de", "va", "chi", "bro", "ter", "lin"]
+    words = list(CLINICAL_TERMS) + ["runny", "nose"]
+    while len(words) < size:
+        words.append("".join(rng.choices(syllables, k=rng.randint(2, 4))))
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+def fill(rows: int, seed: int):
+    import database as db
+    rng = random.Random(seed)
+    words, weights = make_vocabulary(rng, 5000)
+    start = date(2010, 1, 1)
+    conn = db.get_connection()
+    batch = []
+    for number in range(rows):
+        text = rng.choices(words, weights, k=40)
+        if rng.random() < 0.02:
+            text[5:5] = ["runny", "nose"]
+        batch.append((
+            1 + number // EVENTS_PER_CHILD,
+            rng.choice(["illness", "symptom", "doctor_visit"]),
+            (start + timedelta(days=rng.randrange(15 * 365))).isoformat(),
+            " ".join(text[:3]).capitalize(),
+            " ".join(text[3:25]),
+            ", ".join(text[25:30]),
+            " ".join(text[30:36]),
+            f"Dr. {text[36].capitalize()}",
+            f"{text[37].capitalize()} Clinic",
+        ))
+        if len(batch) == 10000:
+            _insert(conn, batch)
+            batch = []
+    if batch:
+        _insert(conn, batch)
+
+
+def _insert(conn, batch):
+    conn.executemany("""
+        INSERT INTO health_events (child_id, event_type, event_date, title, description,
+                                   symptoms, treatment, doctor_name, hospital_clinic)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, batch)
+    conn.commit()
+
+
+def run_size(rows: int, seed: int, workdir: str, repeat: int) -> dict:
+    import database as db
+    import db_connections
+    import entity_cache
+
+    db_connections.close_all()
+    size_dir = os.path.join(workdir, str(rows))
+    os.makedirs(size_dir, exist_ok=True)
+    db.DATABASE_PATH = os.path.join(size_dir, "vaccination_health.db")
+    if os.path.exists(db.DATABASE_PATH):
+        os.remove(db.DATABASE_PATH)
+    db.init_database()
+
+    started = time.perf_counter()
+    fill(rows, seed)
+    results = {"insert_rows_per_second": round(rows / (time.perf_counter() - started))}
+
+    rng = random.Random(seed)
+    children = max(1, rows // EVENTS_PER_CHILD)
+    timings = {"load all events": []}
+    for _ in range(repeat):
+        child_id = rng.randint(1, children)
+        entity_cache.invalidate("health_events", child_id)
+        started = time.perf_counter()
+        db.get_health_events(child_id)
+        timings["load all events"].append(time.perf_counter() - started)
+        for query in QUERIES:
+            started = time.perf_counter()
+            db.search_health_events(child_id, query)
+            timings.setdefault(query, []).append(time.perf_counter() - started)
+    for name, values in timings.items():
+        values.sort()
+        results[name] = (f"median {statistics.median(values) * 1000:.2f} ms, "
+                         f"p95 {values[int(len(values) * 0.95)] * 1000:.2f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Health event search benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000],
+                        help="Numbers of health events to benchmark (default: 100000)")
+    parser.add_argument("--repeat", type=int, default=50, help="Searches per query (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None,
+                        help="Directory for the generated databases (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="kindercare-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # The app modules create their databases relative to the working directory
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    for rows in args.sizes:
+        print(f"{rows} health events")
+        for name, value in run_size(rows, args.seed, workdir, args.repeat).items():
+            print(f"  {name:<22} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
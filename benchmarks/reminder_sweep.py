@@ -0,0 +1,240 @@
+"""Scale benchmark for reminder_service.check_and_send_reminders.
+
+Builds a seeded synthetic population in throwaway copies of user_database.db
+and vaccination_health.db, runs the reminder sweep and drains the email
+outbox through a stub transport, and reports per stage:
+
+    wall time, SQL statements executed, connections opened, peak RSS
+
+    python benchmarks/reminder_sweep.py                         # 10k children
+    python benchmarks/reminder_sweep.py --sizes 10000 100000 1000000
+    python benchmarks/reminder_sweep.py --update-baseline       # store new baseline
+
+The run fails (exit code 1) when the sweep or drain stage regresses against
+benchmarks/reminder_sweep_baseline.json by more than --tolerance. Wall-time
+baselines are machine specific; regenerate them on the machine that runs
+the comparison.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "reminder_sweep_baseline.json")
+GATED_STAGES = ("sweep", "drain")
+GATED_METRICS = ("wall_seconds", "queries", "connections")
+
+
+class SQLiteCounter:
+    """Counts connections opened and statements executed through sqlite3.connect."""
+
+    def __init__(self):
+        self.connections = 0
+        self.queries = 0
+        self._connect = sqlite3.connect
+
+    def install(self):
+        def connect(*args, **kwargs):
+            conn = self._connect(*args, **kwargs)
+            self.connections += 1
+            conn.set_trace_callback(self._count)
+            return conn
+        sqlite3.connect = connect
+
+    def _count(self, statement):
+        self.queries += 1
+
+    def snapshot(self):
+        return self.connections, self.queries
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(counter, stage, results, func, *args):
+    connections, queries = counter.snapshot()
+    started = time.perf_counter()
+    value = func(*args)
+    results[stage] = {
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "queries": counter.queries - queries,
+        "connections": counter.connections - connections,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    return value
+
+
+def generate_population(children: int, seed: int):
+    """Seeded users, children, schedules and reminder settings, bulk inserted."""
+    import database as db
+    import user_database as udb
+    from vaccination_guidelines import generate_vaccination_schedule
+
+    rng = random.Random(seed)
+    today = date.today()
+    guidelines = ["India (UIP)", "WHO"]
+
+    user_conn = udb.get_user_connection()
+    vacc_conn = db.get_connection()
+    users, profiles, vaccinations, settings = [], [], [], []
+    child_id = 0
+    user_id = 0
+
+    while child_id < children:
+        user_id += 1
+        users.append((user_id, f"Parent {user_id}", f"parent{user_id}@example.com", "secret"))
+        for _ in range(min(rng.choice((1, 1, 2, 2, 3)), children - child_id)):
+            child_id += 1
+            dob = today - timedelta(days=rng.randrange(0, 6 * 365))
+            guideline = rng.choice(guidelines)
+            profiles.append((child_id, user_id, f"Child {child_id}", dob.isoformat(), guideline))
+            for vacc in generate_vaccination_schedule(dob, guideline):
+                due = vacc['due_date']
+                completed = due < today and rng.random() < 0.8
+                vaccinations.append((
+                    child_id, vacc['vaccine_name'], vacc['vaccine_code'], due.isoformat(),
+                    'completed' if completed else 'pending',
+                    due.isoformat() if completed else None,
+                ))
+            if rng.random() < 0.7:
+                settings.append((child_id, 1, f"parent{user_id}@example.com",
+                                 int(rng.random() < 0.9), int(rng.random() < 0.9), int(rng.random() < 0.9)))
+
+        if len(vaccinations) >= 200_000 or child_id >= children:
+            user_conn.executemany("INSERT INTO users (id, name, email, password) VALUES (?, ?, ?, ?)", users)
+            user_conn.executemany("""
+                INSERT INTO child_profiles (id, user_id, name, date_of_birth, country_guideline)
+                VALUES (?, ?, ?, ?, ?)
+            """, profiles)
+            vacc_conn.executemany("""
+                INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date, status, administered_date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, vaccinations)
+            vacc_conn.executemany("""
+                INSERT INTO reminder_settings (child_id, email_enabled, email_address,
+                                               reminder_7_days, reminder_1_day, reminder_on_day)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, settings)
+            user_conn.commit()
+            vacc_conn.commit()
+            users, profiles, vaccinations, settings = [], [], [], []
+
+
+def run_size(children: int, seed: int, workdir: str, counter: SQLiteCounter) -> dict:
+    import database as db
+    import db_connections
+    import user_database as udb
+    import email_outbox
+    import reminder_service
+
+    # Connections are cached per path; start each size on fresh files
+    db_connections.close_all()
+    size_dir = os.path.join(workdir, str(children))
+    os.makedirs(size_dir, exist_ok=True)
+    db.DATABASE_PATH = os.path.join(size_dir, "vaccination_health.db")
+    udb.USER_DATABASE_PATH = os.path.join(size_dir, "user_database.db")
+    udb.init_user_database()
+    db.init_database()
+
+    delivered = []
+    results = {}
+    measure(counter, "generate", results, generate_population, children, seed)
+    summary = measure(counter, "sweep", results, reminder_service.check_and_send_reminders)
+    drained = measure(counter, "drain", results, email_outbox.drain_all,
+                      lambda recipient, subject, content: delivered.append(recipient))
+    results["sweep"]["reminders"] = summary.get("queued", 0)
+    results["sweep"]["emails"] = summary.get("emails", 0)
+    results["drain"]["emails"] = drained["sent"]
+    if summary.get("error"):
+        raise RuntimeError(f"Sweep failed: {summary['error']}")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for size, stages in results.items():
+        for stage in GATED_STAGES:
+            expected = baseline.get(size, {}).get(stage)
+            if not expected:
+                continue
+            for metric in GATED_METRICS:
+                limit = expected[metric] * (1 + tolerance)
+                if metric == "wall_seconds":
+                    # Ignore noise on very short stages
+                    limit = max(limit, expected[metric] + 0.05)
+                if stages[stage][metric] > limit:
+                    regressions.append(
+                        f"{size} children, {stage}: {metric} {stages[stage][metric]} > baseline {expected[metric]}"
+                    )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reminder sweep scale benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000],
+                        help="Numbers of children to benchmark (default: 10000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None,
+                        help="Directory for the generated databases (default: a temp dir)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative regression before failing (default: 0.25)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write this run's sweep/drain numbers as the new baseline")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="kindercare-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # The app modules create their databases and read data/ relative to the
+    # working directory, so import them from inside the scratch directory.
+    if not os.path.exists(os.path.join(workdir, "data")):
+        os.symlink(os.path.join(REPO_ROOT, "data"), os.path.join(workdir, "data"))
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    counter = SQLiteCounter()
+    counter.install()
+
+    results = {}
+    for children in args.sizes:
+        results[str(children)] = run_size(children, args.seed, workdir, counter)
+        for stage, metrics in results[str(children)].items():
+            print(f"{children:>9} children  {stage:<9} " +
+                  "  ".join(f"{key}={value}" for key, value in metrics.items()))
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        for size, stages in results.items():
+            baseline[size] = {stage: stages[stage] for stage in GATED_STAGES}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Benchmark of the streaming roster import.
+
+Writes a seeded synthetic roster (CSV or JSON Lines, about 1% invalid rows
+and a share of children with received vaccines) and imports it into fresh
+databases with roster_import.import_roster, reporting rows per second,
+rows written and peak RSS. Each child gets a whole schedule (about 27
+vaccination rows, each maintaining the vaccinations indexes and the
+summary and cache-generation triggers), so those inserts set the pace.
+
+    python benchmarks/roster_import.py                      # 10k rows
+    python benchmarks/roster_import.py --sizes 10000 100000 --format jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECEIVED = ["", "", "", "BCG", "BCG, OPV", "BCG, Hepatitis B, OPV"]
+
+
+def write_roster(path: str, rows: int, fmt: str, seed: int):
+    rng = random.Random(seed)
+    today = date.today()
+    fields = ["name", "date_of_birth", "country_guideline", "gender", "received_vaccines"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        for number in range(rows):
+            row = {
+                "name": f"Child {number}",
+                "date_of_birth": (today - timedelta(days=rng.randrange(0, 6 * 365))).isoformat(),
+                "country_guideline": rng.choice(["WHO", "India (UIP)"]),
+                "gender": rng.choice(["Male", "Female", ""]),
+                "received_vaccines": rng.choice(RECEIVED),
+            }
+            if rng.random() < 0.01:
+                row["date_of_birth"] = "not a date"
+            if writer:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(row) + "\n")
+
+
+def run_size(rows: int, fmt: str, seed: int, workdir: str) -> dict:
+    import database as db
+    import db_connections
+    import user_database as udb
+    import roster_import
+
+    db_connections.close_all()
+    size_dir = os.path.join(workdir, str(rows))
+    os.makedirs(size_dir, exist_ok=True)
+    db.DATABASE_PATH = os.path.join(size_dir, "vaccination_health.db")
+    udb.USER_DATABASE_PATH = os.path.join(size_dir, "user_database.db")
+    for path in (db.DATABASE_PATH, udb.USER_DATABASE_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+    udb.init_user_database()
+    db.init_database()
+
+    roster_path = os.path.join(size_dir, f"roster.{fmt}")
+    write_roster(roster_path, rows, fmt, seed)
+    started = time.perf_counter()
+    with open(roster_path, "rb") as stream:
+        progress = roster_import.import_roster(stream, 1, os.path.basename(roster_path), fmt,
+                                               os.path.getsize(roster_path))
+    seconds = time.perf_counter() - started
+    return {
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(rows / seconds),
+        "children": progress["children_created"],
+        "vaccinations": progress["vaccinations_created"],
+        "vaccinations_per_second": round(progress["vaccinations_created"] / seconds),
+        "invalid": progress["rows_invalid"],
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roster import benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000],
+                        help="Numbers of roster rows to benchmark (default: 10000)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None,
+                        help="Directory for the generated databases (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="kindercare-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # The app modules create their databases and read data/ relative to the
+    # working directory, so import them from inside the scratch directory.
+    if not os.path.exists(os.path.join(workdir, "data")):
+        os.symlink(os.path.join(REPO_ROOT, "data"), os.path.join(workdir, "data"))
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    for rows in args.sizes:
+        result = run_size(rows, args.format, args.seed, workdir)
+        print(f"{rows:>9} rows  " + "  ".join(f"{key}={value}" for key, value in result.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""Streaming export of children, vaccinations, health events and the email log.
+
+    python data_export.py --user-email clinic@example.com --format zip -o export.zip
+    python data_export.py --user-id 3 --format jsonl > export.jsonl
+    python data_export.py --all --format csv --dataset vaccinations -o vaccinations.csv
+
+Exports are generators of bytes chunks built on cursors that are iterated
+row by row, so memory stays the same whatever the size of the history and
+the first bytes are available as soon as the first rows are read:
+
+- jsonl: one JSON object per line with a "type" field (child, vaccination,
+  health_event, email);
+- csv: one dataset with a header row;
+- zip: a ZIP bundle with one CSV per dataset, written with data
+  descriptors so it never needs to seek back.
+
+An export covers one account (a family or a clinic that imported a roster)
+or, only when asked for with all_accounts=True, every account. All datasets are read inside one
+read transaction, so they come from one snapshot of each database file.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zipfile
+from contextlib import contextmanager
+from datetime import date
+from typing import BinaryIO, Dict, Iterator, Optional, Sequence
+import database as db
+import user_database as udb
+
+DATASETS = ("children", "vaccinations", "health_events", "emails")
+FORMATS = ("zip", "jsonl", "csv")
+# Type of each dataset's records in JSON Lines exports
+RECORD_TYPES = {"children": "child", "vaccinations": "vaccination",
+                "health_events": "health_event", "emails": "email"}
+MIME_TYPES = {"zip": "application/zip", "jsonl": "application/x-ndjson", "csv": "text/csv"}
+# Rows are encoded into chunks of about this many bytes
+CHUNK_BYTES = 64 * 1024
+
+_USER = db.USER_SCHEMA
+# dataset -> (query for one account, query for all accounts); each is served
+# by an index in its ORDER BY order, so SQLite never sorts the whole dataset
+_QUERIES = {
+    "children": (
+        f"SELECT * FROM {_USER}.child_profiles WHERE user_id = ? ORDER BY name, id",
+        f"SELECT * FROM {_USER}.child_profiles ORDER BY id",
+    ),
+    "vaccinations": (
+        f"""SELECT v.* FROM {_USER}.child_profiles c JOIN vaccinations v ON v.child_id = c.id
+            WHERE c.user_id = ? ORDER BY c.name, c.id, v.due_date""",
+        "SELECT * FROM vaccinations ORDER BY child_id, due_date",
+    ),
+    "health_events": (
+        f"""SELECT h.* FROM {_USER}.child_profiles c JOIN health_events h ON h.child_id = c.id
+            WHERE c.user_id = ? ORDER BY c.name, c.id, h.event_date""",
+        "SELECT * FROM health_events ORDER BY child_id, event_date",
+    ),
+    "emails": (
+        f"SELECT * FROM {_USER}.emails WHERE user_id = ? ORDER BY sent_at",
+        f"SELECT * FROM {_USER}.emails ORDER BY sent_at",
+    ),
+}
+
+
+@contextmanager
+def read_snapshot():
+    """Run the enclosed queries in one read transaction on a connection of their own.
+    
+    Exports are generators that can be paused between chunks for as long as
+    the client reads slowly, so the snapshot never uses the thread's shared
+    connection, whose other users would otherwise run inside it.
+    """
+    conn = db.open_read_only_unified_connection()
+    try:
+        conn.execute("BEGIN")
+        yield conn
+    finally:
+        conn.close()
+
+
+def _query(conn, dataset: str, user_id: Optional[int], all_accounts: bool = False):
+    for_user, for_all = _QUERIES[dataset]
+    if all_accounts:
+        if user_id is not None:
+            raise ValueError("Pass either user_id or all_accounts=True, not both")
+        return conn.execute(for_all)
+    if user_id is None:
+        # A missing id must never widen the export to every family's data
+        raise ValueError("An export needs a user_id, or all_accounts=True for every account")
+    return conn.execute(for_user, (user_id,))
+
+
+def _fields(cursor, dataset: str) -> Sequence[str]:
+    if dataset == "emails":
+        return udb.EMAIL_FIELDS
+    return [column[0] for column in cursor.description]
+
+
+def _records(cursor, dataset: str) -> Iterator[Dict]:
+    # The email log stores template references and compressed bodies; export the rendered content
+    convert = udb.logged_email if dataset == "emails" else dict
+    for row in cursor:
+        yield convert(row)
+
+
+def iter_records(conn, dataset: str, user_id: Optional[int] = None,
+                 all_accounts: bool = False) -> Iterator[Dict]:
+    """The rows of one dataset as dicts, fetched lazily."""
+    return _records(_query(conn, dataset, user_id, all_accounts), dataset)
+
+
+def chunked(pieces: Iterator[bytes]) -> Iterator[bytes]:
+    """Join small byte strings into chunks of about CHUNK_BYTES."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _csv_lines(conn, dataset: str, user_id: Optional[int], all_accounts: bool) -> Iterator[bytes]:
+    cursor = _query(conn, dataset, user_id, all_accounts)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(_fields(cursor, dataset))
+    for record in _records(cursor, dataset):
+        writer.writerow(record.values())
+        yield text.getvalue().encode("utf-8")
+        text.seek(0)
+        text.truncate()
+    yield text.getvalue().encode("utf-8")
+
+
+def iter_jsonl(user_id: Optional[int] = None, datasets: Sequence[str] = DATASETS,
+               all_accounts: bool = False) -> Iterator[bytes]:
+    """A JSON Lines export of `datasets`, one object per row."""
+    def lines(conn):
+        for dataset in datasets:
+            record_type = RECORD_TYPES[dataset]
+            for record in iter_records(conn, dataset, user_id, all_accounts):
+                yield (json.dumps({"type": record_type, **record}, default=str) + "\n").encode("utf-8")
+
+    with read_snapshot() as conn:
+        yield from chunked(lines(conn))
+
+
+def iter_csv(dataset: str, user_id: Optional[int] = None, all_accounts: bool = False) -> Iterator[bytes]:
+    """A CSV export of one dataset with a header row."""
+    with read_snapshot() as conn:
+        yield from chunked(_csv_lines(conn, dataset, user_id, all_accounts))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream whose written bytes are taken out with drain().
+
+    It has no tell(), so ZipFile writes entries for an unseekable stream.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(user_id: Optional[int] = None, datasets: Sequence[str] = DATASETS,
+             all_accounts: bool = False) -> Iterator[bytes]:
+    """A ZIP bundle with <dataset>.csv for each of `datasets`."""
+    sink = _ChunkSink()
+    with read_snapshot() as conn:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+            for dataset in datasets:
+                with bundle.open(f"{dataset}.csv", "w", force_zip64=True) as entry:
+                    for chunk in chunked(_csv_lines(conn, dataset, user_id, all_accounts)):
+                        entry.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+        yield sink.drain()
+
+
+def iter_export(fmt: str, user_id: Optional[int] = None, dataset: Optional[str] = None,
+                all_accounts: bool = False) -> Iterator[bytes]:
+    """The export in `fmt` of one account, or of every account with all_accounts=True.
+    
+    `dataset` selects the dataset of a CSV export (default vaccinations).
+    """
+    if fmt == "zip":
+        return iter_zip(user_id, all_accounts=all_accounts)
+    if fmt == "jsonl":
+        return iter_jsonl(user_id, [dataset] if dataset else DATASETS, all_accounts)
+    if fmt == "csv":
+        return iter_csv(dataset or "vaccinations", user_id, all_accounts)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_file_name(fmt: str, dataset: Optional[str] = None) -> str:
+    name = f"kindercare_{dataset}" if fmt == "csv" else "kindercare_export"
+    return f"{name}_{date.today().isoformat()}.{fmt}"
+
+
+def write_export(stream: BinaryIO, fmt: str, user_id: Optional[int] = None,
+                 dataset: Optional[str] = None, all_accounts: bool = False) -> int:
+    """Write an export to a binary stream chunk by chunk; returns the bytes written."""
+    written = 0
+    for chunk in iter_export(fmt, user_id, dataset, all_accounts):
+        stream.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export KinderCare data")
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument("--user-id", type=int, help="Account to export")
+    scope.add_argument("--user-email", help="Email of the account to export")
+    scope.add_argument("--all", action="store_true", help="Export every account")
+    parser.add_argument("--format", choices=FORMATS, default="zip")
+    parser.add_argument("--dataset", choices=DATASETS, default=None,
+                        help="Dataset of a CSV export (default: vaccinations), or the only dataset of a JSON Lines export")
+    parser.add_argument("-o", "--output", default=None, help="Output file (default: standard output)")
+    args = parser.parse_args(argv)
+
+    user_id = args.user_id
+    if args.user_email:
+        account = udb.get_user_by_email(args.user_email)
+        if not account:
+            print(f"No account with email {args.user_email}", file=sys.stderr)
+            return 1
+        user_id = account["id"]
+
+    if args.output:
+        with open(args.output, "wb") as stream:
+            written = write_export(stream, args.format, user_id, args.dataset, args.all)
+        print(f"Wrote {written} bytes to {args.output}")
+    else:
+        write_export(sys.stdout.buffer, args.format, user_id, args.dataset, args.all)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
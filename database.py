@@ -1,21 +1,52 @@
-import sqlite3
 import os
-from datetime import datetime, date
-from typing import Optional, List, Dict, Any
+import time
+from datetime import datetime, date, timedelta
+from typing import Optional, List, Dict, Any, Callable, Tuple
 import json
+import re
+import db_connections
+import email_templates
+import entity_cache
+import migrations
+from vaccination_records import UPCOMING_DAYS, SortedVaccinations, VaccinationRecord
 import user_database as udb
 
 DATABASE_PATH = "vaccination_health.db"
 
+# Schema name user_database.db is attached under on the unified connection
+USER_SCHEMA = "users_db"
+
+# How many days after the due date a missed on-due-date reminder is still sent
+REMINDER_CATCH_UP_DAYS = int(os.getenv("REMINDER_CATCH_UP_DAYS", 3))
+
+# (reminder_type, window start, window end in days before the due date, reminder_settings flag)
+# Windows do not overlap, so a sweep that missed a day still sends the reminder
+# for the window the vaccination is in now.
+REMINDER_TYPES = (
+    ("7_days_before", 7, 2, "reminder_7_days"),
+    ("1_day_before", 1, 1, "reminder_1_day"),
+    ("on_due_date", 0, -REMINDER_CATCH_UP_DAYS, "reminder_on_day"),
+)
+
 def get_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """The calling thread's shared connection; callers commit but never close it."""
+    return db_connections.get_connection(DATABASE_PATH)
 
-def init_database():
-    conn = get_connection()
-    cursor = conn.cursor()
+def get_unified_connection():
+    """Connection to vaccination_health.db with user_database.db attached as USER_SCHEMA.
     
+    Joins and cascades across both files run as single statements in one
+    transaction. In WAL mode SQLite commits each attached file atomically but
+    not both files together: a crash in the middle of a commit can leave one
+    file committed and the other rolled back.
+    """
+    return db_connections.get_connection(DATABASE_PATH, {USER_SCHEMA: udb.USER_DATABASE_PATH})
+
+def open_read_only_unified_connection():
+    """A new read-only connection laid out like get_unified_connection(); the caller closes it."""
+    return db_connections.open_read_only(DATABASE_PATH, {USER_SCHEMA: udb.USER_DATABASE_PATH})
+
+def _migration_base_schema(cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS vaccinations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -77,31 +108,695 @@ def init_database():
         )
     """)
     
-    conn.commit()
-    conn.close()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_state (
+            name TEXT PRIMARY KEY,
+            owner TEXT,
+            lease_expires_at REAL,
+            last_started_at TIMESTAMP,
+            last_finished_at TIMESTAMP,
+            last_status TEXT,
+            last_result TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _migration_reminder_sweep(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vaccinations_due_date ON vaccinations(due_date)")
+    cursor.execute("""
+        SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_sent_reminders_unique'
+    """)
+    if not cursor.fetchone():
+        # Older databases may hold duplicate reminders; keep the first of each
+        cursor.execute("""
+            DELETE FROM sent_reminders WHERE id NOT IN (
+                SELECT MIN(id) FROM sent_reminders
+                GROUP BY vaccination_id, reminder_type, channel
+            )
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_sent_reminders_vaccination")
+        cursor.execute("""
+            CREATE UNIQUE INDEX idx_sent_reminders_unique
+            ON sent_reminders(vaccination_id, reminder_type, channel)
+        """)
+
+def _migration_access_path_indexes(cursor):
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vaccinations_child_due
+        ON vaccinations(child_id, due_date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_health_events_child_date
+        ON health_events(child_id, event_date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reminder_settings_child
+        ON reminder_settings(child_id)
+    """)
+
+def _migration_timeline_indexes(cursor):
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vaccinations_child_administered
+        ON vaccinations(child_id, administered_date)
+        WHERE status = 'completed' AND administered_date IS NOT NULL
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_health_events_child_type_date
+        ON health_events(child_id, event_type, event_date)
+    """)
+
+# Recomputes one child's vaccination columns of vaccination_summary from its rows
+_SUMMARY_RECOMPUTE = """
+    UPDATE vaccination_summary SET
+        total = (SELECT COUNT(*) FROM vaccinations WHERE child_id = {child}),
+        completed = (SELECT COUNT(*) FROM vaccinations
+                     WHERE child_id = {child} AND status IS 'completed'),
+        next_due_date = (SELECT MIN(due_date) FROM vaccinations
+                         WHERE child_id = {child} AND status IS NOT 'completed'),
+        last_administered_date = (SELECT MAX(administered_date) FROM vaccinations
+                                  WHERE child_id = {child} AND status IS 'completed'
+                                    AND administered_date IS NOT NULL)
+    WHERE child_id = {child};
+"""
+
+def _migration_vaccination_summary(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vaccination_summary (
+            child_id INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            health_events INTEGER NOT NULL DEFAULT 0,
+            next_due_date DATE,
+            last_administered_date DATE
+        )
+    """)
+    # Open (not completed) doses by due date, for next-due and overdue/upcoming range counts
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vaccinations_child_open_due
+        ON vaccinations(child_id, due_date) WHERE status IS NOT 'completed'
+    """)
+    
+    # Inserts (one per dose when a schedule is created) update the row incrementally;
+    # updates and deletes are rare and recompute the child's row from its indexes.
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_vaccination_summary_insert
+        AFTER INSERT ON vaccinations
+        BEGIN
+            INSERT OR IGNORE INTO vaccination_summary (child_id) VALUES (NEW.child_id);
+            UPDATE vaccination_summary SET
+                total = total + 1,
+                completed = completed + (NEW.status IS 'completed'),
+                next_due_date = CASE
+                    WHEN NEW.status IS NOT 'completed'
+                         AND (next_due_date IS NULL OR NEW.due_date < next_due_date)
+                    THEN NEW.due_date ELSE next_due_date END,
+                last_administered_date = CASE
+                    WHEN NEW.status IS 'completed' AND NEW.administered_date IS NOT NULL
+                         AND (last_administered_date IS NULL OR NEW.administered_date > last_administered_date)
+                    THEN NEW.administered_date ELSE last_administered_date END
+            WHERE child_id = NEW.child_id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_vaccination_summary_update
+        AFTER UPDATE OF child_id, status, due_date, administered_date ON vaccinations
+        BEGIN
+            INSERT OR IGNORE INTO vaccination_summary (child_id) VALUES (NEW.child_id);
+            {_SUMMARY_RECOMPUTE.format(child='OLD.child_id')}
+            {_SUMMARY_RECOMPUTE.format(child='NEW.child_id')}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_vaccination_summary_delete
+        AFTER DELETE ON vaccinations
+        BEGIN
+            {_SUMMARY_RECOMPUTE.format(child='OLD.child_id')}
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_health_event_summary_insert
+        AFTER INSERT ON health_events
+        BEGIN
+            INSERT OR IGNORE INTO vaccination_summary (child_id) VALUES (NEW.child_id);
+            UPDATE vaccination_summary SET health_events = health_events + 1
+            WHERE child_id = NEW.child_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_health_event_summary_delete
+        AFTER DELETE ON health_events
+        BEGIN
+            UPDATE vaccination_summary SET health_events = health_events - 1
+            WHERE child_id = OLD.child_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_health_event_summary_update
+        AFTER UPDATE OF child_id ON health_events
+        BEGIN
+            INSERT OR IGNORE INTO vaccination_summary (child_id) VALUES (NEW.child_id);
+            UPDATE vaccination_summary SET health_events = health_events - 1
+            WHERE child_id = OLD.child_id;
+            UPDATE vaccination_summary SET health_events = health_events + 1
+            WHERE child_id = NEW.child_id;
+        END
+    """)
+    
+    # Backfill existing data
+    cursor.execute("""
+        INSERT OR IGNORE INTO vaccination_summary (child_id)
+        SELECT child_id FROM vaccinations UNION SELECT child_id FROM health_events
+    """)
+    cursor.execute(_SUMMARY_RECOMPUTE.format(child='vaccination_summary.child_id'))
+    cursor.execute("""
+        UPDATE vaccination_summary SET health_events = (
+            SELECT COUNT(*) FROM health_events WHERE child_id = vaccination_summary.child_id
+        )
+    """)
+
+def _migration_cache_generations(cursor):
+    entity_cache.create_generation_table(cursor)
+    entity_cache.create_generation_triggers(cursor, "vaccinations", "vaccinations", "child_id")
+    entity_cache.create_generation_triggers(cursor, "health_events", "health_events", "child_id")
+    entity_cache.create_generation_triggers(cursor, "reminder_settings", "reminder_settings", "child_id")
+
+def _migration_vaccination_code_index(cursor):
+    # Doses by vaccine code and administration date, to deduplicate imported immunizations
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vaccinations_child_code_administered
+        ON vaccinations(child_id, vaccine_code, administered_date)
+    """)
+
+# Searchable health_events columns, with their bm25 weights. child_id is indexed
+# too (weight 0, last so it never wins the snippet) to scope a search to one child.
+HEALTH_EVENT_SEARCH_COLUMNS = (("title", 10.0), ("symptoms", 5.0), ("description", 4.0),
+                               ("treatment", 2.0), ("doctor_name", 1.0), ("hospital_clinic", 1.0),
+                               ("child_id", 0.0))
+
+def _migration_health_event_search(cursor):
+    columns = ", ".join(name for name, _ in HEALTH_EVENT_SEARCH_COLUMNS)
+    new_values = ", ".join(f"NEW.{name}" for name, _ in HEALTH_EVENT_SEARCH_COLUMNS)
+    old_values = ", ".join(f"OLD.{name}" for name, _ in HEALTH_EVENT_SEARCH_COLUMNS)
+    # External-content FTS5 index: the text stays in health_events only
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS health_events_fts USING fts5(
+            {columns}, content='health_events', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+    """)
+    weights = ", ".join(str(weight) for _, weight in HEALTH_EVENT_SEARCH_COLUMNS)
+    cursor.execute(f"INSERT INTO health_events_fts (health_events_fts, rank) VALUES ('rank', 'bm25({weights})')")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_health_events_fts_insert
+        AFTER INSERT ON health_events
+        BEGIN
+            INSERT INTO health_events_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_health_events_fts_delete
+        AFTER DELETE ON health_events
+        BEGIN
+            INSERT INTO health_events_fts (health_events_fts, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_health_events_fts_update
+        AFTER UPDATE OF {columns} ON health_events
+        BEGIN
+            INSERT INTO health_events_fts (health_events_fts, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO health_events_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    cursor.execute("INSERT INTO health_events_fts (health_events_fts) VALUES ('rebuild')")
+
+# Ordered schema migrations; the position in the list is the PRAGMA user_version
+# the database has once the migration is applied. Only append to this list.
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_reminder_sweep,
+    _migration_access_path_indexes,
+    _migration_timeline_indexes,
+    _migration_vaccination_summary,
+    _migration_cache_generations,
+    _migration_vaccination_code_index,
+    _migration_health_event_search,
+]
+
+# Per-request queries that must be served from an index (checked by migrations.py
+# and tests/test_query_plans.py). Built from the statements the functions run.
+def hot_queries() -> List[Tuple[str, str, object]]:
+    before = ('2025-01-01', 'vaccination', 10)
+    vaccination_source, event_source = TIMELINE_SOURCES
+    return [
+        ("get_vaccinations", _VACCINATIONS_SQL, (1,)),
+        ("get_health_events", _HEALTH_EVENTS_SQL, (1,)),
+        ("get_health_events by type", _HEALTH_EVENTS_BY_TYPE_SQL, (1, 'illness')),
+        ("get_reminder_settings", _REMINDER_SETTINGS_SQL, (1,)),
+        ("get_sent_reminders", _SENT_REMINDERS_SQL, (1,)),
+        ("get_vaccination_summary", _VACCINATION_SUMMARY_SQL, _vaccination_summary_params(1, date(2025, 1, 1))),
+        ("timeline vaccinations page", *_timeline_branch(vaccination_source, 1, None, before, 21)),
+        ("timeline events page", *_timeline_branch(event_source, 1, None, ('2025-01-01', 'event', 10), 21)),
+        ("timeline events page by type", *_timeline_branch(event_source, 1, 'illness', before, 21)),
+        ("upsert_immunizations open dose", _OPEN_DOSE_SQL, {"child_id": 1, "vaccine_code": 'BCG'}),
+        ("upsert_immunizations duplicate", _DUPLICATE_DOSE_SQL,
+         {"child_id": 1, "vaccine_code": 'BCG', "administered_date": '2025-01-01'}),
+        ("search_health_events", *_health_event_search(1, "fever", None, SEARCH_LIMIT, ("**", "**"))),
+    ]
+
+# Timeline sources: (kind, table, date column, type column, title, description, filter)
+# Items sort newest first by (date, kind, id); vaccinations come before
+# health events recorded on the same day.
+TIMELINE_SOURCES = (
+    ("vaccination", "vaccinations", "administered_date", "'vaccination'", "vaccine_name", "notes",
+     "status = 'completed' AND administered_date IS NOT NULL"),
+    ("event", "health_events", "event_date", "event_type", "title", "description", "1"),
+)
+TIMELINE_PAGE_SIZE = 20
+# Most health events returned by one search
+SEARCH_LIMIT = 50
+_SEARCH_TERM = re.compile(r'"([^"]*)"|(\w+)(\*?)')
+
+def _timeline_branch(source: tuple, child_id: int, event_type: Optional[str],
+                     before: Optional[tuple], limit: int) -> Tuple[str, list]:
+    kind, table, date_column, type_column, title, description, condition = source
+    where = ["child_id = ?", condition]
+    params: list = [child_id]
+    if kind == "event" and event_type:
+        where.append("event_type = ?")
+        params.append(event_type)
+    if before:
+        before_date, before_kind, before_id = before
+        if kind == before_kind:
+            where.append(f"({date_column}, id) < (?, ?)")
+            params += [before_date, before_id]
+        elif kind > before_kind:
+            where.append(f"{date_column} < ?")
+            params.append(before_date)
+        else:
+            where.append(f"{date_column} <= ?")
+            params.append(before_date)
+    sql = f"""
+        SELECT * FROM (
+            SELECT '{kind}' AS kind, id, {date_column} AS item_date, {type_column} AS item_type,
+                   {title} AS title, {description} AS description
+            FROM {table}
+            WHERE {' AND '.join(where)}
+            ORDER BY {date_column} DESC, id DESC
+            LIMIT ?
+        )"""
+    return sql, params + [limit]
+
+def get_timeline_page(child_id: int, event_type: Optional[str] = None,
+                      before: Optional[tuple] = None, limit: int = TIMELINE_PAGE_SIZE) -> Dict:
+    """One page of a child's timeline: completed vaccinations and health events, newest first.
+    
+    event_type is None for everything, 'vaccination' for vaccinations only, or
+    a health event type. `before` is the previous page's next_cursor. Each
+    branch reads at most limit + 1 rows from its index, so the cost of a page
+    does not grow with the length of the history. Returns
+    {'items': [...], 'next_cursor': tuple or None}.
+    """
+    branches = []
+    params = []
+    for source in TIMELINE_SOURCES:
+        if event_type and (event_type == "vaccination") != (source[0] == "vaccination"):
+            continue
+        sql, branch_params = _timeline_branch(source, child_id, event_type, before, limit + 1)
+        branches.append(sql)
+        params += branch_params
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        {' UNION ALL '.join(branches)}
+        ORDER BY item_date DESC, kind DESC, id DESC
+        LIMIT ?
+    """, params + [limit + 1])
+    items = [dict(row) for row in cursor.fetchall()]
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = (last['item_date'], last['kind'], last['id'])
+    return {'items': items, 'next_cursor': next_cursor}
+
+def get_vaccination_summary(child_id: int, today: Optional[date] = None) -> Dict:
+    """Vaccination and health event counts for one child.
+    
+    Reads the trigger-maintained vaccination_summary row by primary key;
+    overdue and upcoming depend on today and come from range counts over the
+    open-doses index. pending is what is left (open and due after the
+    upcoming window).
+    """
+    today = today or date.today()
+    return entity_cache.cached(("summary", child_id), today,
+                               lambda: _load_vaccination_summary(child_id, today))
+
+_VACCINATION_SUMMARY_SQL = """
+    SELECT total, completed, health_events, next_due_date, last_administered_date,
+        (SELECT COUNT(*) FROM vaccinations
+         WHERE child_id = :child_id AND status IS NOT 'completed' AND due_date < :today) AS overdue,
+        (SELECT COUNT(*) FROM vaccinations
+         WHERE child_id = :child_id AND status IS NOT 'completed'
+           AND due_date BETWEEN :today AND :upcoming_end) AS upcoming
+    FROM vaccination_summary WHERE child_id = :child_id
+"""
+
+def _vaccination_summary_params(child_id: int, today: date) -> Dict:
+    return {
+        "child_id": child_id,
+        "today": today.isoformat(),
+        "upcoming_end": (today + timedelta(days=UPCOMING_DAYS)).isoformat(),
+    }
+
+def _load_vaccination_summary(child_id: int, today: date) -> Dict:
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(_VACCINATION_SUMMARY_SQL, _vaccination_summary_params(child_id, today))
+    row = cursor.fetchone()
+    summary = dict(row) if row else {
+        "total": 0, "completed": 0, "health_events": 0, "next_due_date": None,
+        "last_administered_date": None, "overdue": 0, "upcoming": 0,
+    }
+    summary["pending"] = summary["total"] - summary["completed"] - summary["overdue"] - summary["upcoming"]
+    return summary
+
+def get_user_totals(user_id: int) -> Dict:
+    """Number of children, vaccinations and health events recorded for a user."""
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT COUNT(*) AS children,
+               COALESCE(SUM(s.total), 0) AS vaccinations,
+               COALESCE(SUM(s.health_events), 0) AS health_events
+        FROM {USER_SCHEMA}.child_profiles c
+        LEFT JOIN vaccination_summary s ON s.child_id = c.id
+        WHERE c.user_id = ?
+    """, (user_id,))
+    return dict(cursor.fetchone())
+
+def _invalidate_vaccinations(child_id: int):
+    entity_cache.invalidate("vaccinations", child_id)
+    entity_cache.invalidate("summary", child_id)
+
+def _invalidate_health_events(child_id: int):
+    entity_cache.invalidate("health_events", child_id)
+    entity_cache.invalidate("summary", child_id)
+
+def _invalidate_children(child_ids, user_id: Optional[int] = None):
+    """Drop every cached entry of deleted children (and their user's child list)."""
+    for child_id in child_ids:
+        for kind in ("child", "vaccinations", "health_events", "reminder_settings", "summary"):
+            entity_cache.invalidate(kind, child_id)
+    entity_cache.invalidate("children", user_id)
+    entity_cache.invalidate("children", None)
+
+def init_database():
+    conn = get_connection()
+    migrations.run_migrations(conn, MIGRATIONS)
+    entity_cache.register_source("vaccination_health", get_connection, DATABASE_PATH)
 
 def add_vaccination(child_id: int, vaccine_name: str, vaccine_code: str, 
                    due_date: str, status: str = 'pending') -> int:
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date, status)
-        VALUES (?, ?, ?, ?, ?)
-    """, (child_id, vaccine_name, vaccine_code, due_date, status))
-    vacc_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("""
+            INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date, status)
+            VALUES (?, ?, ?, ?, ?)
+        """, (child_id, vaccine_name, vaccine_code, due_date, status))
+        vacc_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _invalidate_vaccinations(child_id)
     return vacc_id
 
-def get_vaccinations(child_id: int) -> List[Dict]:
+def _schedule_rows(child_id: int, schedule: List[Dict]):
+    for vacc in schedule:
+        due_date = vacc['due_date']
+        administered_date = vacc.get('administered_date')
+        yield (
+            child_id, vacc['vaccine_name'], vacc['vaccine_code'],
+            due_date.isoformat() if isinstance(due_date, date) else due_date,
+            vacc.get('status', 'pending'),
+            administered_date.isoformat() if isinstance(administered_date, date) else administered_date,
+            vacc.get('status_notes'),
+        )
+
+def add_vaccination_schedules(schedules: Dict[int, List[Dict]], replace: bool = False) -> int:
+    """Insert the schedules of many children ({child_id: schedule}) in one transaction.
+    
+    Schedule entries are generate_vaccination_schedule dicts; entries may carry
+    status, administered_date and status_notes (e.g. from apply_received_vaccines).
+    With replace=True the children's existing vaccinations are deleted first.
+    Returns the number of vaccinations inserted.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        if replace:
+            cursor.executemany("DELETE FROM vaccinations WHERE child_id = ?",
+                               [(child_id,) for child_id in schedules])
+        inserted = 0
+        for child_id, schedule in schedules.items():
+            cursor.executemany("""
+                INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date,
+                                          status, administered_date, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, _schedule_rows(child_id, schedule))
+            inserted += cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for child_id in schedules:
+        _invalidate_vaccinations(child_id)
+    return inserted
+
+def add_vaccination_schedule(child_id: int, schedule: List[Dict], replace: bool = False) -> int:
+    """Insert a child's whole vaccination schedule in one transaction."""
+    return add_vaccination_schedules({child_id: schedule}, replace)
+
+def add_cohort_schedules(child_ids: List[int], cohort: Dict) -> int:
+    """Insert generate_cohort_schedules output for `child_ids` (in `dobs` order) in one transaction."""
+    rows = zip(
+        (child_ids[i] for i in cohort['child_index'].tolist()),
+        cohort['vaccine_name'].tolist(),
+        cohort['vaccine_id'].tolist(),
+        (due_date.isoformat() for due_date in cohort['due_date'].tolist()),
+    )
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM vaccinations WHERE child_id = ? ORDER BY due_date
-    """, (child_id,))
+    try:
+        cursor.executemany("""
+            INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date, status)
+            VALUES (?, ?, ?, ?, 'pending')
+        """, rows)
+        inserted = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for child_id in set(child_ids):
+        _invalidate_vaccinations(child_id)
+    return inserted
+
+def _insert_children(cursor, user_id: int, children: List[Dict], doses: List[tuple]) -> Tuple[List[int], int]:
+    """Insert child profiles and their dose rows; returns the child ids and the number of doses."""
+    child_ids = []
+    for child in children:
+        cursor.execute(f"""
+            INSERT INTO {USER_SCHEMA}.child_profiles
+                (user_id, name, date_of_birth, country_guideline, gender, blood_group, allergies)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, child['name'], child['date_of_birth'].isoformat(), child['country_guideline'],
+              child.get('gender'), child.get('blood_group'), child.get('allergies')))
+        child_ids.append(cursor.lastrowid)
+    cursor.executemany("""
+        INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date,
+                                  status, administered_date, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, ((child_ids[position], *dose) for position, *dose in doses))
+    return child_ids, cursor.rowcount if doses else 0
+
+def add_children_with_schedules(user_id: int, children: List[Dict], doses: List[tuple]) -> List[int]:
+    """Create children and their schedules in one transaction (arguments as for import_roster_chunk)."""
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    try:
+        child_ids, _ = _insert_children(cursor, user_id, children, doses)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _invalidate_children(child_ids, user_id)
+    return child_ids
+
+# An open dose of a vaccine, and a dose already recorded on the same date
+_OPEN_DOSE_SQL = """
+    SELECT id FROM vaccinations
+    WHERE child_id = :child_id AND vaccine_code = :vaccine_code AND status IS NOT 'completed'
+    ORDER BY due_date LIMIT 1
+"""
+_DUPLICATE_DOSE_SQL = """
+    SELECT 1 FROM vaccinations
+    WHERE child_id = :child_id AND vaccine_code = :vaccine_code AND administered_date = :administered_date
+"""
+
+def upsert_immunizations(immunizations: List[Dict]) -> Dict:
+    """Record administered doses in one transaction, deduplicating on vaccine code and date.
+    
+    Each immunization has child_id, vaccine_code, vaccine_name,
+    administered_date and optionally batch_number, administered_by and notes.
+    A dose already recorded for the child with the same code and date is
+    updated; otherwise the child's earliest open dose with that code is
+    marked completed, or a new completed dose is inserted. Returns the
+    number of doses completed, inserted, updated and already recorded
+    (duplicates).
+    """
+    rows = [{"batch_number": None, "administered_by": None, "notes": None, **immunization}
+            for immunization in immunizations]
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(f"""
+            UPDATE vaccinations SET
+                status = 'completed', administered_date = :administered_date,
+                batch_number = :batch_number, administered_by = :administered_by,
+                notes = COALESCE(:notes, notes), updated_at = CURRENT_TIMESTAMP
+            WHERE id = ({_OPEN_DOSE_SQL}) AND NOT EXISTS ({_DUPLICATE_DOSE_SQL})
+        """, rows)
+        completed = cursor.rowcount
+        cursor.executemany(f"""
+            INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date, administered_date,
+                                      status, notes, administered_by, batch_number)
+            SELECT :child_id, :vaccine_name, :vaccine_code, :administered_date, :administered_date,
+                   'completed', :notes, :administered_by, :batch_number
+            WHERE NOT EXISTS ({_DUPLICATE_DOSE_SQL})
+        """, rows)
+        inserted = cursor.rowcount
+        # Earlier imports of the same doses: refresh their details
+        cursor.executemany("""
+            UPDATE vaccinations SET
+                batch_number = COALESCE(:batch_number, batch_number),
+                administered_by = COALESCE(:administered_by, administered_by),
+                notes = COALESCE(:notes, notes), updated_at = CURRENT_TIMESTAMP
+            WHERE child_id = :child_id AND vaccine_code = :vaccine_code AND administered_date = :administered_date
+              AND (batch_number IS NOT COALESCE(:batch_number, batch_number)
+                   OR administered_by IS NOT COALESCE(:administered_by, administered_by)
+                   OR notes IS NOT COALESCE(:notes, notes))
+        """, rows)
+        updated = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for child_id in {row['child_id'] for row in rows}:
+        _invalidate_vaccinations(child_id)
+    return {"completed": completed, "inserted": inserted, "updated": updated,
+            "duplicates": len(rows) - completed - inserted}
+
+def import_roster_chunk(import_id: int, user_id: int, children: List[Dict],
+                        doses: List[tuple], rows_done: int, rows_invalid: int) -> List[int]:
+    """Create one chunk of imported children with their schedules and advance the import's checkpoint.
+    
+    `doses` are (position in `children`, vaccine_name, vaccine_code, due_date,
+    status, administered_date, notes) tuples. Everything is written in one
+    transaction on the unified connection; rows_done is the number of source
+    rows consumed once this chunk is committed. Returns the new child ids.
+    """
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    try:
+        child_ids, vaccinations = _insert_children(cursor, user_id, children, doses)
+        # Ids are consecutive: the transaction holds the write lock on child_profiles
+        cursor.execute(f"""
+            UPDATE {USER_SCHEMA}.roster_imports
+            SET chunk_start_row = rows_done, rows_done = ?,
+                chunk_rows_invalid = ?, rows_invalid = rows_invalid + ?,
+                chunk_first_child_id = ?, chunk_last_child_id = ?,
+                chunk_vaccinations = ?, vaccinations_created = vaccinations_created + ?,
+                children_created = children_created + ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (rows_done, rows_invalid, rows_invalid,
+              child_ids[0] if child_ids else None, child_ids[-1] if child_ids else None,
+              vaccinations, vaccinations, len(child_ids), import_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _invalidate_children(child_ids, user_id)
+    return child_ids
+
+def recover_roster_import(import_id: int) -> Optional[Dict]:
+    """Undo a chunk that a crash committed to only one of the two files; returns the import row.
+    
+    Vaccinations of children whose insert was rolled back are deleted. If
+    the last checkpointed chunk's children have no vaccinations, the chunk
+    is removed and the checkpoint moved back so the chunk is imported again.
+    """
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    # Take the write lock on both files before reading the sequence, so no
+    # other process can commit children (and their schedules) above it meanwhile
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        row = cursor.execute(f"SELECT seq FROM {USER_SCHEMA}.sqlite_sequence WHERE name = 'child_profiles'").fetchone()
+        if row:
+            # Only orphans: vaccinations of ids never committed to child_profiles
+            cursor.execute(f"""
+                DELETE FROM vaccinations
+                WHERE child_id > ?
+                  AND NOT EXISTS (SELECT 1 FROM {USER_SCHEMA}.child_profiles c WHERE c.id = vaccinations.child_id)
+            """, (row['seq'],))
+        
+        job = cursor.execute(f"SELECT * FROM {USER_SCHEMA}.roster_imports WHERE id = ?", (import_id,)).fetchone()
+        torn = job and job['chunk_first_child_id'] is not None and job['chunk_vaccinations'] and not cursor.execute("""
+            SELECT 1 FROM vaccinations WHERE child_id BETWEEN ? AND ? LIMIT 1
+        """, (job['chunk_first_child_id'], job['chunk_last_child_id'])).fetchone()
+        if torn:
+            first, last = job['chunk_first_child_id'], job['chunk_last_child_id']
+            cursor.execute(f"DELETE FROM {USER_SCHEMA}.child_profiles WHERE id BETWEEN ? AND ? AND user_id = ?",
+                           (first, last, job['user_id']))
+            cursor.execute(f"""
+                UPDATE {USER_SCHEMA}.roster_imports
+                SET rows_done = chunk_start_row, rows_invalid = rows_invalid - chunk_rows_invalid,
+                    children_created = children_created - ?,
+                    vaccinations_created = vaccinations_created - chunk_vaccinations,
+                    chunk_start_row = NULL, chunk_rows_invalid = NULL, chunk_first_child_id = NULL,
+                    chunk_last_child_id = NULL, chunk_vaccinations = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (last - first + 1, import_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if torn:
+        _invalidate_children(range(first, last + 1), job['user_id'])
+    return udb.get_roster_import(import_id)
+
+def get_vaccinations(child_id: int) -> List[VaccinationRecord]:
+    return entity_cache.cached(("vaccinations", child_id), None, lambda: _load_vaccinations(child_id))
+
+def get_sorted_vaccinations(child_id: int) -> SortedVaccinations:
+    """A child's vaccinations indexed by due date for classify()/counts(); cached with them."""
+    return entity_cache.cached(("vaccinations", child_id), "sorted",
+                               lambda: SortedVaccinations(get_vaccinations(child_id)))
+
+_VACCINATIONS_SQL = "SELECT * FROM vaccinations WHERE child_id = ? ORDER BY due_date"
+
+def _load_vaccinations(child_id: int) -> List[VaccinationRecord]:
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(_VACCINATIONS_SQL, (child_id,))
     rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return [VaccinationRecord.from_row(row) for row in rows]
 
 def update_vaccination_status(vacc_id: int, status: str, 
                                administered_date: Optional[str] = None,
@@ -110,22 +805,32 @@ def update_vaccination_status(vacc_id: int, status: str,
                                batch_number: Optional[str] = None) -> bool:
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE vaccinations 
-        SET status = ?, administered_date = ?, notes = ?, 
-            administered_by = ?, batch_number = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    """, (status, administered_date, notes, administered_by, batch_number, vacc_id))
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("""
+            UPDATE vaccinations 
+            SET status = ?, administered_date = ?, notes = ?, 
+                administered_by = ?, batch_number = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (status, administered_date, notes, administered_by, batch_number, vacc_id))
+        row = cursor.execute("SELECT child_id FROM vaccinations WHERE id = ?", (vacc_id,)).fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if row:
+        _invalidate_vaccinations(row['child_id'])
     return True
 
 def delete_all_vaccinations(child_id: int) -> bool:
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM vaccinations WHERE child_id = ?", (child_id,))
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("DELETE FROM vaccinations WHERE child_id = ?", (child_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _invalidate_vaccinations(child_id)
     return True
 
 def add_health_event(child_id: int, event_type: str, event_date: str, 
@@ -135,51 +840,126 @@ def add_health_event(child_id: int, event_type: str, event_date: str,
                      hospital_clinic: Optional[str] = None) -> int:
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO health_events (child_id, event_type, event_date, title, 
-                                   description, severity, symptoms, treatment,
-                                   doctor_name, hospital_clinic)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (child_id, event_type, event_date, title, description, 
-          severity, symptoms, treatment, doctor_name, hospital_clinic))
-    event_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("""
+            INSERT INTO health_events (child_id, event_type, event_date, title, 
+                                       description, severity, symptoms, treatment,
+                                       doctor_name, hospital_clinic)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (child_id, event_type, event_date, title, description, 
+              severity, symptoms, treatment, doctor_name, hospital_clinic))
+        event_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _invalidate_health_events(child_id)
     return event_id
 
 def get_health_events(child_id: int, event_type: Optional[str] = None) -> List[Dict]:
+    return entity_cache.cached(("health_events", child_id), event_type,
+                               lambda: _load_health_events(child_id, event_type))
+
+_HEALTH_EVENTS_SQL = "SELECT * FROM health_events WHERE child_id = ? ORDER BY event_date DESC"
+_HEALTH_EVENTS_BY_TYPE_SQL = """
+    SELECT * FROM health_events WHERE child_id = ? AND event_type = ? ORDER BY event_date DESC
+"""
+
+def _load_health_events(child_id: int, event_type: Optional[str]) -> List[Dict]:
     conn = get_connection()
     cursor = conn.cursor()
     if event_type:
-        cursor.execute("""
-            SELECT * FROM health_events 
-            WHERE child_id = ? AND event_type = ?
-            ORDER BY event_date DESC
-        """, (child_id, event_type))
+        cursor.execute(_HEALTH_EVENTS_BY_TYPE_SQL, (child_id, event_type))
     else:
-        cursor.execute("""
-            SELECT * FROM health_events 
-            WHERE child_id = ? 
-            ORDER BY event_date DESC
-        """, (child_id,))
+        cursor.execute(_HEALTH_EVENTS_SQL, (child_id,))
     rows = cursor.fetchall()
-    conn.close()
     return [dict(row) for row in rows]
 
+# Columns the search box text is matched against; child_id is only there to scope by child
+_SEARCH_TEXT_COLUMNS = tuple(name for name, weight in HEALTH_EVENT_SEARCH_COLUMNS if weight)
+
+def health_event_search_query(text: str) -> Optional[str]:
+    """The FTS5 query for search box text, or None when it has no words.
+    
+    Every word must match; words are stemmed, so "coughing" finds "cough".
+    A word ending in * matches as a prefix ("bronch*"), which reads the
+    index entries of every matching word and so is slower on large
+    databases. "quoted words" must match as a phrase. FTS5 operators in the
+    text are treated as plain words. Only the text columns are searched,
+    never child_id.
+    """
+    terms = []
+    for phrase, word, prefix in _SEARCH_TERM.findall(text):
+        if word:
+            terms.append(f'"{word}"{prefix}')
+        elif re.search(r"\w", phrase):
+            terms.append('"' + " ".join(re.findall(r"\w+", phrase)) + '"')
+    if not terms:
+        return None
+    return f"{{{' '.join(_SEARCH_TEXT_COLUMNS)}}} : ({' AND '.join(terms)})"
+
+def _health_event_search(child_id: int, text: str, event_type: Optional[str], limit: int,
+                         marks: Tuple[str, str]) -> Optional[Tuple[str, list]]:
+    query = health_event_search_query(text)
+    if not query:
+        return None
+    params: list = [marks[0], marks[1], f'child_id : "{int(child_id)}" AND ({query})']
+    type_filter = ""
+    if event_type:
+        type_filter = "AND h.event_type = ?"
+        params.append(event_type)
+    sql = f"""
+        SELECT h.*, snippet(health_events_fts, -1, ?, ?, '…', 16) AS snippet,
+               health_events_fts.rank AS rank
+        FROM health_events_fts JOIN health_events h ON h.id = health_events_fts.rowid
+        WHERE health_events_fts MATCH ? {type_filter}
+        ORDER BY health_events_fts.rank
+        LIMIT ?
+    """
+    return sql, params + [limit]
+
+def search_health_events(child_id: int, text: str, event_type: Optional[str] = None,
+                         limit: int = SEARCH_LIMIT, marks: Tuple[str, str] = ("**", "**")) -> List[Dict]:
+    """A child's health events matching search box text, best match first.
+    
+    Ranked with bm25 over title, symptoms, description, treatment, doctor
+    and clinic (weighted in that order). Each row also has 'snippet', an
+    extract of the best-matching column with the matched words between
+    `marks`, and 'rank' (lower is better).
+    """
+    search = _health_event_search(child_id, text, event_type, limit, marks)
+    if search is None:
+        return []
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(*search)
+    return [dict(row) for row in cursor.fetchall()]
+
 def delete_health_event(event_id: int) -> bool:
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM health_events WHERE id = ?", (event_id,))
-    conn.commit()
-    conn.close()
+    try:
+        row = cursor.execute("SELECT child_id FROM health_events WHERE id = ?", (event_id,)).fetchone()
+        cursor.execute("DELETE FROM health_events WHERE id = ?", (event_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if row:
+        _invalidate_health_events(row['child_id'])
     return True
 
 def get_reminder_settings(child_id: int) -> Optional[Dict]:
+    return entity_cache.cached(("reminder_settings", child_id), None,
+                               lambda: _load_reminder_settings(child_id))
+
+_REMINDER_SETTINGS_SQL = "SELECT * FROM reminder_settings WHERE child_id = ?"
+
+def _load_reminder_settings(child_id: int) -> Optional[Dict]:
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM reminder_settings WHERE child_id = ?", (child_id,))
+    cursor.execute(_REMINDER_SETTINGS_SQL, (child_id,))
     row = cursor.fetchone()
-    conn.close()
     return dict(row) if row else None
 
 def save_reminder_settings(child_id: int, email_enabled: bool, email_address: str,
@@ -189,49 +969,210 @@ def save_reminder_settings(child_id: int, email_enabled: bool, email_address: st
     conn = get_connection()
     cursor = conn.cursor()
     existing = get_reminder_settings(child_id)
-    if existing:
-        cursor.execute("""
-            UPDATE reminder_settings 
-            SET email_enabled = ?, email_address = ?, sms_enabled = ?, phone_number = ?,
-                reminder_7_days = ?, reminder_1_day = ?, reminder_on_day = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE child_id = ?
-        """, (int(email_enabled), email_address, int(sms_enabled), phone_number,
-              int(reminder_7_days), int(reminder_1_day), int(reminder_on_day), child_id))
-    else:
-        cursor.execute("""
-            INSERT INTO reminder_settings (child_id, email_enabled, email_address, 
-                                           sms_enabled, phone_number, reminder_7_days,
-                                           reminder_1_day, reminder_on_day)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (child_id, int(email_enabled), email_address, int(sms_enabled), phone_number,
-              int(reminder_7_days), int(reminder_1_day), int(reminder_on_day)))
-    conn.commit()
-    conn.close()
+    try:
+        if existing:
+            cursor.execute("""
+                UPDATE reminder_settings 
+                SET email_enabled = ?, email_address = ?, sms_enabled = ?, phone_number = ?,
+                    reminder_7_days = ?, reminder_1_day = ?, reminder_on_day = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE child_id = ?
+            """, (int(email_enabled), email_address, int(sms_enabled), phone_number,
+                  int(reminder_7_days), int(reminder_1_day), int(reminder_on_day), child_id))
+        else:
+            cursor.execute("""
+                INSERT INTO reminder_settings (child_id, email_enabled, email_address, 
+                                               sms_enabled, phone_number, reminder_7_days,
+                                               reminder_1_day, reminder_on_day)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (child_id, int(email_enabled), email_address, int(sms_enabled), phone_number,
+                  int(reminder_7_days), int(reminder_1_day), int(reminder_on_day)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    entity_cache.invalidate("reminder_settings", child_id)
     return True
 
-def record_sent_reminder(vaccination_id: int, reminder_type: str, channel: str) -> int:
+def record_sent_reminder(vaccination_id: int, reminder_type: str, channel: str) -> bool:
+    """Record a sent reminder; False when it was already recorded."""
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO sent_reminders (vaccination_id, reminder_type, channel)
-        VALUES (?, ?, ?)
-    """, (vaccination_id, reminder_type, channel))
-    reminder_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return reminder_id
+    try:
+        cursor.execute("""
+            INSERT OR IGNORE INTO sent_reminders (vaccination_id, reminder_type, channel)
+            VALUES (?, ?, ?)
+        """, (vaccination_id, reminder_type, channel))
+        recorded = cursor.rowcount == 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return recorded
+
+def claim_and_enqueue_reminders(reminders: List[Dict], channel: str,
+                                template_for: Callable[[List[Dict]], Tuple[str, Dict]]) -> List[Dict]:
+    """Claim reminders and queue their email in the outbox in one transaction.
+    
+    `template_for(claimed)` returns the email_templates id and parameters of
+    the email, which the outbox keeps for the email log. Either both
+    the claims and the outbox row are written or neither is, so a crash
+    between claiming and queueing can no longer lose a reminder.
+    """
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    try:
+        claimed = []
+        for reminder in reminders:
+            cursor.execute("""
+                INSERT OR IGNORE INTO sent_reminders (vaccination_id, reminder_type, channel)
+                VALUES (?, ?, ?)
+            """, (reminder['vaccination_id'], reminder['reminder_type'], channel))
+            if cursor.rowcount == 1:
+                claimed.append(reminder)
+        if claimed:
+            template, params = template_for(claimed)
+            subject, content = email_templates.render(template, params)
+            first = claimed[0]
+            cursor.execute(f"""
+                INSERT INTO {USER_SCHEMA}.email_outbox
+                    (user_id, child_id, recipient_email, subject, content, template, params, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (first['user_id'], first['child_id'], first['email_address'], subject, content,
+                  template, email_templates.encode_params(params), time.time()))
+        conn.commit()
+        return claimed
+    except Exception:
+        conn.rollback()
+        raise
+
+_SENT_REMINDERS_SQL = "SELECT * FROM sent_reminders WHERE vaccination_id = ?"
 
 def get_sent_reminders(vaccination_id: int) -> List[Dict]:
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM sent_reminders WHERE vaccination_id = ?
-    """, (vaccination_id,))
+    cursor.execute(_SENT_REMINDERS_SQL, (vaccination_id,))
+    rows = cursor.fetchall()
+    return [dict(row) for row in rows]
+
+def get_due_reminders(today: date, channel: str = 'email') -> List[Dict]:
+    """Find every unsent email reminder whose window contains the given day.
+    
+    One query over vaccinations, reminder_settings, sent_reminders and the
+    attached child_profiles/users tables replaces the per-user/per-child/per-vaccine
+    walk, so the cost follows the number of due reminders rather than the
+    number of users. Children without an existing user are skipped.
+    """
+    windows = []
+    params = []
+    for reminder_type, start_days, end_days, _ in REMINDER_TYPES:
+        windows.append("(?, ?, ?)")
+        params.extend([
+            reminder_type,
+            (today + timedelta(days=end_days)).isoformat(),
+            (today + timedelta(days=start_days)).isoformat(),
+        ])
+    enabled = " OR ".join(
+        f"(w.reminder_type = '{reminder_type}' AND rs.{flag})"
+        for reminder_type, _, _, flag in REMINDER_TYPES
+    )
+    params.append(channel)
+    
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        WITH windows(reminder_type, first_due, last_due) AS (VALUES {', '.join(windows)})
+        SELECT v.id AS vaccination_id, v.child_id, v.vaccine_name, v.due_date,
+               rs.email_address, w.reminder_type,
+               c.user_id, c.name AS child_name
+        FROM windows w
+        JOIN vaccinations v ON v.due_date BETWEEN w.first_due AND w.last_due
+        JOIN reminder_settings rs ON rs.child_id = v.child_id
+        JOIN {USER_SCHEMA}.child_profiles c ON c.id = v.child_id
+        JOIN {USER_SCHEMA}.users u ON u.id = c.user_id
+        WHERE COALESCE(v.status, '') != 'completed'
+          AND rs.email_enabled = 1
+          AND COALESCE(rs.email_address, '') != ''
+          AND ({enabled})
+          AND NOT EXISTS (
+              SELECT 1 FROM sent_reminders sr
+              WHERE sr.vaccination_id = v.id AND sr.reminder_type = w.reminder_type
+                AND sr.channel = ?
+          )
+        ORDER BY v.child_id, v.due_date
+    """, params)
     rows = cursor.fetchall()
-    conn.close()
     return [dict(row) for row in rows]
 
+def acquire_scheduler_lease(name: str, owner: str, lease_seconds: float) -> bool:
+    """Take or renew the leader lease for a scheduler job; False if another owner holds it."""
+    now = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT OR IGNORE INTO scheduler_state (name) VALUES (?)", (name,))
+        cursor.execute("""
+            UPDATE scheduler_state
+            SET owner = ?, lease_expires_at = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE name = ? AND (owner IS NULL OR owner = ? OR lease_expires_at < ?)
+        """, (owner, now + lease_seconds, name, owner, now))
+        acquired = cursor.rowcount == 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return acquired
+
+def release_scheduler_lease(name: str, owner: str) -> bool:
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE scheduler_state
+            SET owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE name = ? AND owner = ?
+        """, (name, owner))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+def record_scheduler_run(name: str, status: str, result: Optional[Dict] = None) -> bool:
+    """Record the start ('running') or outcome of a scheduler job run."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        if status == 'running':
+            cursor.execute("""
+                UPDATE scheduler_state
+                SET last_started_at = CURRENT_TIMESTAMP, last_status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+            """, (status, name))
+        else:
+            cursor.execute("""
+                UPDATE scheduler_state
+                SET last_finished_at = CURRENT_TIMESTAMP, last_status = ?, last_result = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+            """, (status, json.dumps(result or {}), name))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+def get_scheduler_status(name: str) -> Optional[Dict]:
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM scheduler_state WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    status = dict(row)
+    status['last_result'] = json.loads(status['last_result']) if status['last_result'] else {}
+    return status
+
 def add_child(name: str, date_of_birth: str, country_guideline: str, user_id: int,
               gender: Optional[str] = None, blood_group: Optional[str] = None, 
               allergies: Optional[str] = None) -> int:
@@ -246,7 +1187,52 @@ def get_all_children(user_id: Optional[int] = None) -> List[Dict]:
 def update_child(child_id: int, **kwargs) -> bool:
     return udb.update_child(child_id, **kwargs)
 
+def _delete_children(cursor, child_filter: str, params: tuple):
+    """Delete the vaccination-side rows of the children selected by `child_filter`."""
+    children = f"SELECT id FROM {USER_SCHEMA}.child_profiles WHERE {child_filter}"
+    cursor.execute(f"""
+        DELETE FROM sent_reminders WHERE vaccination_id IN (
+            SELECT id FROM vaccinations WHERE child_id IN ({children})
+        )
+    """, params)
+    for table in ("vaccinations", "health_events", "reminder_settings", "vaccination_summary"):
+        cursor.execute(f"DELETE FROM {table} WHERE child_id IN ({children})", params)
+
 def delete_child(child_id: int) -> bool:
-    return udb.delete_child(child_id)
+    """Delete a child profile and all of its vaccination, health and reminder data."""
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    try:
+        row = cursor.execute(f"SELECT user_id FROM {USER_SCHEMA}.child_profiles WHERE id = ?",
+                             (child_id,)).fetchone()
+        _delete_children(cursor, "id = ?", (child_id,))
+        cursor.execute(f"DELETE FROM {USER_SCHEMA}.child_profiles WHERE id = ?", (child_id,))
+        conn.commit()
+        _invalidate_children([child_id], row['user_id'] if row else None)
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"Error deleting child: {e}")
+        return False
+
+def delete_user_account(user_id: int) -> bool:
+    """Delete a user, their children and everything recorded for them in one transaction."""
+    conn = get_unified_connection()
+    cursor = conn.cursor()
+    try:
+        child_ids = [row['id'] for row in cursor.execute(
+            f"SELECT id FROM {USER_SCHEMA}.child_profiles WHERE user_id = ?", (user_id,))]
+        _delete_children(cursor, "user_id = ?", (user_id,))
+        cursor.execute(f"DELETE FROM {USER_SCHEMA}.emails WHERE user_id = ?", (user_id,))
+        cursor.execute(f"DELETE FROM {USER_SCHEMA}.email_outbox WHERE user_id = ?", (user_id,))
+        cursor.execute(f"DELETE FROM {USER_SCHEMA}.child_profiles WHERE user_id = ?", (user_id,))
+        cursor.execute(f"DELETE FROM {USER_SCHEMA}.users WHERE id = ?", (user_id,))
+        conn.commit()
+        _invalidate_children(child_ids, user_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"Error deleting user account: {e}")
+        return False
 
 init_database()
@@ -0,0 +1,129 @@
+"""Thread-local SQLite connections shared by database.py and user_database.py.
+
+Each thread gets one long-lived, tuned connection per database file instead
+of a fresh sqlite3.connect per function call. Lifecycle hooks:
+
+- Streamlit runs every script run on its own thread; app.py calls
+  close_dead_thread_connections() on each rerun to close the connections of
+  runs that have finished.
+- Long-running threads (scheduler, outbox workers) call
+  close_thread_connections() when they exit; close_all() runs at shutdown.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import urllib.parse
+from typing import Dict, Optional, Tuple
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16 * 1024
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_registry: Dict[threading.Thread, Dict[tuple, sqlite3.Connection]] = {}
+
+
+def _open(path: str, attachments: Tuple[Tuple[str, str], ...] = ()) -> sqlite3.Connection:
+    # check_same_thread=False only so close_all/close_dead_thread_connections can
+    # close connections on behalf of other threads; each connection is used by
+    # the thread that opened it.
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    schemas = ["main"]
+    for alias, attached_path in attachments:
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (attached_path,))
+        schemas.append(alias)
+    for schema in schemas:
+        # Takes effect only in a new file (before journal_mode writes its header);
+        # existing files switch with a VACUUM (user_database.reclaim_free_pages)
+        conn.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+        conn.execute(f"PRAGMA {schema}.journal_mode = WAL")
+        conn.execute(f"PRAGMA {schema}.synchronous = NORMAL")
+        conn.execute(f"PRAGMA {schema}.cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA {schema}.mmap_size = {MMAP_SIZE_BYTES}")
+    return conn
+
+
+def get_connection(path: str, attachments: Optional[Dict[str, str]] = None) -> sqlite3.Connection:
+    """The calling thread's connection to the database at `path`.
+    
+    `attachments` maps schema aliases to further database files to ATTACH, so
+    one connection (and one transaction) can span several files.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = (path, tuple(sorted((attachments or {}).items())))
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = _open(path, key[1])
+        # (Re-)register on every open: close_all() may have dropped this
+        # thread's dict from the registry since it was created
+        with _registry_lock:
+            _registry[threading.current_thread()] = connections
+    return conn
+
+
+def open_read_only(path: str, attachments: Optional[Dict[str, str]] = None) -> sqlite3.Connection:
+    """A new read-only connection that is not shared or registered; the caller closes it.
+    
+    For long reads (exports) that must not hold a transaction open on the
+    calling thread's shared connection.
+    """
+    def uri(file_path: str) -> str:
+        return f"file:{urllib.parse.quote(os.path.abspath(file_path))}?mode=ro"
+
+    conn = sqlite3.connect(uri(path), uri=True, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+    for alias, attached_path in (attachments or {}).items():
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (uri(attached_path),))
+        conn.execute(f"PRAGMA {alias}.mmap_size = {MMAP_SIZE_BYTES}")
+    return conn
+
+
+def _close(connections: Dict[tuple, sqlite3.Connection]):
+    for conn in connections.values():
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
+
+
+def close_thread_connections():
+    """Close the calling thread's connections (e.g. when a worker thread exits)."""
+    with _registry_lock:
+        connections = _registry.pop(threading.current_thread(), None)
+    _local.connections = None
+    if connections:
+        _close(connections)
+
+
+def close_dead_thread_connections():
+    """Close connections left behind by threads that have finished."""
+    with _registry_lock:
+        dead = [thread for thread in _registry if not thread.is_alive()]
+        stale = [_registry.pop(thread) for thread in dead]
+    for connections in stale:
+        _close(connections)
+
+
+def close_all():
+    with _registry_lock:
+        stale = list(_registry.values())
+        _registry.clear()
+    _local.connections = None
+    for connections in stale:
+        _close(connections)
+
+
+atexit.register(close_all)
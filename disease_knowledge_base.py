@@ -0,0 +1,148 @@
+"""Searchable knowledge base over data/disease_information_database.json.
+
+The file is parsed once per process (and again only when its mtime changes)
+into a DiseaseKnowledgeBase holding an inverted index from terms in each
+disease's name, symptoms, causes, home remedies and prevention to the
+diseases that contain them. search() ranks matches by field-weighted term
+frequency and inverse document frequency; the last query word also matches
+as a prefix so results update while the user is typing.
+"""
+import bisect
+import json
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+DISEASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data",
+                             "disease_information_database.json")
+
+# How much a term counts depending on the field it appears in
+FIELD_WEIGHTS = {
+    "name": 5.0,
+    "symptoms": 3.0,
+    "causes": 1.5,
+    "home_remedies": 1.0,
+    "prevention": 1.0,
+}
+# Score factor for a word that only matches the start of an indexed term
+PREFIX_WEIGHT = 0.6
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _normalize(entries) -> List[Dict]:
+    # Support the {"diseases": [...]}, {name: {...}} and [...] layouts
+    if isinstance(entries, dict):
+        if isinstance(entries.get("diseases"), list):
+            entries = entries["diseases"]
+        else:
+            entries = [{"name": k, **v} for k, v in entries.items() if isinstance(v, dict)]
+    if not isinstance(entries, list):
+        return []
+    diseases = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            name = entry.get("name") or entry.get("disease_name", "Unknown Disease")
+            diseases.append({**entry, "name": name})
+    return diseases
+
+
+class DiseaseKnowledgeBase:
+    """Diseases plus an inverted index (term -> {disease position: weighted frequency})."""
+
+    def __init__(self, entries):
+        self.diseases: Tuple[Dict, ...] = tuple(_normalize(entries))
+        postings: Dict[str, Dict[int, float]] = {}
+        for position, disease in enumerate(self.diseases):
+            for field, weight in FIELD_WEIGHTS.items():
+                value = disease.get(field) or []
+                text = " ".join(value) if isinstance(value, list) else str(value)
+                for term in tokenize(text):
+                    scores = postings.setdefault(term, {})
+                    scores[position] = scores.get(position, 0.0) + weight
+        self._postings = postings
+        self._terms = sorted(postings)
+
+    def _matches(self, word: str, prefix: bool) -> Dict[int, float]:
+        """Scores per disease for one query word, exact matches plus prefix matches."""
+        scores: Dict[int, float] = {}
+        terms = [word] if word in self._postings else []
+        if prefix:
+            start = bisect.bisect_left(self._terms, word)
+            end = bisect.bisect_left(self._terms, word + "\uffff")
+            terms += [term for term in self._terms[start:end] if term != word]
+        for term in terms:
+            weight = 1.0 if term == word else PREFIX_WEIGHT
+            postings = self._postings[term]
+            idf = math.log(1 + len(self.diseases) / len(postings))
+            for position, frequency in postings.items():
+                scores[position] = max(scores.get(position, 0.0), weight * frequency * idf)
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Dict]:
+        """Diseases matching every word of the query, best match first.
+
+        Only the last word matches as a prefix, e.g. "fev" finds "fever".
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        totals: Optional[Dict[int, float]] = None
+        for index, word in enumerate(words):
+            scores = self._matches(word, prefix=index == len(words) - 1)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {position: totals[position] + score
+                          for position, score in scores.items() if position in totals}
+            if not totals:
+                return []
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], self.diseases[item[0]]["name"]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.diseases[position] for position, _ in ranked]
+
+
+_cached: Optional[Tuple[int, DiseaseKnowledgeBase]] = None
+_cached_lock = threading.Lock()
+
+
+def get_knowledge_base() -> Optional[DiseaseKnowledgeBase]:
+    """The process-wide knowledge base, rebuilt only when the JSON file changes.
+
+    Returns None when the file is missing or cannot be read.
+    """
+    global _cached
+    try:
+        mtime = os.stat(DISEASES_PATH).st_mtime_ns
+    except FileNotFoundError:
+        print(f"Disease database file not found at: {DISEASES_PATH}")
+        return None
+
+    cached = _cached
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _cached_lock:
+        if _cached and _cached[0] == mtime:
+            return _cached[1]
+        try:
+            with open(DISEASES_PATH, "r", encoding="utf-8") as f:
+                knowledge_base = DiseaseKnowledgeBase(json.load(f))
+        except Exception as e:
+            print(f"Error reading disease database: {e}")
+            return None
+        _cached = (mtime, knowledge_base)
+        return knowledge_base
+
+
+def search_diseases(query: str, limit: Optional[int] = None) -> List[Dict]:
+    """Ranked search over the shared knowledge base."""
+    knowledge_base = get_knowledge_base()
+    return knowledge_base.search(query, limit) if knowledge_base else []
@@ -0,0 +1,101 @@
+"""Retention job for the email log: archive old emails to compressed files and reclaim space.
+
+    python email_archive.py                        # emails older than EMAIL_RETENTION_DAYS
+    python email_archive.py --retention-days 90 --archive-dir /backups/emails
+
+Emails sent before the retention cutoff are written, with their content
+rendered, to <archive dir>/emails_<first id>-<last id>.jsonl.gz (one JSON
+object per line) and then deleted from user_database.db together with the
+finished email_outbox rows, after which the free pages go back to the file
+system with an incremental vacuum. The scheduler runs it once a day.
+
+The archive file is complete (written to a temporary name, synced and
+renamed) before any row is deleted. A run interrupted after the rename
+finds the file on the next run and only deletes the rows.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import user_database as udb
+
+RETENTION_DAYS = int(os.getenv("EMAIL_RETENTION_DAYS", 365))
+ARCHIVE_DIR = os.getenv("EMAIL_ARCHIVE_DIR", "email_archive")
+
+
+def archive_path(archive_dir: str, first_id: int, last_id: int) -> str:
+    return os.path.join(archive_dir, f"emails_{first_id:010d}-{last_id:010d}.jsonl.gz")
+
+
+def _write_archive(path: str, cutoff: str, last_id: int) -> int:
+    temp_path = path + ".tmp"
+    written = 0
+    with open(temp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as archive:
+            for row in udb.iter_emails_to_archive(cutoff, last_id):
+                archive.write((json.dumps(udb.logged_email(row), ensure_ascii=False) + "\n").encode("utf-8"))
+                written += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temp_path, path)
+    return written
+
+
+def archive_emails(retention_days: int = RETENTION_DAYS, archive_dir: str = ARCHIVE_DIR,
+                   now: Optional[datetime] = None) -> Dict:
+    """Archive and delete emails older than `retention_days`, then vacuum.
+
+    `now` defaults to the current time; a naive datetime is taken as UTC.
+    Returns the archive file (None when nothing was old enough), the numbers
+    of emails archived and deleted, the outbox rows deleted, the free pages
+    reclaimed and the database size before and after.
+    """
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    # sent_at is CURRENT_TIMESTAMP: UTC 'YYYY-MM-DD HH:MM:SS'
+    cutoff_time = (now - timedelta(days=retention_days)).astimezone(timezone.utc)
+    cutoff = cutoff_time.strftime("%Y-%m-%d %H:%M:%S")
+    size_before = os.path.getsize(udb.USER_DATABASE_PATH)
+    summary = {"cutoff": cutoff, "archive": None, "archived": 0}
+
+    archive_range = udb.get_email_archive_range(cutoff)
+    last_id = 0
+    if archive_range:
+        last_id = archive_range['last_id']
+        os.makedirs(archive_dir, exist_ok=True)
+        path = archive_path(archive_dir, archive_range['first_id'], last_id)
+        if not os.path.exists(path):
+            summary["archived"] = _write_archive(path, cutoff, last_id)
+        summary["archive"] = path
+
+    deleted = udb.delete_archived_emails(cutoff, last_id, cutoff_time.timestamp())
+    summary["deleted"] = deleted["emails"]
+    summary["outbox_deleted"] = deleted["outbox"]
+    summary.update(udb.reclaim_free_pages())
+    summary["size_before"] = size_before
+    summary["size_after"] = os.path.getsize(udb.USER_DATABASE_PATH)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old emails from the email log")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS,
+                        help="Keep emails sent in the last N days (default: %(default)s)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR,
+                        help="Directory for the archive files (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    summary = archive_emails(args.retention_days, args.archive_dir)
+    if summary["archived"]:
+        print(f"Archived {summary['archived']} emails to {summary['archive']}")
+    print(f"Deleted {summary['deleted']} emails and {summary['outbox_deleted']} outbox rows; "
+          f"user_database.db {summary['size_before']} -> {summary['size_after']} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
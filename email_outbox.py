@@ -0,0 +1,110 @@
+"""Background delivery of queued emails from the email_outbox table.
+
+Callers enqueue through email_service.send_email_notification; a pool of
+worker threads claims batches of due rows, delivers them and records the
+outcome. Failed deliveries are retried with exponential backoff and moved to
+the 'dead' status after MAX_ATTEMPTS. A worker that dies mid-batch leaves its
+rows claimed until the lease runs out, after which they are delivered again
+(at-least-once) or dead-lettered if they have used all their attempts.
+"""
+import os
+import random
+import threading
+import uuid
+from typing import Callable, Dict, Optional
+import db_connections
+import user_database as udb
+import email_service
+
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 6))
+BASE_BACKOFF_SECONDS = float(os.getenv("EMAIL_BASE_BACKOFF", 30))
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+CLAIM_LEASE_SECONDS = 5 * 60
+BATCH_SIZE = 20
+IDLE_POLL_SECONDS = 2.0
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def drain_once(transport: Optional[Callable] = None, batch_size: int = BATCH_SIZE) -> Dict:
+    """Claim one batch of due emails and try to deliver each of them.
+
+    `transport(recipient_email, subject, content)` must raise on failure and
+    defaults to email_service.deliver_email.
+    """
+    transport = transport or email_service.deliver_email
+    claim_token = uuid.uuid4().hex
+    result = {"claimed": 0, "sent": 0, "retried": 0, "dead": 0}
+
+    for email in udb.claim_outbox_emails(claim_token, batch_size, CLAIM_LEASE_SECONDS, MAX_ATTEMPTS):
+        result["claimed"] += 1
+        try:
+            transport(email['recipient_email'], email['subject'], email['content'])
+        except Exception as e:
+            if email['attempts'] >= MAX_ATTEMPTS:
+                udb.fail_outbox_email(email['id'], claim_token, str(e))
+                result["dead"] += 1
+            else:
+                udb.fail_outbox_email(email['id'], claim_token, str(e), backoff_delay(email['attempts']))
+                result["retried"] += 1
+            continue
+        udb.complete_outbox_email(email['id'], claim_token)
+        result["sent"] += 1
+
+    return result
+
+
+def drain_all(transport: Optional[Callable] = None) -> Dict:
+    """Deliver everything that is currently due, e.g. after a one-off sweep."""
+    totals = {"claimed": 0, "sent": 0, "retried": 0, "dead": 0}
+    while True:
+        result = drain_once(transport)
+        for key in totals:
+            totals[key] += result[key]
+        if not result["claimed"]:
+            return totals
+
+
+class OutboxWorkerPool:
+    """A fixed number of threads that keep draining the outbox until stopped."""
+
+    def __init__(self, workers: int = 2, transport: Optional[Callable] = None):
+        self.workers = workers
+        self.transport = transport
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"email-outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 30.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    result = drain_once(self.transport)
+                except Exception as e:
+                    print(f"Email outbox worker error: {e}")
+                    result = {"claimed": 0}
+                if not result["claimed"]:
+                    self._stop.wait(IDLE_POLL_SECONDS)
+        finally:
+            db_connections.close_thread_connections()
+
+
+def get_outbox_stats() -> Dict:
+    """Queue depth by status and recent drain rate."""
+    return udb.get_outbox_stats()
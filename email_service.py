@@ -1,129 +1,100 @@
 import os
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import user_database as udb
-import smtplib
+import smtp_pool
+import email_templates
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 def send_email_notification(user_id: int, child_id: int, recipient_email: str, 
-                           subject: str, content: str) -> bool:
-    """Send email notification and log it to the database."""
+                           subject: str, content: str, template: Optional[str] = None,
+                           params: Optional[Dict] = None) -> bool:
+    """Queue an email notification; the outbox workers deliver and log it.
+    
+    Emails rendered from an email_templates template pass its id and
+    parameters, which the log stores instead of the content.
+    """
     try:
-        # Try using SendGrid if available
-        sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
-        if sendgrid_api_key:
-            from sendgrid import SendGridAPIClient
-            from sendgrid.helpers.mail import Mail
-            
-            message = Mail(
-                from_email=os.getenv("SENDGRID_FROM_EMAIL", "noreply@kindercare.app"),
-                to_emails=recipient_email,
-                subject=subject,
-                html_content=content
-            )
-            
-            try:
-                sg = SendGridAPIClient(sendgrid_api_key)
-                response = sg.send(message)
-                
-                # Log the email to database
-                udb.log_email(user_id, child_id, recipient_email, subject, content, status='sent')
-                return True
-            except Exception as e:
-                print(f"SendGrid error: {e}")
-                # Fall through to try SMTP
+        udb.enqueue_email(user_id, child_id, recipient_email, subject, content, template, params)
+        return True
+    except Exception as e:
+        print(f"Unexpected error queueing email: {e}")
+        return False
+
+def deliver_email(recipient_email: str, subject: str, content: str):
+    """Send one email via SendGrid, falling back to Gmail SMTP.
+    
+    Raises an exception when the email could not be delivered.
+    """
+    # Try using SendGrid if available
+    sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
+    if sendgrid_api_key:
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
         
-        # Try using Gmail SMTP
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
-        smtp_username = os.getenv("SMTP_USERNAME", "")
-        smtp_password = os.getenv("SMTP_PASSWORD", "")
-        from_email = smtp_username  # Use Gmail address as sender
+        message = Mail(
+            from_email=os.getenv("SENDGRID_FROM_EMAIL", "noreply@kindercare.app"),
+            to_emails=recipient_email,
+            subject=subject,
+            html_content=content
+        )
         
-        if smtp_username and smtp_password:
-            try:
-                msg = MIMEMultipart("alternative")
-                msg["Subject"] = subject
-                msg["From"] = from_email
-                msg["To"] = recipient_email
-                
-                html_part = MIMEText(content, "html")
-                msg.attach(html_part)
-                
-                with smtplib.SMTP(smtp_server, smtp_port, timeout=10) as server:
-                    server.starttls()
-                    server.login(smtp_username, smtp_password)
-                    server.sendmail(from_email, recipient_email, msg.as_string())
-                
-                # Log the email to database
-                udb.log_email(user_id, child_id, recipient_email, subject, content, status='sent')
-                print(f"✅ Email sent via SMTP to {recipient_email}")
-                return True
-            except Exception as e:
-                print(f"SMTP error: {e}")
-                # Log the failed email attempt
-                udb.log_email(user_id, child_id, recipient_email, subject, content, status='failed')
-                return False
-        else:
-            print("Email configuration missing: Please set SMTP_USERNAME and SMTP_PASSWORD")
-            return False
-            
-    except Exception as e:
-        print(f"Unexpected error in email service: {e}")
         try:
-            udb.log_email(user_id, child_id, recipient_email, subject, content, status='failed')
-        except:
-            pass
-        return False
+            sg = SendGridAPIClient(sendgrid_api_key)
+            sg.send(message)
+            return
+        except Exception as e:
+            print(f"SendGrid error: {e}")
+            # Fall through to try SMTP
+    
+    # Try using Gmail SMTP
+    smtp_server = "smtp.gmail.com"
+    smtp_port = 587
+    smtp_username = os.getenv("SMTP_USERNAME", "")
+    smtp_password = os.getenv("SMTP_PASSWORD", "")
+    from_email = smtp_username  # Use Gmail address as sender
+    
+    if not (smtp_username and smtp_password):
+        raise RuntimeError("Email configuration missing: Please set SMTP_USERNAME and SMTP_PASSWORD")
+    
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = from_email
+    msg["To"] = recipient_email
+    
+    html_part = MIMEText(content, "html")
+    msg.attach(html_part)
+    
+    pool = smtp_pool.get_pool(smtp_server, smtp_port, smtp_username, smtp_password)
+    pool.send(from_email, recipient_email, msg.as_string())
+    
+    print(f"✅ Email sent via SMTP to {recipient_email}")
+
+def send_templated_email(user_id: int, child_id: int, recipient_email: str,
+                         template: str, params: Dict) -> bool:
+    """Render an email_templates template and queue it."""
+    subject, content = email_templates.render(template, params)
+    return send_email_notification(user_id, child_id, recipient_email, subject, content, template, params)
 
 def send_vaccination_reminder(user_id: int, child_id: int, child_name: str, 
                              recipient_email: str, vaccine_name: str, due_date: str) -> bool:
     """Send a vaccination reminder email."""
-    subject = f"Vaccination Reminder for {child_name}"
-    
-    content = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #667eea;">Vaccination Reminder</h2>
-                <p>Hi,</p>
-                <p>This is a reminder that <strong>{child_name}</strong> is due for the following vaccination:</p>
-                <div style="background-color: #f0f7ff; padding: 15px; border-left: 4px solid #667eea; margin: 20px 0;">
-                    <p><strong>Vaccine:</strong> {vaccine_name}</p>
-                    <p><strong>Due Date:</strong> {due_date}</p>
-                </div>
-                <p>Please schedule an appointment with your pediatrician to ensure your child's health and protection.</p>
-                <p>Best regards,<br>KinderCare Team</p>
-            </div>
-        </body>
-    </html>
-    """
-    
-    return send_email_notification(user_id, child_id, recipient_email, subject, content)
+    return send_templated_email(user_id, child_id, recipient_email, email_templates.VACCINATION_REMINDER, {
+        "child_name": child_name, "vaccine_name": vaccine_name, "due_date": due_date,
+    })
 
 def send_health_update_notification(user_id: int, child_id: int, child_name: str,
                                    recipient_email: str, event_type: str, 
                                    event_title: str, event_date: str) -> bool:
     """Send a health event update email."""
-    subject = f"Health Update: {event_title} for {child_name}"
+    return send_templated_email(user_id, child_id, recipient_email, email_templates.HEALTH_UPDATE, {
+        "child_name": child_name, "event_type": event_type,
+        "event_title": event_title, "event_date": event_date,
+    })
+
+def vaccination_digest_template(reminders: List[Dict]) -> Tuple[str, Dict]:
+    """Template id and parameters of the digest listing every due vaccination for a recipient.
     
-    content = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #667eea;">Health Event Update</h2>
-                <p>Hi,</p>
-                <p>A new health event has been recorded for <strong>{child_name}</strong>:</p>
-                <div style="background-color: #f0f7ff; padding: 15px; border-left: 4px solid #667eea; margin: 20px 0;">
-                    <p><strong>Event Type:</strong> {event_type}</p>
-                    <p><strong>Event Title:</strong> {event_title}</p>
-                    <p><strong>Date:</strong> {event_date}</p>
-                </div>
-                <p>You can view more details in your KinderCare dashboard.</p>
-                <p>Best regards,<br>KinderCare Team</p>
-            </div>
-        </body>
-    </html>
+    Each reminder needs child_name, vaccine_name and due_date (display string).
     """
-    
-    return send_email_notification(user_id, child_id, recipient_email, subject, content)
+    return email_templates.VACCINATION_DIGEST, email_templates.digest_params(reminders)
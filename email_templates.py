@@ -0,0 +1,121 @@
+"""HTML email templates, referenced from the email log by id and parameters.
+
+The email log stores (template id, JSON parameters) instead of the rendered
+HTML and renders the email again when it is viewed, exported or archived.
+A template id must therefore keep rendering the same email: to change a
+template, add it under a new id (e.g. "vaccination_digest/2") and keep the
+old one for the emails that already reference it.
+"""
+import json
+from typing import Callable, Dict, List, Tuple
+
+VACCINATION_REMINDER = "vaccination_reminder/1"
+HEALTH_UPDATE = "health_update/1"
+VACCINATION_DIGEST = "vaccination_digest/1"
+# Fields of each reminder kept in the parameters of a digest
+DIGEST_FIELDS = ("child_name", "vaccine_name", "due_date")
+
+
+def _vaccination_reminder(params: Dict) -> Tuple[str, str]:
+    subject = f"Vaccination Reminder for {params['child_name']}"
+    content = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #667eea;">Vaccination Reminder</h2>
+                <p>Hi,</p>
+                <p>This is a reminder that <strong>{params['child_name']}</strong> is due for the following vaccination:</p>
+                <div style="background-color: #f0f7ff; padding: 15px; border-left: 4px solid #667eea; margin: 20px 0;">
+                    <p><strong>Vaccine:</strong> {params['vaccine_name']}</p>
+                    <p><strong>Due Date:</strong> {params['due_date']}</p>
+                </div>
+                <p>Please schedule an appointment with your pediatrician to ensure your child's health and protection.</p>
+                <p>Best regards,<br>KinderCare Team</p>
+            </div>
+        </body>
+    </html>
+    """
+    return subject, content
+
+
+def _health_update(params: Dict) -> Tuple[str, str]:
+    subject = f"Health Update: {params['event_title']} for {params['child_name']}"
+    content = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #667eea;">Health Event Update</h2>
+                <p>Hi,</p>
+                <p>A new health event has been recorded for <strong>{params['child_name']}</strong>:</p>
+                <div style="background-color: #f0f7ff; padding: 15px; border-left: 4px solid #667eea; margin: 20px 0;">
+                    <p><strong>Event Type:</strong> {params['event_type']}</p>
+                    <p><strong>Event Title:</strong> {params['event_title']}</p>
+                    <p><strong>Date:</strong> {params['event_date']}</p>
+                </div>
+                <p>You can view more details in your KinderCare dashboard.</p>
+                <p>Best regards,<br>KinderCare Team</p>
+            </div>
+        </body>
+    </html>
+    """
+    return subject, content
+
+
+def _vaccination_digest(params: Dict) -> Tuple[str, str]:
+    reminders = params['reminders']
+    child_names = list(dict.fromkeys(r['child_name'] for r in reminders))
+    if len(child_names) == 1:
+        subject = f"Vaccination Reminder for {child_names[0]}"
+    else:
+        subject = f"Vaccination Reminders for {', '.join(child_names[:-1])} and {child_names[-1]}"
+
+    sections = ""
+    for child_name in child_names:
+        rows = "".join(
+            f"<p><strong>{r['vaccine_name']}</strong> — due {r['due_date']}</p>"
+            for r in reminders if r['child_name'] == child_name
+        )
+        sections += f"""
+                <div style="background-color: #f0f7ff; padding: 15px; border-left: 4px solid #667eea; margin: 20px 0;">
+                    <h3 style="margin-top: 0;">{child_name}</h3>
+                    {rows}
+                </div>"""
+
+    content = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #667eea;">Vaccination Reminder</h2>
+                <p>Hi,</p>
+                <p>The following vaccinations are coming up:</p>{sections}
+                <p>Please schedule an appointment with your pediatrician to ensure your child's health and protection.</p>
+                <p>Best regards,<br>KinderCare Team</p>
+            </div>
+        </body>
+    </html>
+    """
+    return subject, content
+
+
+TEMPLATES: Dict[str, Callable[[Dict], Tuple[str, str]]] = {
+    VACCINATION_REMINDER: _vaccination_reminder,
+    HEALTH_UPDATE: _health_update,
+    VACCINATION_DIGEST: _vaccination_digest,
+}
+
+
+def render(template: str, params: Dict) -> Tuple[str, str]:
+    """Subject and HTML content of a template; raises ValueError for an unknown id."""
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown email template: {template}")
+    return TEMPLATES[template](params)
+
+
+def digest_params(reminders: List[Dict]) -> Dict:
+    """Parameters of VACCINATION_DIGEST for reminders with child_name, vaccine_name and due_date."""
+    return {"reminders": [{field: r[field] for field in DIGEST_FIELDS} for r in reminders]}
+
+
+def encode_params(params: Dict) -> str:
+    """Compact JSON for the params column."""
+    return json.dumps(params, ensure_ascii=False, separators=(",", ":"))
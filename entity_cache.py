@@ -0,0 +1,222 @@
+"""Read-through cache for child profiles, vaccinations, health events and reminder settings.
+
+database.py and user_database.py route their per-child reads through
+cached(). Entries belong to a group, (kind, id) such as ("vaccinations",
+child_id), and every write function calls invalidate() for the groups it
+changes, so the next read goes back to SQLite.
+
+Two levels:
+
+- a process-wide LRU shared by all sessions, which hands out copies so a
+  caller mutating a result cannot corrupt the cache;
+- a request-scoped identity map (app.py calls begin_request() at the top of
+  every script run) that returns the same object for repeated reads within
+  one render without touching the shared cache at all.
+
+Several server processes can share the SQLite files, so entries can also go
+stale through another process's writes. Each database keeps a
+cache_generations table (kind, entity_id, generation) that triggers bump in
+the writing transaction. Before serving a shared entry, cached() calls
+sync(): PRAGMA data_version tells in a few microseconds whether any other
+connection committed to the file since this thread last looked; only then
+are the generations above the process's watermark read and exactly those
+groups dropped.
+
+get_stats() reports hits per level, misses and invalidations.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", 4096))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Hashable, object]" = OrderedDict()
+_groups: Dict[Tuple, set] = {}
+# Bumped by invalidate(); a load that raced with an invalidation is not stored
+_versions: Dict[Tuple, int] = {}
+_stats = {"request_hits": 0, "hits": 0, "misses": 0, "invalidations": 0, "remote_invalidations": 0}
+_local = threading.local()
+_MISSING = object()
+
+# name -> connection getter of each database with a cache_generations table
+_sources: Dict[str, Callable] = {}
+# name -> (getter, database path) it was registered with
+_registrations: Dict[str, Tuple[Callable, str]] = {}
+# name -> highest generation this process has applied
+_watermarks: Dict[str, int] = {}
+# Groups whose cached data is derived from another kind's rows
+_DERIVED_KINDS = {"vaccinations": ("summary",), "health_events": ("summary",)}
+
+
+def create_generation_table(cursor):
+    """Migration step: the per-database table of change generations."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_generations (
+            kind TEXT NOT NULL,
+            entity_id INTEGER,
+            generation INTEGER NOT NULL,
+            PRIMARY KEY (kind, entity_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cache_generations_generation
+        ON cache_generations(generation)
+    """)
+
+
+def create_generation_triggers(cursor, table: str, kind: str, id_column: str):
+    """Migration step: bump the (kind, row.id_column) generation on every write to `table`."""
+    for event, rows in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+        bumps = "".join(f"""
+            INSERT INTO cache_generations (kind, entity_id, generation)
+            VALUES ('{kind}', {row}.{id_column},
+                    (SELECT COALESCE(MAX(generation), 0) + 1 FROM cache_generations))
+            ON CONFLICT (kind, entity_id) DO UPDATE SET generation = excluded.generation;"""
+            for row in rows)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_cache_generation_{table}_{kind}_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN{bumps}
+            END
+        """)
+
+
+def register_source(name: str, get_connection: Callable, path: str):
+    """Have cached() follow the cache_generations table of the database at `path`.
+    
+    Registering the same getter and path again (init_database() runs on every
+    Streamlit rerun) changes nothing; a different one starts over from an
+    empty cache on the next sync().
+    """
+    with _lock:
+        if _registrations.get(name) == (get_connection, path):
+            return
+        _registrations[name] = (get_connection, path)
+        _sources[name] = get_connection
+        _watermarks.pop(name, None)
+    _local.data_versions = None
+
+
+def sync():
+    """Drop entries that other processes changed since this process last looked."""
+    seen = getattr(_local, "data_versions", None)
+    if seen is None:
+        seen = _local.data_versions = {}
+    for name, get_connection in list(_sources.items()):
+        conn = get_connection()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if seen.get(name) == (id(conn), data_version):
+            continue
+        seen[name] = (id(conn), data_version)
+        
+        with _lock:
+            watermark = _watermarks.get(name)
+        if watermark is None:
+            # First look: nothing tells which cached entries are still current
+            row = conn.execute("SELECT COALESCE(MAX(generation), 0) FROM cache_generations").fetchone()
+            clear()
+            with _lock:
+                _watermarks.setdefault(name, row[0])
+            continue
+        
+        changes = conn.execute("""
+            SELECT kind, entity_id, generation FROM cache_generations
+            WHERE generation > ? ORDER BY generation
+        """, (watermark,)).fetchall()
+        for kind, entity_id, generation in changes:
+            invalidate(kind, entity_id, remote=True)
+            for derived in _DERIVED_KINDS.get(kind, ()):
+                invalidate(derived, entity_id, remote=True)
+            if kind == "children":
+                invalidate("children", None, remote=True)
+        if changes:
+            with _lock:
+                _watermarks[name] = max(_watermarks.get(name, 0), changes[-1][2])
+
+
+def _copy(value):
+    # Cached values are rows (dicts of scalars or read-only VaccinationRecords) or lists of rows
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def begin_request():
+    """Start a new identity map for the calling thread (one per script run)."""
+    _local.identity = {}
+
+
+def end_request():
+    """Drop the calling thread's identity map."""
+    _local.identity = None
+
+
+def cached(group: Tuple, key: Hashable, loader: Callable):
+    """Return the cached value for `key` in `group`, calling loader() on a miss."""
+    full_key = (group, key)
+    identity = getattr(_local, "identity", None)
+    if identity is not None and full_key in identity:
+        with _lock:
+            _stats["request_hits"] += 1
+        return identity[full_key]
+
+    if _sources:
+        sync()
+    with _lock:
+        value = _entries.get(full_key, _MISSING)
+        if value is _MISSING:
+            _stats["misses"] += 1
+            version = _versions.get(group, 0)
+        else:
+            _entries.move_to_end(full_key)
+            _stats["hits"] += 1
+            value = _copy(value)
+
+    if value is _MISSING:
+        value = loader()
+        with _lock:
+            if _versions.get(group, 0) == version:
+                _entries[full_key] = _copy(value)
+                _groups.setdefault(group, set()).add(full_key)
+            while len(_entries) > MAX_ENTRIES:
+                evicted, _ = _entries.popitem(last=False)
+                _groups.get(evicted[0], set()).discard(evicted)
+
+    if identity is not None:
+        identity[full_key] = value
+    return value
+
+
+def invalidate(kind: str, entity_id, remote: bool = False):
+    """Drop every cached entry of the (kind, entity_id) group, here and in this request."""
+    group = (kind, entity_id)
+    with _lock:
+        _versions[group] = _versions.get(group, 0) + 1
+        for full_key in _groups.pop(group, set()):
+            _entries.pop(full_key, None)
+        _stats["remote_invalidations" if remote else "invalidations"] += 1
+    identity = getattr(_local, "identity", None)
+    if identity:
+        for full_key in [k for k in identity if k[0] == group]:
+            del identity[full_key]
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _groups.clear()
+    if getattr(_local, "identity", None):
+        _local.identity.clear()
+
+
+def get_stats() -> Dict:
+    """Hit/miss counters and the overall hit rate of both cache levels."""
+    with _lock:
+        stats = dict(_stats, entries=len(_entries))
+    lookups = stats["request_hits"] + stats["hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["request_hits"] + stats["hits"]) / lookups if lookups else 0.0
+    return stats
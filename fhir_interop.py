@@ -0,0 +1,497 @@
+"""FHIR R4 Patient/Immunization import and export for child profiles and vaccinations.
+
+    python fhir_interop.py export --user-id 3 --format ndjson -o kindercare.ndjson
+    python fhir_interop.py export --user-id 3 --format bundle -o bundle.json
+    python fhir_interop.py import Patient.ndjson Immunization.ndjson --user-email clinic@example.com
+
+Mapping:
+
+- child_profiles <-> Patient: id and a KinderCare identifier, name,
+  gender, birthDate, and the vaccination guideline as an extension;
+- completed vaccinations <-> Immunization: vaccineCode (the guideline's
+  vaccine_code), occurrenceDateTime (administered_date), lotNumber
+  (batch_number), performer (administered_by) and note (notes). Scheduled
+  doses that have not been given are not exported.
+
+Both directions stream. Exports are generators of byte chunks read from
+cursors, as in data_export. Imports read bulk-data NDJSON or a Bundle with
+json.JSONDecoder.raw_decode over a bounded buffer, one resource at a time,
+so a multi-gigabyte file is never held in memory; only the map from Patient
+references to child ids grows, with the number of patients.
+
+Imported Patients are matched to the account's children by KinderCare
+identifier, then by name and birth date; unmatched ones are created with
+the schedule of their guideline. Immunizations are written in chunks with
+db.upsert_immunizations, which deduplicates on vaccine code and date.
+Patients must come before the Immunizations that reference them, e.g. by
+importing Patient.ndjson before Immunization.ndjson.
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+from datetime import date
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+import database as db
+import user_database as udb
+import data_export
+import roster_import
+from vaccination_guidelines import DEFAULT_GUIDELINE, GUIDELINE_FILES, get_schedule_for_guideline
+
+SYSTEM_BASE = os.getenv("FHIR_SYSTEM_BASE", "urn:kindercare")
+CHILD_ID_SYSTEM = f"{SYSTEM_BASE}:child-id"
+VACCINE_SYSTEM = f"{SYSTEM_BASE}:vaccine-code"
+GUIDELINE_EXTENSION = f"{SYSTEM_BASE}:vaccination-guideline"
+
+FORMATS = ("ndjson", "bundle")
+MIME_TYPES = {"ndjson": "application/fhir+ndjson", "bundle": "application/fhir+json"}
+# Resources per import transaction
+CHUNK_SIZE = int(os.getenv("FHIR_IMPORT_CHUNK_SIZE", 1000))
+READ_CHARS = 64 * 1024
+# A single resource larger than this is rejected instead of buffered
+MAX_RESOURCE_CHARS = 16 * 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+
+_FHIR_GENDERS = {"Male": "male", "Female": "female", "Other": "other"}
+_NON_SPACE = re.compile(r"\S")
+
+
+def patient_resource(child: Dict) -> Dict:
+    """The FHIR Patient for a child_profiles row."""
+    return {
+        "resourceType": "Patient",
+        "id": str(child["id"]),
+        "identifier": [{"system": CHILD_ID_SYSTEM, "value": str(child["id"])}],
+        "name": [{"text": child["name"]}],
+        "gender": _FHIR_GENDERS.get(child.get("gender"), "unknown"),
+        "birthDate": str(child["date_of_birth"]),
+        "extension": [{"url": GUIDELINE_EXTENSION, "valueString": child["country_guideline"]}],
+    }
+
+
+def immunization_resource(vaccination: Dict) -> Dict:
+    """The FHIR Immunization for a completed vaccinations row."""
+    resource = {
+        "resourceType": "Immunization",
+        "id": str(vaccination["id"]),
+        "status": "completed",
+        "vaccineCode": {
+            "coding": [{"system": VACCINE_SYSTEM, "code": vaccination["vaccine_code"],
+                        "display": vaccination["vaccine_name"]}],
+            "text": vaccination["vaccine_name"],
+        },
+        "patient": {"reference": f"Patient/{vaccination['child_id']}"},
+        "occurrenceDateTime": str(vaccination["administered_date"]),
+    }
+    if vaccination.get("batch_number"):
+        resource["lotNumber"] = vaccination["batch_number"]
+    if vaccination.get("administered_by"):
+        resource["performer"] = [{"actor": {"display": vaccination["administered_by"]}}]
+    if vaccination.get("notes"):
+        resource["note"] = [{"text": vaccination["notes"]}]
+    return resource
+
+
+def _export_resources(conn, user_id: int) -> Iterator[Dict]:
+    for child in data_export.iter_records(conn, "children", user_id):
+        yield patient_resource(child)
+    for vaccination in data_export.iter_records(conn, "vaccinations", user_id):
+        if vaccination["status"] == "completed" and vaccination["administered_date"]:
+            yield immunization_resource(vaccination)
+
+
+def iter_ndjson(user_id: int) -> Iterator[bytes]:
+    """Patients, then Immunizations, one resource per line."""
+    with data_export.read_snapshot() as conn:
+        yield from data_export.chunked(
+            (json.dumps(resource) + "\n").encode("utf-8") for resource in _export_resources(conn, user_id)
+        )
+
+
+def iter_bundle(user_id: int) -> Iterator[bytes]:
+    """A collection Bundle of the Patients and Immunizations."""
+    def pieces(conn):
+        yield b'{"resourceType": "Bundle", "type": "collection", "entry": ['
+        separator = b"\n"
+        for resource in _export_resources(conn, user_id):
+            yield separator + json.dumps({"resource": resource}).encode("utf-8")
+            separator = b",\n"
+        yield b"\n]}\n"
+
+    with data_export.read_snapshot() as conn:
+        yield from data_export.chunked(pieces(conn))
+
+
+def iter_export(fmt: str, user_id: int) -> Iterator[bytes]:
+    if fmt == "ndjson":
+        return iter_ndjson(user_id)
+    if fmt == "bundle":
+        return iter_bundle(user_id)
+    raise ValueError(f"Unknown FHIR format: {fmt}")
+
+
+class _JsonReader:
+    """JSON values read incrementally from a text stream with raw_decode over a bounded buffer."""
+
+    def __init__(self, text):
+        self._text = text
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, chars: int = READ_CHARS) -> bool:
+        """Append at least `chars` more characters (fewer at the end of the input)."""
+        if self._eof:
+            return False
+        pieces = [self._buffer[self._pos:]]
+        wanted = chars
+        while wanted > 0:
+            data = self._text.read(max(wanted, READ_CHARS))
+            if not data:
+                self._eof = True
+                break
+            pieces.append(data)
+            wanted -= len(data)
+        if wanted == chars:
+            return False
+        # Drop the consumed part while growing the buffer, with one join per fill
+        self._buffer = "".join(pieces)
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """The next non-whitespace character, or '' at the end of the input."""
+        while True:
+            match = _NON_SPACE.search(self._buffer, self._pos)
+            if match:
+                self._pos = match.start()
+                return self._buffer[self._pos]
+            self._pos = len(self._buffer)
+            if not self._fill():
+                return ""
+
+    def accept(self, char: str) -> bool:
+        if self.peek() != char:
+            return False
+        self._pos += 1
+        return True
+
+    def expect(self, char: str):
+        if not self.accept(char):
+            raise ValueError(f"expected {char!r} in the JSON input")
+
+    def value(self, line_mode: bool = False):
+        """Decode the next value; in line mode an invalid line is skipped before raising."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                line_end = self._buffer.find("\n", self._pos) if line_mode else -1
+                if line_end >= 0 or self._eof:
+                    self._pos = line_end + 1 if line_end >= 0 else len(self._buffer)
+                    raise ValueError(f"invalid JSON ({e.msg})")
+                pending = len(self._buffer) - self._pos
+                if pending > MAX_RESOURCE_CHARS:
+                    raise ValueError(f"resource larger than {MAX_RESOURCE_CHARS} characters")
+                # Double the pending text so a large resource is copied and
+                # decoded O(log n) times rather than once per READ_CHARS
+                self._fill(min(pending, MAX_RESOURCE_CHARS + 1 - pending))
+                continue
+            # A value ending exactly at the end of the buffer (e.g. a number) may continue
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def _bundle_entries(reader: _JsonReader) -> Iterator[Dict]:
+    # Walk the Bundle's top-level keys and decode "entry" one element at a time
+    reader.expect("{")
+    if reader.accept("}"):
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "entry":
+            reader.expect("[")
+            if not reader.accept("]"):
+                while True:
+                    yield reader.value()
+                    if not reader.accept(","):
+                        break
+                reader.expect("]")
+        else:
+            value = reader.value()
+            if key == "resourceType" and value != "Bundle":
+                raise ValueError("the JSON document is not a FHIR Bundle")
+        if not reader.accept(","):
+            reader.expect("}")
+            return
+
+
+def iter_resources(stream: BinaryIO, fmt: str,
+                   on_error: Optional[Callable[[str], None]] = None) -> Iterator[Tuple[Dict, Optional[str]]]:
+    """(resource, fullUrl) pairs from NDJSON or a Bundle, read incrementally.
+
+    Invalid NDJSON lines are passed to on_error and skipped (without
+    on_error they raise ValueError); a malformed Bundle always raises.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    try:
+        reader = _JsonReader(text)
+        if fmt == "bundle":
+            for entry in _bundle_entries(reader):
+                if isinstance(entry, dict) and isinstance(entry.get("resource"), dict):
+                    yield entry["resource"], entry.get("fullUrl")
+            return
+
+        number = 0
+        while reader.peek():
+            number += 1
+            try:
+                resource = reader.value(line_mode=True)
+            except ValueError as e:
+                if on_error is None:
+                    raise
+                on_error(f"Line {number}: {e}")
+                continue
+            if isinstance(resource, dict) and resource.get("resourceType") == "Bundle":
+                for entry in resource.get("entry") or []:
+                    if isinstance(entry, dict) and isinstance(entry.get("resource"), dict):
+                        yield entry["resource"], entry.get("fullUrl")
+            else:
+                yield resource, None
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+
+# Raised by a resource that is valid JSON but not shaped as FHIR expects
+# (e.g. "name": "Bob" or "patient": "Patient/1"); reported and skipped
+_MALFORMED_RESOURCE = (ValueError, TypeError, AttributeError, KeyError)
+
+
+def _resource_error(number: int, resource_type: str, error: Exception) -> str:
+    if isinstance(error, ValueError):
+        return f"Resource {number}: {error}"
+    return f"Resource {number}: malformed {resource_type} ({type(error).__name__}: {error})"
+
+
+def _patient_child(resource: Dict, default_guideline: str, today: date) -> Dict:
+    names = resource.get("name") or [{}]
+    name = names[0].get("text") or " ".join(names[0].get("given", []) + [names[0].get("family", "")]).strip()
+    guideline = next((extension.get("valueString") for extension in resource.get("extension", [])
+                      if extension.get("url") == GUIDELINE_EXTENSION), None)
+    gender = {fhir: ours for ours, fhir in _FHIR_GENDERS.items()}.get(resource.get("gender"))
+    return roster_import.validate_row({
+        "name": name,
+        "date_of_birth": resource.get("birthDate"),
+        "country_guideline": guideline,
+        "gender": gender,
+    }, default_guideline, today)
+
+
+def _kindercare_child_id(resource: Dict) -> Optional[int]:
+    for identifier in resource.get("identifier") or []:
+        if identifier.get("system") == CHILD_ID_SYSTEM and str(identifier.get("value", "")).isdigit():
+            return int(identifier["value"])
+    return None
+
+
+def _guideline_codes() -> Dict[str, Tuple[str, str]]:
+    """Lowercase vaccine code -> (code, name) over every guideline."""
+    codes = {}
+    for guideline in GUIDELINE_FILES:
+        for vaccine in get_schedule_for_guideline(guideline):
+            codes.setdefault(vaccine["id"].lower(), (vaccine["id"], vaccine["name"]))
+    return codes
+
+
+def _vaccine(concept: Dict, known_codes: Dict[str, Tuple[str, str]]) -> Tuple[str, str]:
+    codings = [coding for coding in concept.get("coding") or [] if coding.get("code")]
+    for coding in codings:
+        if coding.get("system") == VACCINE_SYSTEM:
+            return coding["code"], coding.get("display") or concept.get("text") or coding["code"]
+    for coding in codings:
+        if coding["code"].lower() in known_codes:
+            return known_codes[coding["code"].lower()]
+    # Other code systems (CVX, SNOMED CT) are kept as they are
+    if codings:
+        return codings[0]["code"], codings[0].get("display") or concept.get("text") or codings[0]["code"]
+    if concept.get("text"):
+        return concept["text"], concept["text"]
+    raise ValueError("Immunization has no vaccineCode")
+
+
+def _immunization_row(resource: Dict, child_id: int, known_codes: Dict) -> Optional[Dict]:
+    """The upsert_immunizations row for an Immunization, or None when it was not given."""
+    if resource.get("status", "completed") != "completed":
+        return None
+    occurrence = str(resource.get("occurrenceDateTime") or "")
+    try:
+        administered_date = date.fromisoformat(occurrence[:10])
+    except ValueError:
+        raise ValueError(f"occurrenceDateTime {occurrence!r} is not a date")
+    vaccine_code, vaccine_name = _vaccine(resource.get("vaccineCode") or {}, known_codes)
+    performers = [performer.get("actor", {}).get("display") for performer in resource.get("performer") or []]
+    notes = [note.get("text") for note in resource.get("note") or []]
+    return {
+        "child_id": child_id,
+        "vaccine_code": vaccine_code,
+        "vaccine_name": vaccine_name,
+        "administered_date": administered_date.isoformat(),
+        "batch_number": resource.get("lotNumber"),
+        "administered_by": "; ".join(p for p in performers if p) or None,
+        "notes": " ".join(n for n in notes if n) or None,
+    }
+
+
+def import_fhir(stream: BinaryIO, user_id: int, fmt: str = "ndjson",
+                default_guideline: str = DEFAULT_GUIDELINE, chunk_size: int = CHUNK_SIZE,
+                patients: Optional[Dict[str, int]] = None,
+                on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Import Patients and Immunizations for `user_id` from a binary stream.
+
+    `patients` maps Patient references to child ids; pass the same dict
+    when importing several files of one export. Returns (and passes to
+    on_progress after every chunk) the counts of resources read, patients
+    created and matched, doses completed, inserted, updated and already
+    present (duplicates), resources skipped and invalid, and the first
+    MAX_REPORTED_ERRORS error messages.
+    """
+    patients = {} if patients is None else patients
+    today = date.today()
+    known_codes = _guideline_codes()
+    summary = {"resources": 0, "patients_created": 0, "patients_matched": 0, "completed": 0,
+               "inserted": 0, "updated": 0, "duplicates": 0, "skipped": 0, "invalid": 0, "errors": []}
+    # (name, date of birth) -> (child, its Patient references) waiting to be created
+    new_children: Dict[Tuple, Tuple[Dict, List[str]]] = {}
+    immunizations: List[Tuple[int, Dict]] = []
+
+    def error(message: str):
+        summary["invalid"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append(message)
+
+    def add_patient(resource: Dict, full_url: Optional[str]):
+        references = [reference for reference in
+                      (f"Patient/{resource['id']}" if resource.get("id") else None, full_url) if reference]
+        child = udb.get_child(_kindercare_child_id(resource) or 0)
+        if not child or child["user_id"] != user_id:
+            new_child = _patient_child(resource, default_guideline, today)
+            child = udb.find_child(user_id, new_child["name"], new_child["date_of_birth"].isoformat())
+            if not child:
+                key = (new_child["name"], new_child["date_of_birth"])
+                new_children.setdefault(key, (new_child, []))[1].extend(references)
+                return
+        summary["patients_matched"] += 1
+        for reference in references:
+            patients[reference] = child["id"]
+
+    def flush():
+        if new_children:
+            entries = list(new_children.values())
+            children = [child for child, _ in entries]
+            child_ids = db.add_children_with_schedules(user_id, children,
+                                                       roster_import.build_doses(children, today))
+            for (_, references), child_id in zip(entries, child_ids):
+                for reference in references:
+                    patients[reference] = child_id
+            summary["patients_created"] += len(child_ids)
+            new_children.clear()
+
+        rows = []
+        for number, resource in immunizations:
+            try:
+                reference = (resource.get("patient") or {}).get("reference")
+                child_id = patients.get(reference)
+                if child_id is None:
+                    error(f"Resource {number}: unknown patient {reference!r}")
+                    continue
+                row = _immunization_row(resource, child_id, known_codes)
+            except _MALFORMED_RESOURCE as e:
+                error(_resource_error(number, "Immunization", e))
+                continue
+            if row is None:
+                summary["skipped"] += 1
+            else:
+                rows.append(row)
+        immunizations.clear()
+        if rows:
+            for key, count in db.upsert_immunizations(rows).items():
+                summary[key] += count
+        if on_progress:
+            on_progress(summary)
+
+    for resource, full_url in iter_resources(stream, fmt, error):
+        summary["resources"] += 1
+        number = summary["resources"]
+        resource_type = resource.get("resourceType") if isinstance(resource, dict) else None
+        if resource_type == "Patient":
+            try:
+                add_patient(resource, full_url)
+            except _MALFORMED_RESOURCE as e:
+                error(_resource_error(number, "Patient", e))
+        elif resource_type == "Immunization":
+            immunizations.append((number, resource))
+        else:
+            summary["skipped"] += 1
+        if len(new_children) + len(immunizations) >= chunk_size:
+            flush()
+    flush()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FHIR Patient/Immunization import and export")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write Patients and Immunizations")
+    import_parser = subparsers.add_parser("import", help="Read Patients and Immunizations")
+    import_parser.add_argument("paths", nargs="+", help="NDJSON or Bundle files, Patients first")
+    for command in (export_parser, import_parser):
+        scope = command.add_mutually_exclusive_group(required=True)
+        scope.add_argument("--user-id", type=int)
+        scope.add_argument("--user-email")
+        command.add_argument("--format", choices=FORMATS, default=None,
+                             help="ndjson or bundle (default: ndjson, or bundle for .json files)")
+    export_parser.add_argument("-o", "--output", default=None, help="Output file (default: standard output)")
+    import_parser.add_argument("--guideline", choices=sorted(GUIDELINE_FILES), default=DEFAULT_GUIDELINE,
+                               help="Guideline for new patients without one (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    user_id = args.user_id
+    if args.user_email:
+        account = udb.get_user_by_email(args.user_email)
+        if not account:
+            print(f"No account with email {args.user_email}", file=sys.stderr)
+            return 1
+        user_id = account["id"]
+
+    if args.command == "export":
+        fmt = args.format or ("bundle" if (args.output or "").endswith(".json") else "ndjson")
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in iter_export(fmt, user_id):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+        return 0
+
+    patients: Dict[str, int] = {}
+    for path in args.paths:
+        fmt = args.format or ("bundle" if path.endswith(".json") else "ndjson")
+        with open(path, "rb") as stream:
+            summary = import_fhir(stream, user_id, fmt, args.guideline, patients=patients)
+        for message in summary["errors"]:
+            print(message)
+        print(f"{path}: " + ", ".join(f"{key} {value}" for key, value in summary.items() if key != "errors"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
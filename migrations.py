@@ -0,0 +1,76 @@
+"""Versioned schema migrations for the SQLite databases.
+
+Each database module keeps an ordered MIGRATIONS list of functions that take
+a cursor. The database's PRAGMA user_version records how many of them have
+been applied; run_migrations applies the rest, each in its own transaction
+together with the version bump, so a failed migration leaves the schema at
+the previous version.
+
+Each module also has hot_queries(), built from the same SQL constants and
+query builders its functions run. Running this file (and
+tests/test_query_plans.py) checks with EXPLAIN QUERY PLAN that none of
+them scans a table or sorts in a temp b-tree:
+
+    python migrations.py
+"""
+import sqlite3
+import sys
+from typing import Callable, List, Sequence, Tuple
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn: sqlite3.Connection, migrations: Sequence[Callable]) -> int:
+    """Apply pending migrations in order and return the resulting schema version."""
+    for version, migration in enumerate(migrations, start=1):
+        if get_schema_version(conn) >= version:
+            continue
+        cursor = conn.cursor()
+        # IMMEDIATE takes the write lock first, so concurrent processes
+        # starting up at the same time apply each migration only once
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) < version:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
+
+
+def find_slow_plans(conn: sqlite3.Connection, queries: List[Tuple[str, str, object]]) -> List[str]:
+    """EXPLAIN each (name, sql, params) query and report full table scans and temp sorts."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    problems = []
+    for name, sql, params in queries:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            detail = row[-1]
+            words = detail.split()
+            # A virtual table (FTS5) "scan" is a lookup in its own index
+            scans_table = (len(words) >= 2 and words[0] == "SCAN" and words[1] in tables
+                           and "VIRTUAL TABLE" not in detail)
+            if scans_table or "USE TEMP B-TREE" in detail:
+                problems.append(f"{name}: {detail}")
+    return problems
+
+
+def main() -> int:
+    import database as db
+    import user_database as udb
+
+    problems = []
+    for module, conn in ((db, db.get_connection()), (udb, udb.get_user_connection())):
+        problems += find_slow_plans(conn, module.hot_queries())
+    for problem in problems:
+        print(f"Slow query plan: {problem}")
+    if not problems:
+        print("All hot queries use indexes")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,10 @@
-import smtplib
 import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import date, timedelta
 from typing import List, Dict, Optional
 import database as db
+import smtp_pool
 
 def get_upcoming_reminders(child_id: int) -> List[Dict]:
     vaccinations = db.get_vaccinations(child_id)
@@ -16,9 +16,6 @@ def get_upcoming_reminders(child_id: int) -> List[Dict]:
             continue
             
         due_date = vacc['due_date']
-        if isinstance(due_date, str):
-            due_date = date.fromisoformat(due_date)
-        
         days_until = (due_date - today).days
         
         if days_until == 7:
@@ -108,10 +105,8 @@ def send_email_reminder(to_email: str, child_name: str, reminders: List[Dict],
         msg.attach(MIMEText(text_content, 'plain'))
         msg.attach(MIMEText(html_content, 'html'))
         
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.sendmail(smtp_user, to_email, msg.as_string())
+        pool = smtp_pool.get_pool(smtp_server, smtp_port, smtp_user, smtp_password)
+        pool.send(smtp_user, to_email, msg.as_string())
         
         return True
     except Exception as e:
@@ -1,7 +1,7 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 import database as db
 from vaccination_guidelines import categorize_vaccinations, get_age_string
 from notifications import get_in_app_notifications
@@ -44,7 +44,7 @@ def render():
     st.session_state.selected_child_id = child_options[selected_name]
 
     child = db.get_child(st.session_state.selected_child_id)
-    vaccinations = db.get_vaccinations(st.session_state.selected_child_id)
+    summary = db.get_vaccination_summary(st.session_state.selected_child_id)
 
     notifications = get_in_app_notifications(st.session_state.selected_child_id)
     if notifications:
@@ -76,11 +76,9 @@ def render():
         </div>
         """, unsafe_allow_html=True)
 
-    categories = categorize_vaccinations(vaccinations)
-
     with col2:
-        total = len(vaccinations)
-        completed = len(categories['completed'])
+        total = summary['total']
+        completed = summary['completed']
         progress = (completed / total * 100) if total > 0 else 0
         st.markdown(f"""
         <div style="background: linear-gradient(135deg,#11998e,#38ef7d);
@@ -92,7 +90,7 @@ def render():
         """, unsafe_allow_html=True)
 
     with col3:
-        upcoming = len(categories['upcoming'])
+        upcoming = summary['upcoming']
         st.markdown(f"""
         <div style="background: linear-gradient(135deg,#ff9a56,#ff6a88);
                     padding:20px;border-radius:10px;color:white;">
@@ -113,7 +111,7 @@ def render():
         <div class="category-card" style="background:#E8F5E9;border-left:4px solid #81C784;">
             <h4 style="color:#2E7D32;margin-bottom:8px;">✓ Completed</h4>
             <p style="font-size:1.6rem;font-weight:bold;color:#81C784;margin:0;">
-                {len(categories['completed'])}
+                {summary['completed']}
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -123,7 +121,7 @@ def render():
         <div class="category-card" style="background:#E3F2FD;border-left:4px solid #64B5F6;">
             <h4 style="color:#1565C0;margin-bottom:8px;">➜ Upcoming</h4>
             <p style="font-size:1.6rem;font-weight:bold;color:#64B5F6;margin:0;">
-                {len(categories['upcoming'])}
+                {summary['upcoming']}
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -133,7 +131,7 @@ def render():
         <div class="category-card" style="background:#FFEBEE;border-left:4px solid #EF5350;">
             <h4 style="color:#C62828;margin-bottom:8px;">⚠️ Overdue</h4>
             <p style="font-size:1.6rem;font-weight:bold;color:#EF5350;margin:0;">
-                {len(categories['overdue'])}
+                {summary['overdue']}
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -143,7 +141,7 @@ def render():
         <div class="category-card" style="background:#FFF3E0;border-left:4px solid #FFB74D;">
             <h4 style="color:#E65100;margin-bottom:8px;">⏳ Pending</h4>
             <p style="font-size:1.6rem;font-weight:bold;color:#FFB74D;margin:0;">
-                {len(categories['pending'])}
+                {summary['pending']}
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -152,7 +150,9 @@ def render():
 
     st.markdown('<h2 style="color:#667eea;margin-top:2rem;">📊 Vaccination Analytics</h2>', unsafe_allow_html=True)
 
-    if vaccinations:
+    if summary['total']:
+        categories = categorize_vaccinations(db.get_sorted_vaccinations(st.session_state.selected_child_id))
+        
         status_colors = {
             'completed': '#81C784',
             'upcoming': '#64B5F6',
@@ -160,12 +160,7 @@ def render():
             'pending': '#FFB74D'
         }
         
-        status_counts = {
-            'completed': len(categories['completed']),
-            'upcoming': len(categories['upcoming']),
-            'overdue': len(categories['overdue']),
-            'pending': len(categories['pending'])
-        }
+        status_counts = {status: summary[status] for status in ('completed', 'upcoming', 'overdue', 'pending')}
         
         anal_col1, anal_col2 = st.columns(2)
         
@@ -218,12 +213,7 @@ def render():
         for category_name, vax_list in categories.items():
             for vax in vax_list:
                 due = vax.get('due_date')
-                if due and (isinstance(due, str) or isinstance(due, date)):
-                    if isinstance(due, str):
-                        try:
-                            due = datetime.fromisoformat(due).date()
-                        except:
-                            continue
+                if isinstance(due, date):
                     timeline_data.append({
                         'vaccine': vax['vaccine_name'],
                         'due_date': due,
@@ -272,12 +262,12 @@ def render():
         metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
         
         with metric_col1:
-            compliance_rate = (len(categories['completed']) / total * 100) if total > 0 else 0
+            compliance_rate = (completed / total * 100) if total > 0 else 0
             st.metric("Compliance Rate", f"{compliance_rate:.0f}%", 
-                     f"{len(categories['completed'])}/{total}")
+                     f"{completed}/{total}")
         
         with metric_col2:
-            overdue_count = len(categories['overdue'])
+            overdue_count = summary['overdue']
             st.metric("Overdue Vaccines", overdue_count, 
                      "⚠️ Need attention" if overdue_count > 0 else "All on track")
         
@@ -287,12 +277,8 @@ def render():
         
         with metric_col4:
             if categories['upcoming']:
-                next_vax = min(categories['upcoming'], 
-                             key=lambda x: datetime.fromisoformat(x['due_date']).date() 
-                             if isinstance(x['due_date'], str) else x['due_date'])
+                next_vax = min(categories['upcoming'], key=lambda x: x['due_date'])
                 due_date = next_vax['due_date']
-                if isinstance(due_date, str):
-                    due_date = datetime.fromisoformat(due_date).date()
                 days_until = (due_date - date.today()).days
                 st.metric("Next Vaccine Due", f"{days_until} days", 
                          next_vax['vaccine_name'][:20])
@@ -1,36 +1,8 @@
 import streamlit as st
-import json
-import os
+from disease_knowledge_base import get_knowledge_base
 
-def load_diseases_data():
-    
-    # Resolve project root directory
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    json_path = os.path.join(BASE_DIR, "data", "disease_information_database.json")
-
-    if not os.path.exists(json_path):
-        st.error(f"Disease database file not found at: {json_path}")
-        return []
-
-    try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as e:
-        st.error(f"Error reading disease database: {e}")
-        return []
-
-    # Support multiple JSON structures
-    if isinstance(data, dict):
-        if "diseases" in data and isinstance(data["diseases"], list):
-            return data["diseases"]
-        else:
-            # Convert dict-based structure to list
-            return [{"name": k, **v} for k, v in data.items() if isinstance(v, dict)]
-
-    if isinstance(data, list):
-        return data
-
-    return []
+# Upper bound on expanders rendered per run, so the page stays fast for large databases
+MAX_RESULTS = 50
 
 
 def render():
@@ -54,16 +26,30 @@ def render():
     st.markdown('<h1 style="color:#667eea;margin-top:0;">🏥 Common Child Diseases & Remedies</h1>', unsafe_allow_html=True)
     st.markdown('<p style="color:#000;">Learn about common childhood illnesses, their symptoms, and recommended treatments</p>', unsafe_allow_html=True)
 
-    diseases_data = load_diseases_data()
+    knowledge_base = get_knowledge_base()
 
-    if not diseases_data:
+    if not knowledge_base or not knowledge_base.diseases:
         st.warning("Unable to load disease information. Please try again later.")
         return
 
+    query = st.text_input(
+        "Search diseases",
+        placeholder="Search by name, symptom, cause or remedy (e.g. fever, rash, cough)"
+    )
+
+    if query.strip():
+        diseases_data = knowledge_base.search(query, limit=MAX_RESULTS)
+        if not diseases_data:
+            st.info(f"No diseases match \"{query}\".")
+    else:
+        diseases_data = knowledge_base.diseases[:MAX_RESULTS]
+        if len(knowledge_base.diseases) > MAX_RESULTS:
+            st.caption(f"Showing {MAX_RESULTS} of {len(knowledge_base.diseases)} diseases. Search to find others.")
+
     st.divider()
 
     for disease in diseases_data:
-        name = disease.get("name") or disease.get("disease_name", "Unknown Disease")
+        name = disease["name"]
         emoji = disease.get("emoji", "🩺")
 
         symptoms = disease.get("symptoms", [])
@@ -1,9 +1,48 @@
 import streamlit as st
+import html
 from datetime import date, datetime
 import plotly.graph_objects as go
 import database as db
 from vaccination_guidelines import get_age_string
 
+# Category filter -> event_type argument of db.get_timeline_page
+FILTER_EVENT_TYPES = {
+    "All": None,
+    "Vaccines": "vaccination",
+    "Illness": "illness",
+    "Symptom": "symptom",
+    "Doctor Visit": "doctor_visit",
+}
+
+EVENT_ICONS = {
+    'illness': '🤒',
+    'symptom': '🌡️',
+    'doctor_visit': '👨‍⚕️',
+    'milestone': '🎯',
+    'other': '📝'
+}
+
+# Snippet highlight marks, replaced by <mark> after the text is escaped
+SNIPPET_MARKS = ("\x02", "\x03")
+
+def timeline_item(row):
+    """Display fields for a db.get_timeline_page row."""
+    if row['kind'] == 'vaccination':
+        return {
+            'date': date.fromisoformat(row['item_date']),
+            'title': f"Vaccine: {row['title']}",
+            'description': row['description'] or '',
+            'icon': '💉',
+            'color': '#4caf50'
+        }
+    return {
+        'date': date.fromisoformat(row['item_date']),
+        'title': row['title'],
+        'description': row['description'] or '',
+        'icon': EVENT_ICONS.get(row['item_type'], '📝'),
+        'color': '#667eea'
+    }
+
 def render():
     st.markdown("""
     <style>
@@ -40,8 +79,6 @@ def render():
     st.session_state.selected_child_id = child_options[selected_name]
     
     child = db.get_child(st.session_state.selected_child_id)
-    vaccinations = db.get_vaccinations(st.session_state.selected_child_id)
-    health_events = db.get_health_events(st.session_state.selected_child_id)
     
     st.markdown("---")
     
@@ -53,69 +90,45 @@ def render():
     if st.session_state.get('show_add_event', False):
         render_add_event_form(st.session_state.selected_child_id)
     
-    filter_options = ["All", "Vaccines", "Illness", "Symptom", "Doctor Visit"]
-    selected_filter = st.selectbox("Filter by Category", filter_options)
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        search_text = st.text_input(
+            "🔎 Search health events",
+            placeholder='e.g. fever, "runny nose", bronch*',
+            key="timeline_search"
+        )
+    with col2:
+        selected_filter = st.selectbox("Filter by Category", list(FILTER_EVENT_TYPES))
     
     st.markdown("---")
     
-    timeline_items = []
-    
-    completed_vaccines = [v for v in vaccinations if v['status'] == 'completed']
-    for vacc in completed_vaccines:
-        administered_date = vacc.get('administered_date')
-        if administered_date:
-            if isinstance(administered_date, str):
-                administered_date = date.fromisoformat(administered_date)
-            timeline_items.append({
-                'date': administered_date,
-                'type': 'Vaccines',
-                'title': f"Vaccine: {vacc['vaccine_name']}",
-                'description': vacc.get('notes', ''),
-                'icon': '💉',
-                'color': '#4caf50'
-            })
-    
-    for event in health_events:
-        event_date = event['event_date']
-        if isinstance(event_date, str):
-            event_date = date.fromisoformat(event_date)
-        
-        event_type = event['event_type']
-        icon_map = {
-            'illness': '🤒',
-            'symptom': '🌡️',
-            'doctor_visit': '👨‍⚕️',
-            'milestone': '🎯',
-            'other': '📝'
-        }
-        
-        timeline_items.append({
-            'date': event_date,
-            'type': event_type.title(),
-            'title': event['title'],
-            'description': event.get('description', ''),
-            'icon': icon_map.get(event_type, '📝'),
-            'color': '#667eea'
-        })
-    
-    if selected_filter != "All":
-        timeline_items = [item for item in timeline_items if item['type'] == selected_filter]
-    
-    timeline_items.sort(key=lambda x: x['date'], reverse=True)
-    
-    if not timeline_items:
+    if search_text.strip():
+        render_search_results(st.session_state.selected_child_id, search_text,
+                              FILTER_EVENT_TYPES[selected_filter])
+        return
+    
+    # Cursors of the pages viewed so far; reset when the child or filter changes
+    page_key = (st.session_state.selected_child_id, selected_filter)
+    if st.session_state.get('timeline_page_key') != page_key:
+        st.session_state.timeline_page_key = page_key
+        st.session_state.timeline_cursors = [None]
+    cursors = st.session_state.timeline_cursors
+    
+    page = db.get_timeline_page(
+        st.session_state.selected_child_id,
+        event_type=FILTER_EVENT_TYPES[selected_filter],
+        before=cursors[-1]
+    )
+    
+    if not page['items']:
         st.info("No health events recorded yet. Click 'Add Health Event' to get started!")
     else:
-        for idx, item in enumerate(timeline_items):
+        for row in page['items']:
+            item = timeline_item(row)
             date_str = item['date'].strftime('%B %d, %Y')
             
-            # Find the event ID for deletion (only for health events, not vaccines)
-            event_id = None
-            if item['type'] != 'Vaccines':
-                for event in health_events:
-                    if event['title'] == item['title'] and event['event_date'] == item['date'].isoformat():
-                        event_id = event['id']
-                        break
+            # Only health events can be deleted here, not vaccines
+            event_id = row['id'] if row['kind'] == 'event' else None
             
             col1, col2 = st.columns([0.95, 0.05])
             
@@ -151,6 +164,45 @@ def render():
                     if st.button("Cancel", key=f"confirm_delete_no_{event_id}"):
                         st.session_state[f"confirm_delete_event_{event_id}"] = False
                         st.rerun()
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(cursors) > 1 and st.button("← Newer", width='stretch'):
+            cursors.pop()
+            st.rerun()
+    with col3:
+        if page['next_cursor'] and st.button("Older →", width='stretch'):
+            cursors.append(page['next_cursor'])
+            st.rerun()
+
+def render_search_results(child_id, search_text, event_type):
+    """Health events matching the search box, best match first."""
+    if event_type == "vaccination":
+        st.info("Search covers health events; choose another category to search.")
+        return
+    results = db.search_health_events(child_id, search_text, event_type=event_type, marks=SNIPPET_MARKS)
+    if not results:
+        st.info("No health events match your search.")
+        return
+    
+    st.caption(f"{len(results)} matching event{'s' if len(results) != 1 else ''}, best match first"
+               if len(results) < db.SEARCH_LIMIT else f"Top {db.SEARCH_LIMIT} matching events")
+    for event in results:
+        snippet = html.escape(event['snippet'] or '')
+        snippet = snippet.replace(SNIPPET_MARKS[0], '<mark>').replace(SNIPPET_MARKS[1], '</mark>')
+        date_str = date.fromisoformat(event['event_date']).strftime('%B %d, %Y')
+        st.markdown(f"""
+        <div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea; margin-bottom: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
+            <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 5px;">
+                <span style="font-size: 1.5rem;">{EVENT_ICONS.get(event['event_type'], '📝')}</span>
+                <div>
+                    <div style="font-weight: 700; color: #333;">{html.escape(event['title'])}</div>
+                    <div style="font-size: 0.85rem; color: #999;">{date_str}</div>
+                </div>
+            </div>
+            <div style="color: #666; font-size: 0.9rem; margin-left: 34px;">{snippet}</div>
+        </div>
+        """, unsafe_allow_html=True)
 
 def render_add_event_form(child_id):
     st.markdown('<h2 style="color: #1a1a1a; margin-top: 0; margin-bottom: 1rem; font-weight: 700;">➕ Add New Health Event</h2>', unsafe_allow_html=True)
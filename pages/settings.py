@@ -1,8 +1,15 @@
 import streamlit as st
 from datetime import date, datetime
 import os
+import tempfile
 import database as db
-from vaccination_guidelines import generate_vaccination_schedule
+import data_export
+import entity_cache
+import roster_import
+from vaccination_guidelines import (
+    generate_vaccination_schedule, parse_received_vaccines, apply_received_vaccines,
+    GUIDELINE_FILES, DEFAULT_GUIDELINE
+)
 
 def render():
     st.markdown("""
@@ -88,7 +95,7 @@ def render():
     st.markdown('<h1 style="color: #667eea; margin-top: 0;">⚙️ Settings</h1>', unsafe_allow_html=True)
     st.markdown('<p style="color: #000; margin-bottom: 1.5rem;">Manage your child profiles, notification preferences, and account settings</p>', unsafe_allow_html=True)
     
-    tab1, tab2, tab3, tab4 = st.tabs(["Child Profiles", "Notifications", "About", "Account"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Child Profiles", "Notifications", "Data", "About", "Account"])
     
     with tab1:
         render_child_profiles()
@@ -97,9 +104,12 @@ def render():
         render_notification_settings()
     
     with tab3:
-        render_about()
+        render_data_management()
     
     with tab4:
+        render_about()
+    
+    with tab5:
         render_account()
 
 def render_child_profiles():
@@ -111,6 +121,9 @@ def render_child_profiles():
     if st.session_state.get('show_add_child', False):
         render_add_child_form()
     
+    with st.expander("Import a Roster (CSV or JSON Lines)"):
+        render_roster_import()
+    
     user_id = st.session_state.get('user_id')
     children = db.get_all_children(user_id=user_id)
     
@@ -180,43 +193,15 @@ def render_add_child_form():
                         allergies=allergies if allergies else None
                     )
                     
-                    received_list = []
-                    if received_vaccines:
-                        received_list = [v.strip().lower() for v in received_vaccines.split(',') if v.strip()]
-                    
-                    schedule = generate_vaccination_schedule(dob, country)
-                    for vacc in schedule:
-                        is_received = any(
-                            recv in vacc['vaccine_name'].lower() or 
-                            vacc['vaccine_name'].lower() in recv or
-                            recv in vacc['vaccine_code'].lower()
-                            for recv in received_list
-                        )
-                        
-                        vacc_id = db.add_vaccination(
-                            child_id=child_id,
-                            vaccine_name=vacc['vaccine_name'],
-                            vaccine_code=vacc['vaccine_code'],
-                            due_date=vacc['due_date'].isoformat(),
-                            status='completed' if is_received else 'pending'
-                        )
-                        
-                        if is_received:
-                            db.update_vaccination_status(
-                                vacc_id,
-                                status='completed',
-                                administered_date=date.today().isoformat(),
-                                notes='Marked as already received during profile creation'
-                            )
+                    received_list = parse_received_vaccines(received_vaccines)
+                    schedule = apply_received_vaccines(
+                        generate_vaccination_schedule(dob, country), received_list, date.today()
+                    )
+                    db.add_vaccination_schedule(child_id, schedule)
                     
                     st.session_state.selected_child_id = child_id
                     st.session_state.show_add_child = False
-                    completed_count = len([v for v in schedule if any(
-                        recv in v['vaccine_name'].lower() or 
-                        v['vaccine_name'].lower() in recv or
-                        recv in v['vaccine_code'].lower()
-                        for recv in received_list
-                    )]) if received_list else 0
+                    completed_count = len([v for v in schedule if v.get('status') == 'completed'])
                     if completed_count > 0:
                         st.success(f"Child profile for {name} created! {completed_count} vaccine(s) marked as completed.")
                     else:
@@ -227,6 +212,38 @@ def render_add_child_form():
                 st.session_state.show_add_child = False
                 st.rerun()
 
+def render_roster_import():
+    st.caption(
+        "One child per row with name and date_of_birth (YYYY-MM-DD), and optionally "
+        "country_guideline, gender, blood_group, allergies and received_vaccines "
+        "(comma-separated). Uploading the same file again after an interruption "
+        "continues where the import stopped."
+    )
+    uploaded = st.file_uploader("Roster file", type=["csv", "jsonl", "ndjson"], key="roster_upload")
+    guidelines = list(GUIDELINE_FILES)
+    guideline = st.selectbox("Guideline for rows without one", guidelines,
+                             index=guidelines.index(DEFAULT_GUIDELINE), key="roster_guideline")
+    
+    if uploaded and st.button("Import Roster", type="primary"):
+        progress_bar = st.progress(0.0, text="Importing roster...")
+        
+        def report(progress):
+            fraction = progress['bytes_read'] / progress['bytes_total'] if progress['bytes_total'] else 0.0
+            progress_bar.progress(min(fraction, 1.0),
+                                  text=f"{progress['children_created']} children imported "
+                                       f"({progress['rows_per_second']} rows/s)")
+        
+        result = roster_import.import_roster(
+            uploaded, st.session_state.get('user_id'), uploaded.name,
+            source_size=uploaded.size, default_guideline=guideline, on_progress=report
+        )
+        progress_bar.progress(1.0, text="Import finished")
+        st.success(f"Imported {result['children_created']} children with "
+                   f"{result['vaccinations_created']} scheduled vaccinations.")
+        if result['rows_invalid']:
+            st.warning(f"{result['rows_invalid']} rows were skipped as invalid.")
+            st.text("\n".join(result['errors']))
+
 def render_child_profile_card(child):
     dob = child['date_of_birth']
     if isinstance(dob, str):
@@ -254,16 +271,8 @@ def render_child_profile_card(child):
                 st.session_state[f"edit_child_{child['id']}"] = True
         with col2:
             if st.button("Regenerate Schedule", key=f"regen_{child['id']}", width='stretch'):
-                db.delete_all_vaccinations(child['id'])
                 schedule = generate_vaccination_schedule(dob, child['country_guideline'])
-                for vacc in schedule:
-                    db.add_vaccination(
-                        child_id=child['id'],
-                        vaccine_name=vacc['vaccine_name'],
-                        vaccine_code=vacc['vaccine_code'],
-                        due_date=vacc['due_date'].isoformat(),
-                        status='pending'
-                    )
+                db.add_vaccination_schedule(child['id'], schedule, replace=True)
                 st.success("Vaccination schedule regenerated!")
                 st.rerun()
         with col3:
@@ -421,6 +430,34 @@ def render_notification_settings():
                 reminder_on_day=reminder_on_day
             )
             st.success("Notification settings saved!")
+    
+    render_reminder_sweep_status()
+
+def render_reminder_sweep_status():
+    import user_database as udb
+    
+    outbox = udb.get_outbox_stats()
+    st.caption(
+        f"Email queue: {outbox['queued']} waiting, {outbox['sending']} sending, "
+        f"{outbox['dead']} undeliverable — {outbox['sent_per_minute']} sent/min."
+    )
+    
+    status = db.get_scheduler_status("reminder_sweep")
+    if not status or not status.get('last_started_at'):
+        st.caption("Reminder emails are sent by the background scheduler. No reminder sweep has run yet.")
+        return
+    
+    result = status.get('last_result') or {}
+    if status.get('last_status') == 'running':
+        st.caption(f"Reminder sweep in progress (started {status['last_started_at']} UTC).")
+    elif status.get('last_status') == 'failed':
+        st.caption(f"Last reminder sweep failed at {status['last_finished_at']} UTC: {result.get('error', 'unknown error')}")
+    else:
+        st.caption(
+            f"Last reminder sweep: {status['last_finished_at']} UTC — "
+            f"{result.get('queued', 0)} reminders queued in {result.get('emails', 0)} emails, "
+            f"{result.get('failed', 0)} failed."
+        )
 
 def render_data_management():
     st.subheader("Data Management")
@@ -435,27 +472,66 @@ def render_data_management():
     
     st.markdown("---")
     st.markdown("### Export Data")
-    st.info("Data export functionality will be available in a future update.")
+    render_data_export()
     
     st.markdown("---")
     st.markdown("### Database Information")
     
     user_id = st.session_state.get('user_id')
-    children = db.get_all_children(user_id=user_id)
-    total_vaccinations = 0
-    total_events = 0
-    
-    for child in children:
-        total_vaccinations += len(db.get_vaccinations(child['id']))
-        total_events += len(db.get_health_events(child['id']))
+    totals = db.get_user_totals(user_id)
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Child Profiles", len(children))
+        st.metric("Child Profiles", totals['children'])
     with col2:
-        st.metric("Total Vaccinations", total_vaccinations)
+        st.metric("Total Vaccinations", totals['vaccinations'])
     with col3:
-        st.metric("Health Events", total_events)
+        st.metric("Health Events", totals['health_events'])
+    
+    cache_stats = entity_cache.get_stats()
+    st.caption(
+        f"Cache hit rate: {cache_stats['hit_rate']:.0%} "
+        f"({cache_stats['request_hits']} in-request, {cache_stats['hits']} shared, "
+        f"{cache_stats['misses']} misses, {cache_stats['entries']} entries)"
+    )
+
+EXPORT_CHOICES = {
+    "ZIP bundle (CSV files)": ("zip", None),
+    "JSON Lines (all data)": ("jsonl", None),
+    "CSV - Children": ("csv", "children"),
+    "CSV - Vaccinations": ("csv", "vaccinations"),
+    "CSV - Health Events": ("csv", "health_events"),
+    "CSV - Email Log": ("csv", "emails"),
+}
+
+def _export_file(fmt, user_id, dataset):
+    """Write the export to a temporary file when the download is clicked."""
+    def build():
+        spool = tempfile.TemporaryFile()
+        data_export.write_export(spool, fmt, user_id, dataset)
+        spool.seek(0)
+        return spool
+    return build
+
+def render_data_export():
+    st.caption("Children, vaccinations, health events and sent emails of your account.")
+    user_id = st.session_state.get('user_id')
+    if user_id is None:
+        st.warning("Log in to export your account's data.")
+        return
+    choice = st.selectbox("Format", list(EXPORT_CHOICES), key="export_format")
+    fmt, dataset = EXPORT_CHOICES[choice]
+    
+    # The export is only generated when the button is clicked. Streamlit sends
+    # a download as one file, so it is written to a temporary file first; use
+    # `python data_export.py` to stream large exports straight to disk.
+    st.download_button(
+        "Download Export",
+        data=_export_file(fmt, user_id, dataset),
+        file_name=data_export.export_file_name(fmt, dataset),
+        mime=data_export.MIME_TYPES[fmt],
+        on_click="ignore",
+    )
 
 def render_about():
     st.subheader("About Smart Child Vaccination & Health Assistant")
@@ -1,26 +1,7 @@
 import streamlit as st
 from datetime import date
 import database as db
-from vaccination_guidelines import categorize_vaccinations, get_age_string, generate_vaccination_schedule
-import json
-
-
-def load_vaccine_data():
-    data = {"India (UIP)": None, "WHO": None}
-
-    try:
-        with open("data/vaccines_uip_india.json", "r") as f:
-            data["India (UIP)"] = json.load(f)
-    except FileNotFoundError:
-        pass
-
-    try:
-        with open("data/vaccines_who.json", "r") as f:
-            data["WHO"] = json.load(f)
-    except FileNotFoundError:
-        pass
-
-    return data
+from vaccination_guidelines import categorize_vaccinations, get_age_string, generate_vaccination_schedule, get_catalog
 
 
 def render():
@@ -167,28 +148,21 @@ def render():
         """, unsafe_allow_html=True)
 
     with col3:
-        completed = len([v for v in vaccinations if v['status'] == 'completed'])
+        summary = db.get_vaccination_summary(st.session_state.selected_child_id)
         st.markdown(f"""
         <div class="purple-card" style="background:linear-gradient(135deg,#667eea 0%,#764ba2 100%);
         padding:20px;border-radius:10px;text-align:center;">
             <p style="font-size:18px;font-weight:500;margin:0;">Completed</p>
-            <p style="font-size:32px;font-weight:700;margin:10px 0 0 0;">{completed}/{len(vaccinations)}</p>
+            <p style="font-size:32px;font-weight:700;margin:10px 0 0 0;">{summary['completed']}/{summary['total']}</p>
         </div>
         """, unsafe_allow_html=True)
 
     if not vaccinations:
         schedule = generate_vaccination_schedule(dob, child['country_guideline'])
-        for vacc in schedule:
-            db.add_vaccination(
-                child_id=st.session_state.selected_child_id,
-                vaccine_name=vacc['vaccine_name'],
-                vaccine_code=vacc['vaccine_code'],
-                due_date=vacc['due_date'].isoformat(),
-                status='pending'
-            )
+        db.add_vaccination_schedule(st.session_state.selected_child_id, schedule)
         st.rerun()
 
-    categories = categorize_vaccinations(vaccinations)
+    categories = categorize_vaccinations(db.get_sorted_vaccinations(st.session_state.selected_child_id))
 
     tab1, tab2, tab3, tab4 = st.tabs(["Overdue", "Upcoming", "Pending", "Completed"])
 
@@ -220,20 +194,15 @@ def render():
         else:
             st.info("No completed vaccines")
 
-    vaccine_data = load_vaccine_data()
-    guideline = child['country_guideline']
+    catalog = get_catalog(child['country_guideline'])
 
-    if guideline in vaccine_data and vaccine_data[guideline]:
-        data = vaccine_data[guideline]
-        st.markdown(f"Source: {data.get('source', 'Unknown')}")
-        st.markdown(data.get('description', ''))
+    if catalog:
+        st.markdown(f"Source: {catalog.source}")
+        st.markdown(catalog.description)
 
 
 def render_vaccine_card(vacc, status_type):
     due_date = vacc['due_date']
-    if isinstance(due_date, str):
-        due_date = date.fromisoformat(due_date)
-
     days_diff = (due_date - date.today()).days
 
     if status_type == "overdue":
@@ -0,0 +1,264 @@
+"""Streaming import of clinic rosters (CSV or JSON Lines) into child profiles and schedules.
+
+    python roster_import.py roster.csv --user-email clinic@example.com
+    python roster_import.py roster.jsonl --user-id 3 --guideline WHO
+    python roster_import.py roster.csv --user-id 3 --restart   # ignore an earlier checkpoint
+
+Each row (a CSV line with a header, or one JSON object per line) needs
+name and date_of_birth (YYYY-MM-DD) and may have country_guideline, gender,
+blood_group, allergies and received_vaccines (comma-separated names, or a
+JSON list). Vaccines already received are marked completed, as in the add
+child form.
+
+Rows are read one at a time and written CHUNK_SIZE at a time: a chunk's
+children, their schedules (generate_cohort_schedules) and the import's
+checkpoint in roster_imports are committed in one transaction. Invalid rows
+are counted and reported without stopping the import. Importing the same
+file (same user, name and size) again after a crash resumes after the last
+committed chunk.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import date
+from functools import lru_cache
+from typing import BinaryIO, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
+import database as db
+import user_database as udb
+from vaccination_guidelines import (
+    DEFAULT_GUIDELINE, GUIDELINE_FILES, generate_cohort_schedules, get_schedule_for_guideline,
+    is_vaccine_received, parse_received_vaccines
+)
+
+CHUNK_SIZE = int(os.getenv("ROSTER_IMPORT_CHUNK_SIZE", 1000))
+# Invalid rows beyond this many are counted but not listed
+MAX_REPORTED_ERRORS = 100
+# Same range as the add child form
+MIN_DATE_OF_BIRTH = date(2000, 1, 1)
+GENDERS = ("Male", "Female", "Other")
+BLOOD_GROUPS = ("A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-")
+RECEIVED_NOTE = "Marked as already received during roster import"
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(file_name: str) -> str:
+    """'jsonl' for .jsonl/.ndjson/.json files, otherwise 'csv'."""
+    extension = os.path.splitext(file_name)[1].lower()
+    return "jsonl" if extension in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def read_records(stream: BinaryIO, fmt: str) -> Iterator[Union[Dict, str]]:
+    """Rows of the roster one at a time: dicts for CSV, raw lines for JSON Lines."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(text)
+        else:
+            for line in text:
+                if line.strip():
+                    yield line
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+
+def _field(record: Dict, *names):
+    for name in names:
+        value = record.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _choice(record: Dict, name: str, options: Tuple[str, ...]) -> Optional[str]:
+    value = _field(record, name)
+    if value is None or str(value).lower() == "not specified":
+        return None
+    for option in options:
+        if option.lower() == str(value).lower():
+            return option
+    raise ValueError(f"{name} {value!r} is not one of {', '.join(options)}")
+
+
+def validate_row(record: Union[Dict, str], default_guideline: str, today: date) -> Dict:
+    """The child described by one roster row; raises ValueError when the row is invalid."""
+    if isinstance(record, str):
+        record = json.loads(record)
+        if not isinstance(record, dict):
+            raise ValueError("line is not a JSON object")
+
+    name = _field(record, "name", "child_name")
+    if not name:
+        raise ValueError("name is missing")
+    dob_text = _field(record, "date_of_birth", "dob")
+    if not dob_text:
+        raise ValueError("date_of_birth is missing")
+    try:
+        dob = date.fromisoformat(str(dob_text))
+    except ValueError:
+        raise ValueError(f"date_of_birth {dob_text!r} is not a YYYY-MM-DD date")
+    if not MIN_DATE_OF_BIRTH <= dob <= today:
+        raise ValueError(f"date_of_birth {dob} is not between {MIN_DATE_OF_BIRTH} and today")
+    guideline = _field(record, "country_guideline", "guideline") or default_guideline
+    if guideline not in GUIDELINE_FILES:
+        raise ValueError(f"unknown guideline {guideline!r}")
+
+    received = _field(record, "received_vaccines") or ""
+    if isinstance(received, list):
+        received = ",".join(str(name) for name in received)
+    return {
+        "name": str(name),
+        "date_of_birth": dob,
+        "country_guideline": guideline,
+        "gender": _choice(record, "gender", GENDERS),
+        "blood_group": _choice(record, "blood_group", BLOOD_GROUPS),
+        "allergies": _field(record, "allergies"),
+        "received": tuple(parse_received_vaccines(str(received))),
+    }
+
+
+@lru_cache(maxsize=1024)
+def _received_vaccine_ids(guideline: str, received: Tuple[str, ...]) -> FrozenSet[str]:
+    # Rosters repeat the same received lists, so each is matched once
+    return frozenset(
+        vaccine["id"] for vaccine in get_schedule_for_guideline(guideline)
+        if is_vaccine_received({"vaccine_name": vaccine["name"], "vaccine_code": vaccine["id"]},
+                               list(received))
+    )
+
+
+def build_doses(children: List[Dict], administered_date: date) -> List[tuple]:
+    """Schedule rows for a chunk of validated children, one cohort per guideline."""
+    positions_by_guideline: Dict[str, List[int]] = {}
+    for position, child in enumerate(children):
+        positions_by_guideline.setdefault(child["country_guideline"], []).append(position)
+
+    administered = administered_date.isoformat()
+    doses = []
+    for guideline, positions in positions_by_guideline.items():
+        cohort = generate_cohort_schedules([children[p]["date_of_birth"] for p in positions], guideline)
+        received = [_received_vaccine_ids(guideline, children[p]["received"]) if children[p]["received"]
+                    else frozenset() for p in positions]
+        # datetime64[D] formats as YYYY-MM-DD in one vectorised pass
+        for index, vaccine_id, vaccine_name, due_date in zip(
+                cohort["child_index"].tolist(), cohort["vaccine_id"].tolist(),
+                cohort["vaccine_name"].tolist(), cohort["due_date"].astype(str).tolist()):
+            if vaccine_id in received[index]:
+                doses.append((positions[index], vaccine_name, vaccine_id, due_date,
+                              "completed", administered, RECEIVED_NOTE))
+            else:
+                doses.append((positions[index], vaccine_name, vaccine_id, due_date,
+                              "pending", None, None))
+    return doses
+
+
+def import_roster(stream: BinaryIO, user_id: int, source_name: str, fmt: Optional[str] = None,
+                  source_size: Optional[int] = None, default_guideline: str = DEFAULT_GUIDELINE,
+                  chunk_size: int = CHUNK_SIZE, restart: bool = False,
+                  on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Import a roster from a binary stream for `user_id` and return the final progress.
+
+    on_progress is called after every committed chunk with a dict of
+    import_id, rows_done, rows_invalid, children_created,
+    vaccinations_created, bytes_read, bytes_total, rows_per_second and
+    errors (the first MAX_REPORTED_ERRORS messages of this run).
+    """
+    fmt = fmt or detect_format(source_name)
+    job = udb.start_roster_import(user_id, source_name, source_size, restart)
+    job = db.recover_roster_import(job["id"])
+    _received_vaccine_ids.cache_clear()
+    today = date.today()
+    started = time.perf_counter()
+    resumed_at = rows_done = job["rows_done"]
+    errors: List[str] = []
+    progress = dict(job, import_id=job["id"], resumed_at=resumed_at, bytes_total=source_size, errors=errors)
+
+    def commit(children: List[Dict], invalid: int, rows: int):
+        doses = build_doses(children, today)
+        child_ids = db.import_roster_chunk(job["id"], user_id, children, doses, rows, invalid)
+        elapsed = time.perf_counter() - started
+        progress.update(
+            rows_done=rows,
+            rows_invalid=progress["rows_invalid"] + invalid,
+            children_created=progress["children_created"] + len(child_ids),
+            vaccinations_created=progress["vaccinations_created"] + len(doses),
+            bytes_read=stream.tell() if stream.seekable() else None,
+            rows_per_second=round((rows - resumed_at) / elapsed) if elapsed else None,
+        )
+        if on_progress:
+            on_progress(progress)
+
+    children: List[Dict] = []
+    invalid = 0
+    number = rows_done
+    for number, record in enumerate(read_records(stream, fmt), start=1):
+        if number <= resumed_at:
+            continue
+        try:
+            children.append(validate_row(record, default_guideline, today))
+        except ValueError as e:
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"Row {number}: {e}")
+        if number - rows_done >= chunk_size:
+            commit(children, invalid, number)
+            children, invalid, rows_done = [], 0, number
+    if number > rows_done:
+        commit(children, invalid, number)
+
+    udb.finish_roster_import(job["id"])
+    progress["status"] = "completed"
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a clinic roster (CSV or JSON Lines)")
+    parser.add_argument("path", help="Roster file")
+    user = parser.add_mutually_exclusive_group(required=True)
+    user.add_argument("--user-id", type=int, help="Account the children are added to")
+    user.add_argument("--user-email", help="Email of the account the children are added to")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="File format (default: from the file extension)")
+    parser.add_argument("--guideline", choices=sorted(GUIDELINE_FILES), default=DEFAULT_GUIDELINE,
+                        help="Guideline for rows without one (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Rows per transaction (default: %(default)s)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Start from the first row even if an earlier import of the file was interrupted")
+    args = parser.parse_args(argv)
+
+    user_id = args.user_id
+    if args.user_email:
+        account = udb.get_user_by_email(args.user_email)
+        if not account:
+            print(f"No account with email {args.user_email}")
+            return 1
+        user_id = account["id"]
+
+    def report(progress: Dict):
+        done = f" ({100 * progress['bytes_read'] // progress['bytes_total']}%)" if progress["bytes_total"] else ""
+        print(f"rows {progress['rows_done']}{done}  children {progress['children_created']}  "
+              f"vaccinations {progress['vaccinations_created']}  invalid {progress['rows_invalid']}  "
+              f"{progress['rows_per_second']} rows/s", flush=True)
+
+    with open(args.path, "rb") as stream:
+        progress = import_roster(stream, user_id, os.path.basename(args.path), args.format,
+                                 os.path.getsize(args.path), args.guideline, args.chunk_size,
+                                 args.restart, report)
+    if progress["resumed_at"]:
+        print(f"Resumed after row {progress['resumed_at']}")
+    for error in progress["errors"]:
+        print(error)
+    print(f"Import {progress['import_id']} finished: {progress['children_created']} children, "
+          f"{progress['vaccinations_created']} vaccinations, {progress['rows_invalid']} invalid rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Standalone scheduler process for the vaccination reminder sweep.
+
+Run it next to the Streamlit server:
+
+    python -m scheduler                  # sweep every 15 minutes
+    python -m scheduler --interval 3600  # sweep hourly
+    python -m scheduler --once           # single sweep, e.g. from cron
+
+Runs are aligned to wall-clock multiples of the interval. Any number of
+scheduler processes may be started; a lease row in ``scheduler_state`` elects
+one leader and only the leader sweeps. The UI reads the last run from
+``db.get_scheduler_status``.
+
+Each scheduler process also runs email outbox workers (--email-workers) that
+deliver the queued reminder emails. Once a day the leader of the
+``email_archive`` job moves old emails out of the log (see email_archive).
+"""
+import argparse
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+import database as db
+import db_connections
+import email_archive
+import email_outbox
+import reminder_service
+import smtp_pool
+
+REMINDER_SWEEP_JOB = "reminder_sweep"
+DEFAULT_INTERVAL_SECONDS = int(os.getenv("REMINDER_SWEEP_INTERVAL", 15 * 60))
+DEFAULT_EMAIL_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", 2))
+EMAIL_ARCHIVE_JOB = "email_archive"
+EMAIL_ARCHIVE_INTERVAL_SECONDS = 24 * 60 * 60
+
+
+def make_owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def next_run_at(now: float, interval: int) -> float:
+    """Next wall-clock boundary that is a multiple of the interval."""
+    return (int(now) // interval + 1) * interval
+
+
+def run_reminder_sweep(owner: str, lease_seconds: float) -> Optional[dict]:
+    """Run one sweep if this process holds the leader lease; None when not leader."""
+    if not db.acquire_scheduler_lease(REMINDER_SWEEP_JOB, owner, lease_seconds):
+        return None
+
+    db.record_scheduler_run(REMINDER_SWEEP_JOB, 'running')
+    started = time.monotonic()
+    summary = reminder_service.check_and_send_reminders()
+    summary["duration_seconds"] = round(time.monotonic() - started, 3)
+    status = 'failed' if summary.get("error") else 'completed'
+    db.record_scheduler_run(REMINDER_SWEEP_JOB, status, summary)
+    return summary
+
+
+def run_email_archive(owner: str, lease_seconds: float) -> Optional[dict]:
+    """Archive old emails if this process holds the archive lease and the last run is a day old."""
+    if not db.acquire_scheduler_lease(EMAIL_ARCHIVE_JOB, owner, lease_seconds):
+        return None
+    status = db.get_scheduler_status(EMAIL_ARCHIVE_JOB)
+    if status and status['last_finished_at']:
+        # scheduler_state timestamps are CURRENT_TIMESTAMP (UTC)
+        finished = datetime.fromisoformat(status['last_finished_at']).replace(tzinfo=timezone.utc)
+        if (datetime.now(timezone.utc) - finished).total_seconds() < EMAIL_ARCHIVE_INTERVAL_SECONDS:
+            return None
+
+    db.record_scheduler_run(EMAIL_ARCHIVE_JOB, 'running')
+    started = time.monotonic()
+    try:
+        summary = email_archive.archive_emails()
+    except Exception as e:
+        print(f"Error archiving emails: {e}")
+        summary = {"error": str(e)}
+    summary["duration_seconds"] = round(time.monotonic() - started, 3)
+    db.record_scheduler_run(EMAIL_ARCHIVE_JOB, 'failed' if summary.get("error") else 'completed', summary)
+    return summary
+
+
+def run_forever(interval: int, lease_seconds: float, owner: str, email_workers: int):
+    print(f"Reminder scheduler {owner} started (every {interval}s, {email_workers} email workers)")
+    pool = email_outbox.OutboxWorkerPool(email_workers)
+    pool.start()
+    try:
+        while True:
+            summary = run_reminder_sweep(owner, lease_seconds)
+            if summary is not None:
+                print(f"Reminder sweep finished: {summary}; outbox: {email_outbox.get_outbox_stats()}")
+            archived = run_email_archive(owner, lease_seconds)
+            if archived is not None:
+                print(f"Email archive finished: {archived}")
+            time.sleep(max(0, next_run_at(time.time(), interval) - time.time()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+        smtp_pool.close_all()
+        db.release_scheduler_lease(REMINDER_SWEEP_JOB, owner)
+        db.release_scheduler_lease(EMAIL_ARCHIVE_JOB, owner)
+        db_connections.close_all()
+        print(f"Reminder scheduler {owner} stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KinderCare reminder scheduler")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL_SECONDS,
+                        help="Seconds between sweeps (default: %(default)s)")
+    parser.add_argument("--lease", type=float, default=None,
+                        help="Leader lease length in seconds (default: twice the interval)")
+    parser.add_argument("--once", action="store_true",
+                        help="Run a single sweep, deliver the queued emails, archive old emails if due and exit")
+    parser.add_argument("--email-workers", type=int, default=DEFAULT_EMAIL_WORKERS,
+                        help="Email outbox worker threads (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    owner = make_owner_id()
+    lease_seconds = args.lease or max(2 * args.interval, 300)
+
+    if args.once:
+        try:
+            summary = run_reminder_sweep(owner, lease_seconds)
+        finally:
+            db.release_scheduler_lease(REMINDER_SWEEP_JOB, owner)
+        if summary is None:
+            print("Another scheduler holds the reminder sweep lease; skipping")
+        else:
+            print(f"Reminder sweep finished: {summary}")
+        if args.email_workers:
+            print(f"Email outbox drained: {email_outbox.drain_all()}")
+            smtp_pool.close_all()
+        try:
+            archived = run_email_archive(owner, lease_seconds)
+        finally:
+            db.release_scheduler_lease(EMAIL_ARCHIVE_JOB, owner)
+        if archived is not None:
+            print(f"Email archive finished: {archived}")
+        db_connections.close_all()
+        return
+
+    run_forever(args.interval, lease_seconds, owner, args.email_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Pool of authenticated SMTP sessions shared by the email senders.
+
+Opening an SMTP session costs a TCP connect, a STARTTLS handshake and a login.
+The pool keeps up to `size` logged-in sessions per server/account and sends
+many messages over each one; a session is retired after
+`max_messages_per_session` messages or when it has been idle for too long,
+and a session that turns out to be dead is replaced transparently.
+
+    pool = smtp_pool.get_pool("smtp.gmail.com", 587, username, password)
+    pool.send(from_addr, to_addr, msg.as_string())
+"""
+import os
+import smtplib
+import threading
+import time
+from typing import Dict, List, Tuple
+
+POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+MAX_MESSAGES_PER_SESSION = int(os.getenv("SMTP_MAX_MESSAGES_PER_SESSION", 100))
+IDLE_TIMEOUT_SECONDS = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))
+CONNECT_TIMEOUT_SECONDS = 10
+
+
+class _Session:
+    __slots__ = ("smtp", "messages_sent", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    def __init__(self, host: str, port: int, username: str, password: str,
+                 size: int = POOL_SIZE, max_messages_per_session: int = MAX_MESSAGES_PER_SESSION,
+                 idle_timeout: float = IDLE_TIMEOUT_SECONDS, timeout: float = CONNECT_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.max_messages_per_session = max_messages_per_session
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[_Session] = []
+        self.stats = {"sessions_opened": 0, "messages_sent": 0, "reconnects": 0}
+
+    def _open(self) -> _Session:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.starttls()
+            smtp.login(self.username, self.password)
+        except Exception:
+            _quit(smtp)
+            raise
+        with self._lock:
+            self.stats["sessions_opened"] += 1
+        return _Session(smtp)
+
+    def _checkout(self) -> Tuple[_Session, bool]:
+        """Return an idle session (reused=True) or a newly opened one."""
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._open(), False
+            if now - session.last_used < self.idle_timeout:
+                return session, True
+            _quit(session.smtp)
+
+    def _checkin(self, session: _Session):
+        session.last_used = time.monotonic()
+        if session.messages_sent >= self.max_messages_per_session:
+            _quit(session.smtp)
+            return
+        with self._lock:
+            self._idle.append(session)
+
+    def send(self, from_addr: str, to_addrs, message: str):
+        """Send one message over a pooled session, reconnecting once if it was stale."""
+        with self._slots:
+            session, reused = self._checkout()
+            try:
+                session.smtp.sendmail(from_addr, to_addrs, message)
+            except Exception as e:
+                if not _is_session_error(e):
+                    # Recipient/data errors leave the session usable
+                    self._checkin(session)
+                    raise
+                _quit(session.smtp)
+                if not reused:
+                    raise
+                # The server dropped an idle session; retry on a fresh one
+                with self._lock:
+                    self.stats["reconnects"] += 1
+                session = self._open()
+                try:
+                    session.smtp.sendmail(from_addr, to_addrs, message)
+                except Exception:
+                    _quit(session.smtp)
+                    raise
+            session.messages_sent += 1
+            with self._lock:
+                self.stats["messages_sent"] += 1
+            self._checkin(session)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            _quit(session.smtp)
+
+
+def _is_session_error(exc: Exception) -> bool:
+    """True when the error means the session itself is broken and must be replaced."""
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code == 421
+    # SMTPException subclasses OSError, so check protocol errors first
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _quit(smtp: smtplib.SMTP):
+    try:
+        smtp.quit()
+    except Exception:
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+
+_pools: Dict[tuple, SMTPConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str, port: int, username: str, password: str) -> SMTPConnectionPool:
+    """Process-wide pool for one SMTP server and account."""
+    key = (host, port, username, password)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPConnectionPool(host, port, username, password)
+        return pool
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
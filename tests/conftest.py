@@ -0,0 +1,33 @@
+"""Shared fixtures: every test runs against fresh databases in a temporary directory.
+
+database.py and user_database.py create their files relative to the working
+directory when imported, so the suite moves to a temporary directory first
+and never touches the databases in the repository.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp(prefix="kindercare-tests-"))
+sys.path.insert(0, REPO_ROOT)
+
+import database as db  # noqa: E402
+import db_connections  # noqa: E402
+import entity_cache  # noqa: E402
+import user_database as udb  # noqa: E402
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    """Empty, migrated vaccination_health.db and user_database.db in tmp_path."""
+    db_connections.close_all()
+    monkeypatch.setattr(db, "DATABASE_PATH", str(tmp_path / "vaccination_health.db"))
+    monkeypatch.setattr(udb, "USER_DATABASE_PATH", str(tmp_path / "user_database.db"))
+    udb.init_user_database()
+    db.init_database()
+    yield
+    db_connections.close_all()
+    entity_cache.clear()
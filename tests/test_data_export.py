@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+import data_export
+import database as db
+import user_database as udb
+
+
+def _children(**kwargs):
+    stream = io.BytesIO()
+    data_export.write_export(stream, "jsonl", dataset="children", **kwargs)
+    return [json.loads(line)["name"] for line in stream.getvalue().splitlines()]
+
+
+def test_export_covers_only_the_account(databases):
+    udb.add_child("Asha", "2024-01-01", "WHO", user_id=1)
+    udb.add_child("Ben", "2023-05-01", "WHO", user_id=2)
+
+    assert _children(user_id=1) == ["Asha"]
+    assert _children(all_accounts=True) == ["Asha", "Ben"]
+
+
+def test_missing_user_id_is_refused(databases):
+    udb.add_child("Asha", "2024-01-01", "WHO", user_id=1)
+
+    with pytest.raises(ValueError):
+        _children(user_id=None)
+    with pytest.raises(ValueError):
+        _children(user_id=1, all_accounts=True)
+    assert _children(user_id=0) == []
+
+
+def test_paused_export_reads_a_snapshot_of_its_own(databases):
+    udb.add_child("Asha", "2024-01-01", "WHO", user_id=1)
+    export = data_export.iter_jsonl(user_id=1, datasets=["children"])
+    first = next(export)
+
+    # The thread's shared connection is not left inside the export's transaction
+    assert not db.get_unified_connection().in_transaction
+    udb.add_child("Ben", "2023-05-01", "WHO", user_id=1)
+    assert b"Ben" not in first + b"".join(export)
+    assert _children(user_id=1) == ["Asha", "Ben"]
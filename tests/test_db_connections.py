@@ -0,0 +1,33 @@
+import sqlite3
+
+import pytest
+
+import database as db
+import db_connections
+import user_database as udb
+
+
+def _registered(conn) -> bool:
+    return any(conn in connections.values() for connections in db_connections._registry.values())
+
+
+@pytest.mark.parametrize("close", [db_connections.close_thread_connections, db_connections.close_all])
+def test_connections_opened_after_close_are_registered(databases, close):
+    close()
+    conn = db.get_connection()
+    assert _registered(conn)
+    assert db.get_connection() is conn
+
+    db_connections.close_all()
+    assert not _registered(conn)
+    assert _registered(db.get_connection())
+
+
+def test_failed_write_leaves_no_open_transaction(databases):
+    with pytest.raises(sqlite3.IntegrityError):
+        db.add_health_event(1, "illness", None, "Fever")
+    assert not db.get_connection().in_transaction
+
+    with pytest.raises(sqlite3.IntegrityError):
+        udb.log_email(1, 1, None, "Subject", "<p>Hi</p>")
+    assert not udb.get_user_connection().in_transaction
@@ -0,0 +1,43 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import email_archive
+import scheduler
+import user_database as udb
+
+
+def _log(subject: str, days_ago: int):
+    email_id = udb.log_email(1, 1, "parent@example.com", subject, f"<p>{subject}</p>")
+    conn = udb.get_user_connection()
+    conn.execute("UPDATE emails SET sent_at = datetime('now', ?) WHERE id = ?", (f"-{days_ago} days", email_id))
+    conn.commit()
+
+
+def test_old_emails_move_to_the_archive(databases, tmp_path):
+    _log("Old", 400)
+    _log("Recent", 10)
+
+    summary = email_archive.archive_emails(365, str(tmp_path / "archive"))
+
+    assert summary["archived"] == summary["deleted"] == 1
+    with gzip.open(summary["archive"], "rt") as archive:
+        archived = [json.loads(line) for line in archive]
+    assert [(e["subject"], e["content"]) for e in archived] == [("Old", "<p>Old</p>")]
+    assert [e["subject"] for e in udb.get_sent_emails(1)] == ["Recent"]
+
+
+def test_naive_and_aware_now_give_the_same_cutoff(databases, tmp_path):
+    now = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+    aware = email_archive.archive_emails(30, str(tmp_path), now=now)
+    naive = email_archive.archive_emails(30, str(tmp_path), now=now.replace(tzinfo=None))
+    assert aware["cutoff"] == naive["cutoff"] == (now - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def test_scheduler_archives_once_a_day(databases, tmp_path, monkeypatch):
+    # The default archive directory is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    _log("Old", 400)
+
+    assert scheduler.run_email_archive("worker-1", 60)["archived"] == 1
+    assert scheduler.run_email_archive("worker-1", 60) is None
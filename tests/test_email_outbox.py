@@ -0,0 +1,67 @@
+import email_outbox
+import user_database as udb
+
+
+def _enqueue(subject: str = "Reminder") -> int:
+    return udb.enqueue_email(1, 1, "parent@example.com", subject, f"<p>{subject}</p>")
+
+
+def _outbox(outbox_id: int):
+    return udb.get_user_connection().execute("SELECT * FROM email_outbox WHERE id = ?", (outbox_id,)).fetchone()
+
+
+def _fail(recipient_email, subject, content):
+    raise OSError("SMTP unavailable")
+
+
+def test_delivered_email_is_logged(databases):
+    outbox_id = _enqueue()
+    delivered = []
+
+    result = email_outbox.drain_once(lambda *email: delivered.append(email))
+
+    assert (result["claimed"], result["sent"]) == (1, 1)
+    assert delivered == [("parent@example.com", "Reminder", "<p>Reminder</p>")]
+    assert _outbox(outbox_id)["status"] == "sent"
+    assert [(e["subject"], e["status"]) for e in udb.get_sent_emails(1)] == [("Reminder", "sent")]
+
+
+def test_claimed_rows_are_not_claimed_twice(databases):
+    _enqueue()
+
+    assert len(udb.claim_outbox_emails("worker-1", 10, 300)) == 1
+    assert udb.claim_outbox_emails("worker-2", 10, 300) == []
+
+
+def test_failed_delivery_is_retried_then_dead_lettered(databases, monkeypatch):
+    monkeypatch.setattr(email_outbox, "MAX_ATTEMPTS", 2)
+    outbox_id = _enqueue()
+
+    assert email_outbox.drain_once(_fail)["retried"] == 1
+    row = _outbox(outbox_id)
+    assert (row["status"], row["attempts"], row["last_error"]) == ("queued", 1, "SMTP unavailable")
+    assert email_outbox.drain_once(_fail)["claimed"] == 0
+
+    conn = udb.get_user_connection()
+    conn.execute("UPDATE email_outbox SET next_attempt_at = 0")
+    conn.commit()
+    assert email_outbox.drain_once(_fail)["dead"] == 1
+    assert _outbox(outbox_id)["status"] == "dead"
+    assert [e["status"] for e in udb.get_sent_emails(1)] == ["failed"]
+
+
+def test_claims_of_crashed_workers_end_up_dead_lettered(databases, monkeypatch):
+    monkeypatch.setattr(email_outbox, "MAX_ATTEMPTS", 2)
+    outbox_id = _enqueue()
+    conn = udb.get_user_connection()
+
+    for worker in ("worker-1", "worker-2"):
+        # The worker claims the row and dies before recording an outcome
+        assert len(udb.claim_outbox_emails(worker, 10, 300)) == 1
+        conn.execute("UPDATE email_outbox SET claimed_at = claimed_at - 600")
+        conn.commit()
+
+    assert email_outbox.drain_once(_fail)["claimed"] == 0
+    row = _outbox(outbox_id)
+    assert (row["status"], row["attempts"], row["last_error"]) == ("dead", 2, "claim lease expired")
+    assert [e["status"] for e in udb.get_sent_emails(1)] == ["failed"]
@@ -0,0 +1,22 @@
+import sqlite3
+
+import database as db
+
+
+def test_writes_from_other_connections_survive_init_database(databases):
+    child_id = 1
+    db.add_vaccination(child_id, "BCG", "BCG", "2025-01-01")
+    assert len(db.get_vaccinations(child_id)) == 1
+
+    # Another process writes to the file
+    other = sqlite3.connect(db.DATABASE_PATH)
+    other.execute("""
+        INSERT INTO vaccinations (child_id, vaccine_name, vaccine_code, due_date, status)
+        VALUES (?, 'OPV', 'OPV', '2025-02-01', 'pending')
+    """, (child_id,))
+    other.commit()
+    other.close()
+
+    # app.py runs init_database() on every Streamlit rerun
+    db.init_database()
+    assert len(db.get_vaccinations(child_id)) == 2
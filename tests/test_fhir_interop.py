@@ -0,0 +1,21 @@
+import io
+import json
+
+import fhir_interop
+
+
+def test_bundle_with_a_resource_spanning_many_reads(monkeypatch):
+    monkeypatch.setattr(fhir_interop, "READ_CHARS", 16)
+    large = {"resourceType": "Patient", "id": "large", "note": [{"text": "x" * 40}] * 500}
+    bundle = {"resourceType": "Bundle", "type": "collection",
+              "entry": [{"resource": large}, {"resource": {"resourceType": "Patient", "id": "small"}}]}
+    text = io.StringIO(json.dumps(bundle))
+    reads = []
+    read = text.read
+    monkeypatch.setattr(text, "read", lambda size: reads.append(size) or read(size))
+
+    entries = list(fhir_interop._bundle_entries(fhir_interop._JsonReader(text)))
+
+    assert [entry["resource"] for entry in entries] == [large, {"resourceType": "Patient", "id": "small"}]
+    # The buffer doubles while the large resource is incomplete instead of growing by READ_CHARS
+    assert len(reads) < 40
@@ -0,0 +1,27 @@
+import database as db
+
+
+def test_search_is_scoped_to_the_child(databases):
+    db.add_health_event(1, "illness", "2025-01-10", "Fever", symptoms="high temperature")
+    db.add_health_event(2, "illness", "2025-01-11", "Fever", symptoms="chills")
+
+    results = db.search_health_events(1, "fever")
+
+    assert [row["child_id"] for row in results] == [1]
+    assert results[0]["snippet"] == "**Fever**"
+
+
+def test_numbers_do_not_match_the_child_id(databases):
+    db.add_health_event(1, "illness", "2025-01-10", "Cough", description="dry cough at night")
+    db.add_health_event(12, "illness", "2025-01-10", "Cough", description="wet cough")
+    db.add_health_event(12, "doctor_visit", "2025-02-01", "Checkup", description="weight 12 kg")
+
+    assert db.search_health_events(1, "1") == []
+    results = db.search_health_events(12, "12")
+    assert [row["title"] for row in results] == ["Checkup"]
+    assert results[0]["snippet"] == "weight **12** kg"
+
+
+def test_query_without_words(databases):
+    assert db.health_event_search_query("?! --") is None
+    assert db.search_health_events(1, "") == []
@@ -0,0 +1,19 @@
+import pytest
+
+import database as db
+import migrations
+import user_database as udb
+
+
+@pytest.mark.parametrize("module, connect", [(db, db.get_connection), (udb, udb.get_user_connection)],
+                         ids=["vaccination_health", "user_database"])
+def test_hot_queries_use_indexes(databases, module, connect):
+    assert migrations.find_slow_plans(connect(), module.hot_queries()) == []
+
+
+def test_find_slow_plans_reports_scans_and_sorts(databases):
+    problems = migrations.find_slow_plans(db.get_connection(), [
+        ("by notes", "SELECT * FROM vaccinations WHERE notes = ?", ('x',)),
+        ("by name", "SELECT * FROM vaccinations WHERE child_id = ? ORDER BY vaccine_name", (1,)),
+    ])
+    assert [problem.split(":")[0] for problem in problems] == ["by notes", "by name"]
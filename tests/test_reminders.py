@@ -0,0 +1,10 @@
+import database as db
+
+
+def test_record_sent_reminder_reports_duplicates(databases):
+    vaccination_id = db.add_vaccination(1, "BCG", "BCG", "2025-01-01")
+
+    assert db.record_sent_reminder(vaccination_id, "7_days", "email") is True
+    assert db.record_sent_reminder(vaccination_id, "7_days", "email") is False
+    assert db.record_sent_reminder(vaccination_id, "1_day", "email") is True
+    assert len(db.get_sent_reminders(vaccination_id)) == 2
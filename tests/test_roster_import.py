@@ -0,0 +1,98 @@
+import io
+
+import pytest
+
+import database as db
+import roster_import
+import user_database as udb
+from conftest import REPO_ROOT
+
+
+@pytest.fixture(autouse=True)
+def guidelines(monkeypatch):
+    # Guideline files are read relative to the app's working directory
+    monkeypatch.chdir(REPO_ROOT)
+
+
+def _roster(rows: int) -> bytes:
+    lines = ["name,date_of_birth"] + [f"Child {number},2024-01-{1 + number % 28:02d}" for number in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _import(data: bytes, **kwargs):
+    return roster_import.import_roster(io.BytesIO(data), 1, "roster.csv", source_size=len(data),
+                                       chunk_size=10, **kwargs)
+
+
+def test_import_creates_children_with_schedules(databases):
+    data = _roster(25) + b"Bad row,not-a-date\n"
+
+    progress = _import(data)
+
+    assert (progress["rows_done"], progress["rows_invalid"], progress["children_created"]) == (26, 1, 25)
+    children = udb.get_all_children(1)
+    assert len(children) == 25
+    assert all(db.get_vaccinations(child["id"]) for child in children)
+
+
+def test_interrupted_import_resumes_after_the_last_chunk(databases):
+    data = _roster(25)
+
+    def interrupt(progress):
+        if progress["rows_done"] == 20:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        _import(data, on_progress=interrupt)
+    assert len(udb.get_all_children(1)) == 20
+
+    progress = _import(data)
+    assert progress["resumed_at"] == 20
+    assert sorted(child["name"] for child in udb.get_all_children(1)) == sorted(f"Child {n}" for n in range(25))
+
+
+def _committed_chunk(rows: int = 10):
+    job = udb.start_roster_import(1, "roster.csv", 100)
+    children = [roster_import.validate_row({"name": f"Child {n}", "date_of_birth": "2024-01-01"}, "WHO",
+                                           roster_import.date.today()) for n in range(rows)]
+    doses = roster_import.build_doses(children, roster_import.date.today())
+    child_ids = db.import_roster_chunk(job["id"], 1, children, doses, rows, 0)
+    return job, child_ids
+
+
+def test_recovery_deletes_vaccinations_of_rolled_back_children(databases):
+    job, child_ids = _committed_chunk()
+    # The users file rolled back a later chunk whose schedules were committed
+    orphan_id = child_ids[-1] + 1
+    db.add_vaccination(orphan_id, "BCG", "BCG", "2024-01-01")
+
+    recovered = db.recover_roster_import(job["id"])
+
+    assert recovered["rows_done"] == 10
+    assert db.get_vaccinations(orphan_id) == []
+    assert all(db.get_vaccinations(child_id) for child_id in child_ids)
+
+
+def test_recovery_reimports_a_chunk_without_schedules(databases):
+    job, child_ids = _committed_chunk()
+    # The vaccinations file rolled back the chunk the users file committed
+    conn = db.get_connection()
+    conn.execute(f"DELETE FROM vaccinations WHERE child_id BETWEEN {child_ids[0]} AND {child_ids[-1]}")
+    conn.commit()
+
+    recovered = db.recover_roster_import(job["id"])
+
+    assert (recovered["rows_done"], recovered["children_created"]) == (0, 0)
+    assert udb.get_all_children(1) == []
+
+
+def test_recovery_keeps_vaccinations_of_children_above_the_sequence(databases):
+    job, child_ids = _committed_chunk()
+    # Another writer's children sit above a sequence value read earlier
+    conn = udb.get_user_connection()
+    conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'child_profiles'", (child_ids[0],))
+    conn.commit()
+
+    db.recover_roster_import(job["id"])
+
+    assert all(db.get_vaccinations(child_id) for child_id in child_ids)
@@ -1,17 +1,20 @@
 import sqlite3
+import json
+import time
+import zlib
 from typing import Optional, Dict, List
+import db_connections
+import email_templates
+import entity_cache
+import migrations
 
 USER_DATABASE_PATH = "user_database.db"
 
 def get_user_connection():
-    conn = sqlite3.connect(USER_DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """The calling thread's shared connection; callers commit but never close it."""
+    return db_connections.get_connection(USER_DATABASE_PATH)
 
-def init_user_database():
-    conn = get_user_connection()
-    cursor = conn.cursor()
-    
+def _migration_base_schema(cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -53,9 +56,127 @@ def init_user_database():
             FOREIGN KEY (child_id) REFERENCES child_profiles(id) ON DELETE CASCADE
         )
     """)
-    
-    conn.commit()
-    conn.close()
+
+def _migration_email_outbox(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            child_id INTEGER NOT NULL,
+            recipient_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            content TEXT NOT NULL,
+            status TEXT DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claim_token TEXT,
+            claimed_at REAL,
+            last_error TEXT,
+            sent_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+        ON email_outbox(status, next_attempt_at)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_sent_at ON email_outbox(sent_at)")
+
+def _migration_access_path_indexes(cursor):
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_email_lower
+        ON users(LOWER(email))
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_child_profiles_user_name
+        ON child_profiles(user_id, name)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emails_user_sent
+        ON emails(user_id, sent_at)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_emails_child_sent
+        ON emails(child_id, sent_at)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_emails_sent_at ON emails(sent_at)")
+
+def _migration_cache_generations(cursor):
+    entity_cache.create_generation_table(cursor)
+    entity_cache.create_generation_triggers(cursor, "child_profiles", "child", "id")
+    entity_cache.create_generation_triggers(cursor, "child_profiles", "children", "user_id")
+
+def _migration_roster_imports(cursor):
+    # One row per roster import; the chunk_* columns describe the last
+    # committed chunk so a torn commit can be rolled back on resume
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS roster_imports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            source_name TEXT NOT NULL,
+            source_size INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            rows_invalid INTEGER NOT NULL DEFAULT 0,
+            children_created INTEGER NOT NULL DEFAULT 0,
+            vaccinations_created INTEGER NOT NULL DEFAULT 0,
+            chunk_start_row INTEGER,
+            chunk_rows_invalid INTEGER,
+            chunk_first_child_id INTEGER,
+            chunk_last_child_id INTEGER,
+            chunk_vaccinations INTEGER,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_roster_imports_source
+        ON roster_imports(user_id, source_name, status)
+    """)
+
+def _compress_text(text: Optional[str]) -> Optional[bytes]:
+    return zlib.compress(text.encode("utf-8")) if text else None
+
+def _migration_email_log_storage(cursor):
+    # The log keeps a template id and its parameters, or a zlib-compressed
+    # body for free-form mail, instead of the rendered HTML; content is ''
+    # in rows written from now on
+    for table in ("emails", "email_outbox"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN template TEXT")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN params TEXT")
+    cursor.execute("ALTER TABLE emails ADD COLUMN body BLOB")
+    cursor.connection.create_function("zlib_compress", 1, _compress_text, deterministic=True)
+    cursor.execute("UPDATE emails SET body = zlib_compress(content), content = '' WHERE content != ''")
+
+# Ordered schema migrations; the position in the list is the PRAGMA user_version
+# the database has once the migration is applied. Only append to this list.
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_email_outbox,
+    _migration_access_path_indexes,
+    _migration_cache_generations,
+    _migration_roster_imports,
+    _migration_email_log_storage,
+]
+
+# Per-request queries that must be served from an index (checked by migrations.py
+# and tests/test_query_plans.py). Built from the statements the functions run.
+def hot_queries() -> List[tuple]:
+    return [
+        ("get_user_by_email", _USER_BY_EMAIL_SQL, ('a@example.com',)),
+        ("get_child", _CHILD_SQL, (1,)),
+        ("get_all_children", _CHILDREN_OF_USER_SQL, (1,)),
+        ("get_sent_emails by user and child", _SENT_EMAILS_SQL[True, True], (1, 1)),
+        ("get_sent_emails by user", _SENT_EMAILS_SQL[True, False], (1,)),
+        ("get_sent_emails by child", _SENT_EMAILS_SQL[False, True], (1,)),
+        ("find_child", _FIND_CHILD_SQL, (1, 'Asha', '2024-01-01')),
+        ("start_roster_import", _RUNNING_ROSTER_IMPORTS_SQL, (1, 'roster.csv')),
+    ]
+
+def init_user_database():
+    conn = get_user_connection()
+    migrations.run_migrations(conn, MIGRATIONS)
+    entity_cache.register_source("user_database", get_user_connection, USER_DATABASE_PATH)
 
 def register_user(name: str, email: str, password: str) -> bool:
     conn = get_user_connection()
@@ -66,18 +187,21 @@ def register_user(name: str, email: str, password: str) -> bool:
             VALUES (?, ?, ?)
         """, (name, email, password))
         conn.commit()
-        conn.close()
         return True
     except sqlite3.IntegrityError:
-        conn.close()
+        conn.rollback()
         return False
+    except Exception:
+        conn.rollback()
+        raise
+
+_USER_BY_EMAIL_SQL = "SELECT * FROM users WHERE LOWER(email) = LOWER(?)"
 
 def get_user_by_email(email: str) -> Optional[Dict]:
     conn = get_user_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE LOWER(email) = LOWER(?)", (email,))
+    cursor.execute(_USER_BY_EMAIL_SQL, (email,))
     row = cursor.fetchone()
-    conn.close()
     return dict(row) if row else None
 
 def authenticate_user(email: str, password: str) -> Optional[Dict]:
@@ -91,7 +215,6 @@ def get_all_users() -> list:
     cursor = conn.cursor()
     cursor.execute("SELECT id, name, email, created_at FROM users ORDER BY created_at DESC")
     rows = cursor.fetchall()
-    conn.close()
     return [dict(row) for row in rows]
 
 def add_child(name: str, date_of_birth: str, country_guideline: str, user_id: int,
@@ -99,32 +222,58 @@ def add_child(name: str, date_of_birth: str, country_guideline: str, user_id: in
               allergies: Optional[str] = None) -> int:
     conn = get_user_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO child_profiles (user_id, name, date_of_birth, country_guideline, gender, blood_group, allergies)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (user_id, name, date_of_birth, country_guideline, gender, blood_group, allergies))
-    child_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("""
+            INSERT INTO child_profiles (user_id, name, date_of_birth, country_guideline, gender, blood_group, allergies)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, name, date_of_birth, country_guideline, gender, blood_group, allergies))
+        child_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _invalidate_child_lists(user_id)
     return child_id
 
+def _invalidate_child_lists(user_id: Optional[int]):
+    entity_cache.invalidate("children", user_id)
+    entity_cache.invalidate("children", None)
+
 def get_child(child_id: int) -> Optional[Dict]:
+    return entity_cache.cached(("child", child_id), None, lambda: _load_child(child_id))
+
+_CHILD_SQL = "SELECT * FROM child_profiles WHERE id = ?"
+
+def _load_child(child_id: int) -> Optional[Dict]:
     conn = get_user_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM child_profiles WHERE id = ?", (child_id,))
+    cursor.execute(_CHILD_SQL, (child_id,))
     row = cursor.fetchone()
-    conn.close()
+    return dict(row) if row else None
+
+_FIND_CHILD_SQL = """
+    SELECT * FROM child_profiles WHERE user_id = ? AND name = ? AND date_of_birth = ? ORDER BY id LIMIT 1
+"""
+
+def find_child(user_id: int, name: str, date_of_birth: str) -> Optional[Dict]:
+    """A child of the user with exactly this name and date of birth."""
+    conn = get_user_connection()
+    row = conn.execute(_FIND_CHILD_SQL, (user_id, name, date_of_birth)).fetchone()
     return dict(row) if row else None
 
 def get_all_children(user_id: Optional[int] = None) -> List[Dict]:
+    return entity_cache.cached(("children", user_id or None), None, lambda: _load_all_children(user_id))
+
+_CHILDREN_OF_USER_SQL = "SELECT * FROM child_profiles WHERE user_id = ? ORDER BY name"
+
+def _load_all_children(user_id: Optional[int]) -> List[Dict]:
     conn = get_user_connection()
     cursor = conn.cursor()
     if user_id:
-        cursor.execute("SELECT * FROM child_profiles WHERE user_id = ? ORDER BY name", (user_id,))
+        cursor.execute(_CHILDREN_OF_USER_SQL, (user_id,))
     else:
         cursor.execute("SELECT * FROM child_profiles ORDER BY name")
     rows = cursor.fetchall()
-    conn.close()
     return [dict(row) for row in rows]
 
 def update_child(child_id: int, **kwargs) -> bool:
@@ -139,75 +288,357 @@ def update_child(child_id: int, **kwargs) -> bool:
     if fields:
         fields.append("updated_at = CURRENT_TIMESTAMP")
         values.append(child_id)
-        cursor.execute(f"UPDATE child_profiles SET {', '.join(fields)} WHERE id = ?", values)
-        conn.commit()
-    conn.close()
+        try:
+            cursor.execute(f"UPDATE child_profiles SET {', '.join(fields)} WHERE id = ?", values)
+            row = cursor.execute("SELECT user_id FROM child_profiles WHERE id = ?", (child_id,)).fetchone()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        entity_cache.invalidate("child", child_id)
+        _invalidate_child_lists(row['user_id'] if row else None)
     return True
 
 def delete_child(child_id: int) -> bool:
     conn = get_user_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM child_profiles WHERE id = ?", (child_id,))
-    conn.commit()
-    conn.close()
+    try:
+        row = cursor.execute("SELECT user_id FROM child_profiles WHERE id = ?", (child_id,)).fetchone()
+        cursor.execute("DELETE FROM child_profiles WHERE id = ?", (child_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    entity_cache.invalidate("child", child_id)
+    _invalidate_child_lists(row['user_id'] if row else None)
     return True
 
-def log_email(user_id: int, child_id: int, recipient_email: str, subject: str, content: str, status: str = 'sent') -> int:
-    """Log a sent email to the database."""
+_RUNNING_ROSTER_IMPORTS_SQL = """
+    SELECT * FROM roster_imports
+    WHERE user_id = ? AND source_name = ? AND status = 'running'
+    ORDER BY id DESC
+"""
+
+def start_roster_import(user_id: int, source_name: str, source_size: Optional[int] = None,
+                        restart: bool = False) -> Dict:
+    """The unfinished import of this source to resume, or a new one.
+    
+    A source is the same when user, file name and size match. With
+    restart=True unfinished imports of it are abandoned and a new one starts.
+    """
     conn = get_user_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO emails (user_id, child_id, recipient_email, subject, content, status)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (user_id, child_id, recipient_email, subject, content, status))
-    email_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    cursor.execute(_RUNNING_ROSTER_IMPORTS_SQL, (user_id, source_name))
+    running = [dict(row) for row in cursor.fetchall() if row['source_size'] == source_size]
+    if running and not restart:
+        return running[0]
+    
+    try:
+        for job in running:
+            cursor.execute("""
+                UPDATE roster_imports SET status = 'abandoned', updated_at = CURRENT_TIMESTAMP WHERE id = ?
+            """, (job['id'],))
+        cursor.execute("""
+            INSERT INTO roster_imports (user_id, source_name, source_size) VALUES (?, ?, ?)
+        """, (user_id, source_name, source_size))
+        import_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return get_roster_import(import_id)
+
+def get_roster_import(import_id: int) -> Optional[Dict]:
+    conn = get_user_connection()
+    row = conn.execute("SELECT * FROM roster_imports WHERE id = ?", (import_id,)).fetchone()
+    return dict(row) if row else None
+
+def finish_roster_import(import_id: int, status: str = 'completed') -> bool:
+    conn = get_user_connection()
+    try:
+        conn.execute("""
+            UPDATE roster_imports SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+        """, (status, import_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+# Columns of a logged email as returned by get_sent_emails and exported
+EMAIL_FIELDS = ("id", "user_id", "child_id", "recipient_email", "subject", "content",
+                "status", "sent_at", "template")
+
+def _email_log_storage(content: str, template: Optional[str], params: Optional[str]) -> tuple:
+    """(template, params, body) stored for an email: the template reference, or the compressed content."""
+    if template:
+        return template, params, None
+    return None, None, _compress_text(content) or b""
+
+def log_email(user_id: int, child_id: int, recipient_email: str, subject: str, content: str,
+              status: str = 'sent', template: Optional[str] = None, params: Optional[Dict] = None) -> int:
+    """Log a sent email to the database.
+    
+    Emails rendered from an email_templates template are stored as its id
+    and parameters, others as zlib-compressed content.
+    """
+    conn = get_user_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO emails (user_id, child_id, recipient_email, subject, content, status, template, params, body)
+            VALUES (?, ?, ?, ?, '', ?, ?, ?, ?)
+        """, (user_id, child_id, recipient_email, subject, status,
+              *_email_log_storage(content, template, email_templates.encode_params(params) if template else None)))
+        email_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     return email_id
 
-def get_sent_emails(user_id: int = None, child_id: int = None) -> List[Dict]:
-    """Retrieve sent emails, optionally filtered by user or child."""
+def email_content(email: Dict) -> str:
+    """The HTML of a logged email row: rendered from its template, decompressed, or as stored by older versions."""
+    if email.get('template'):
+        return email_templates.render(email['template'], json.loads(email['params'] or '{}'))[1]
+    if email.get('body') is not None:
+        return zlib.decompress(email['body']).decode("utf-8")
+    return email.get('content') or ''
+
+def logged_email(row, with_content: bool = True) -> Dict:
+    """An emails row as EMAIL_FIELDS, with the content rendered (or None without with_content)."""
+    email = dict(row)
+    record = {field: email.get(field) for field in EMAIL_FIELDS}
+    record['content'] = email_content(email) if with_content else None
+    return record
+
+# (filter by user, filter by child) -> query
+_SENT_EMAILS_SQL = {
+    (True, True): "SELECT * FROM emails WHERE user_id = ? AND child_id = ? ORDER BY sent_at DESC",
+    (True, False): "SELECT * FROM emails WHERE user_id = ? ORDER BY sent_at DESC",
+    (False, True): "SELECT * FROM emails WHERE child_id = ? ORDER BY sent_at DESC",
+    (False, False): "SELECT * FROM emails ORDER BY sent_at DESC",
+}
+
+def get_sent_emails(user_id: int = None, child_id: int = None, with_content: bool = True) -> List[Dict]:
+    """Retrieve sent emails, optionally filtered by user or child.
+    
+    Content is rendered for each email; pass with_content=False to list
+    emails without rendering them.
+    """
     conn = get_user_connection()
     cursor = conn.cursor()
     
-    if user_id and child_id:
-        cursor.execute("SELECT * FROM emails WHERE user_id = ? AND child_id = ? ORDER BY sent_at DESC", (user_id, child_id))
-    elif user_id:
-        cursor.execute("SELECT * FROM emails WHERE user_id = ? ORDER BY sent_at DESC", (user_id,))
-    elif child_id:
-        cursor.execute("SELECT * FROM emails WHERE child_id = ? ORDER BY sent_at DESC", (child_id,))
-    else:
-        cursor.execute("SELECT * FROM emails ORDER BY sent_at DESC")
+    params = tuple(value for value in (user_id, child_id) if value)
+    cursor.execute(_SENT_EMAILS_SQL[bool(user_id), bool(child_id)], params)
     
     rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return [logged_email(row, with_content) for row in rows]
 
-def delete_user_account(user_id: int) -> bool:
-    import database as db
+def enqueue_email(user_id: int, child_id: int, recipient_email: str, subject: str, content: str,
+                  template: Optional[str] = None, params: Optional[Dict] = None) -> int:
+    """Queue an email in the outbox for background delivery (template and params as for log_email)."""
     conn = get_user_connection()
     cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO email_outbox (user_id, child_id, recipient_email, subject, content,
+                                      template, params, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, child_id, recipient_email, subject, content,
+              template, email_templates.encode_params(params) if template else None, time.time()))
+        outbox_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return outbox_id
+
+def claim_outbox_emails(claim_token: str, limit: int, lease_seconds: float,
+                        max_attempts: Optional[int] = None) -> List[Dict]:
+    """Claim up to `limit` deliverable outbox rows for one worker.
     
+    Rows whose previous claim has outlived its lease (a crashed worker) are
+    claimed again, which gives at-least-once delivery. Those that already
+    used `max_attempts` attempts are dead-lettered instead.
+    """
+    now = time.time()
+    conn = get_user_connection()
+    cursor = conn.cursor()
     try:
-        children = get_all_children(user_id)
+        if max_attempts is not None:
+            cursor.execute("""
+                SELECT id FROM email_outbox
+                WHERE status = 'sending' AND claimed_at < ? AND attempts >= ?
+            """, (now - lease_seconds, max_attempts))
+            for row in cursor.fetchall():
+                cursor.execute("""
+                    UPDATE email_outbox
+                    SET status = 'dead', last_error = 'claim lease expired', claim_token = NULL
+                    WHERE id = ?
+                """, (row['id'],))
+                _log_outbox_email(cursor, row['id'], 'failed')
         
-        for child in children:
-            db.delete_all_vaccinations(child['id'])
-            db.delete_health_event(child['id']) if db.get_health_events(child['id']) else None
-            reminder_settings = db.get_reminder_settings(child['id'])
-            if reminder_settings:
-                cursor.execute("DELETE FROM reminder_settings WHERE child_id = ?", (child['id'],))
-            cursor.execute("DELETE FROM sent_reminders WHERE vaccination_id IN (SELECT id FROM vaccinations WHERE child_id = ?)", (child['id'],))
-        
-        cursor.execute("DELETE FROM emails WHERE user_id = ?", (user_id,))
-        cursor.execute("DELETE FROM child_profiles WHERE user_id = ?", (user_id,))
-        cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        cursor.execute("""
+            UPDATE email_outbox
+            SET status = 'sending', claim_token = ?, claimed_at = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE (status = 'queued' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_at < ?)
+                ORDER BY next_attempt_at
+                LIMIT ?
+            )
+        """, (claim_token, now, now, now - lease_seconds, limit))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    cursor.execute("""
+        SELECT * FROM email_outbox WHERE claim_token = ? AND status = 'sending' ORDER BY id
+    """, (claim_token,))
+    rows = cursor.fetchall()
+    return [dict(row) for row in rows]
+
+def _log_outbox_email(cursor, outbox_id: int, status: str):
+    row = cursor.execute("""
+        SELECT user_id, child_id, recipient_email, subject, content, template, params
+        FROM email_outbox WHERE id = ?
+    """, (outbox_id,)).fetchone()
+    cursor.execute("""
+        INSERT INTO emails (user_id, child_id, recipient_email, subject, content, status, template, params, body)
+        VALUES (?, ?, ?, ?, '', ?, ?, ?, ?)
+    """, (row['user_id'], row['child_id'], row['recipient_email'], row['subject'], status,
+          *_email_log_storage(row['content'], row['template'], row['params'])))
+
+def complete_outbox_email(outbox_id: int, claim_token: str) -> bool:
+    """Mark a claimed outbox row as sent and log it to the emails table in one transaction."""
+    conn = get_user_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE email_outbox SET status = 'sent', sent_at = ?, claim_token = NULL
+            WHERE id = ? AND claim_token = ?
+        """, (time.time(), outbox_id, claim_token))
+        if cursor.rowcount:
+            _log_outbox_email(cursor, outbox_id, 'sent')
+            cursor.execute("UPDATE email_outbox SET content = '' WHERE id = ?", (outbox_id,))
         conn.commit()
         return True
-    except Exception as e:
-        print(f"Error deleting user account: {e}")
-        return False
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
+
+def fail_outbox_email(outbox_id: int, claim_token: str, error: str,
+                      retry_delay: Optional[float] = None) -> bool:
+    """Schedule a retry after `retry_delay` seconds, or dead-letter the row when it is None.
+    
+    A dead reminder digest keeps its sent_reminders claims on purpose: the
+    next sweep would otherwise queue it again for the same undeliverable
+    address. It stays listed as failed in the email log instead.
+    """
+    conn = get_user_connection()
+    cursor = conn.cursor()
+    try:
+        if retry_delay is not None:
+            cursor.execute("""
+                UPDATE email_outbox
+                SET status = 'queued', next_attempt_at = ?, last_error = ?, claim_token = NULL
+                WHERE id = ? AND claim_token = ?
+            """, (time.time() + retry_delay, error, outbox_id, claim_token))
+        else:
+            cursor.execute("""
+                UPDATE email_outbox SET status = 'dead', last_error = ?, claim_token = NULL
+                WHERE id = ? AND claim_token = ?
+            """, (error, outbox_id, claim_token))
+            if cursor.rowcount:
+                _log_outbox_email(cursor, outbox_id, 'failed')
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+def get_outbox_stats(window_seconds: float = 300) -> Dict:
+    """Queue depth per status plus the drain rate (emails/minute) over the last window."""
+    now = time.time()
+    conn = get_user_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT status, COUNT(*) AS count FROM email_outbox
+        WHERE status IN ('queued', 'sending', 'dead') GROUP BY status
+    """)
+    stats = {'queued': 0, 'sending': 0, 'dead': 0}
+    for row in cursor.fetchall():
+        stats[row['status']] = row['count']
+    cursor.execute("""
+        SELECT COUNT(*) FROM email_outbox WHERE sent_at >= ?
+    """, (now - window_seconds,))
+    stats['sent_per_minute'] = round(cursor.fetchone()[0] * 60 / window_seconds, 2)
+    return stats
+
+def get_email_archive_range(cutoff: str) -> Optional[Dict]:
+    """First and last id and number of the emails sent before `cutoff` (UTC 'YYYY-MM-DD HH:MM:SS')."""
+    conn = get_user_connection()
+    row = conn.execute("""
+        SELECT MIN(id) AS first_id, MAX(id) AS last_id, COUNT(*) AS count FROM emails WHERE sent_at < ?
+    """, (cutoff,)).fetchone()
+    return dict(row) if row['count'] else None
+
+def iter_emails_to_archive(cutoff: str, last_id: int, batch_size: int = 1000):
+    """Emails sent before `cutoff` with ids up to `last_id`, in id order, read in batches."""
+    conn = get_user_connection()
+    after_id = 0
+    while True:
+        rows = conn.execute("""
+            SELECT * FROM emails WHERE id > ? AND id <= ? AND sent_at < ? ORDER BY id LIMIT ?
+        """, (after_id, last_id, cutoff, batch_size)).fetchall()
+        if not rows:
+            return
+        yield from rows
+        after_id = rows[-1]['id']
+
+def delete_archived_emails(cutoff: str, last_id: int, outbox_cutoff: float) -> Dict:
+    """Delete archived emails and finished outbox rows older than the cutoffs in one transaction."""
+    conn = get_user_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM emails WHERE id <= ? AND sent_at < ?", (last_id, cutoff))
+        emails = cursor.rowcount
+        # Sent rows keep no content; dead ones were logged as failed emails
+        cursor.execute("""
+            DELETE FROM email_outbox
+            WHERE (status = 'sent' AND sent_at < ?) OR (status = 'dead' AND claimed_at < ?)
+        """, (outbox_cutoff, outbox_cutoff))
+        outbox = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"emails": emails, "outbox": outbox}
+
+def reclaim_free_pages() -> Dict:
+    """Return free pages of user_database.db to the file system.
+    
+    Runs an incremental vacuum, or once, on files created before
+    incremental auto-vacuum was enabled, a full VACUUM that switches them.
+    """
+    conn = get_user_connection()
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    full_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+    if full_vacuum:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        # execute() steps this pragma once, which frees a single page;
+        # executescript() runs it to completion
+        conn.executescript("PRAGMA incremental_vacuum")
+    # Copy the freed file size back from the WAL into the database file
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return {"free_pages": free_pages, "full_vacuum": full_vacuum}
+
+def delete_user_account(user_id: int) -> bool:
+    import database as db
+    return db.delete_user_account(user_id)
 
 init_user_database()
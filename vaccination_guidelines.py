@@ -1,26 +1,88 @@
+from bisect import bisect_right
 from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
-from typing import List, Dict
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Optional, Sequence, Tuple, Union
 import json
 import os
+import threading
+import numpy as np
+from vaccination_records import OPEN_STATUSES, SortedVaccinations, VaccinationRecord, status_boundaries
 
-def load_vaccine_data(guideline: str) -> List[Dict]:
-    """Load vaccine data from JSON files."""
-    if guideline == "India (UIP)":
-        json_path = "data/vaccines_uip_india.json"
-    elif guideline == "WHO":
-        json_path = "data/vaccines_who.json"
-    else:
-        json_path = "data/vaccines_who.json"
+GUIDELINE_FILES = {
+    "India (UIP)": "data/vaccines_uip_india.json",
+    "WHO": "data/vaccines_who.json",
+}
+DEFAULT_GUIDELINE = "WHO"
+
+class GuidelineCatalog:
+    """Read-only, indexed contents of one guideline file.
+    
+    vaccines keeps the file order; by_id and by_age_weeks index it, and
+    age_groups holds (age_label, age_weeks, vaccines) sorted by age.
+    """
+    
+    def __init__(self, guideline: str, data: Dict):
+        self.guideline = guideline
+        self.name = data.get('name', guideline)
+        self.source = data.get('source', 'Unknown')
+        self.description = data.get('description', '')
+        self.vaccines: Tuple[Mapping, ...] = tuple(
+            MappingProxyType(dict(vaccine)) for vaccine in data.get('vaccines', [])
+        )
+        self.by_id: Mapping[str, Mapping] = MappingProxyType({v['id']: v for v in self.vaccines})
+        
+        by_age_weeks: Dict[int, List[Mapping]] = {}
+        groups: Dict[str, Tuple[int, List[Mapping]]] = {}
+        for vaccine in self.vaccines:
+            by_age_weeks.setdefault(vaccine['age_weeks'], []).append(vaccine)
+            groups.setdefault(vaccine['age_label'], (vaccine['age_weeks'], []))[1].append(vaccine)
+        self.by_age_weeks: Mapping[int, Tuple[Mapping, ...]] = MappingProxyType(
+            {weeks: tuple(vaccines) for weeks, vaccines in sorted(by_age_weeks.items())}
+        )
+        self.age_groups: Tuple[Tuple[str, int, Tuple[Mapping, ...]], ...] = tuple(
+            (label, weeks, tuple(vaccines))
+            for label, (weeks, vaccines) in sorted(groups.items(), key=lambda item: item[1][0])
+        )
+
+_catalogs: Dict[str, Tuple[int, GuidelineCatalog]] = {}
+_catalogs_lock = threading.Lock()
+
+def get_catalog(guideline: str) -> Optional[GuidelineCatalog]:
+    """The process-wide catalog for a guideline, reloaded only when its file changes.
     
+    Unknown guidelines fall back to WHO; returns None when the file is missing.
+    """
+    if guideline not in GUIDELINE_FILES:
+        guideline = DEFAULT_GUIDELINE
+    json_path = GUIDELINE_FILES[guideline]
     try:
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-            return data.get('vaccines', [])
+        mtime = os.stat(json_path).st_mtime_ns
     except FileNotFoundError:
-        return []
+        return None
+    
+    cached = _catalogs.get(json_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    with _catalogs_lock:
+        cached = _catalogs.get(json_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(json_path, 'r') as f:
+                catalog = GuidelineCatalog(guideline, json.load(f))
+        except FileNotFoundError:
+            return None
+        _catalogs[json_path] = (mtime, catalog)
+        return catalog
+
+def load_vaccine_data(guideline: str) -> Sequence[Mapping]:
+    """Vaccines of a guideline, from the shared catalog."""
+    catalog = get_catalog(guideline)
+    return catalog.vaccines if catalog else ()
 
-def get_schedule_for_guideline(guideline: str) -> List[Dict]:
+def get_schedule_for_guideline(guideline: str) -> Sequence[Mapping]:
     """Get vaccination schedule for the specified guideline."""
     return load_vaccine_data(guideline)
 
@@ -49,44 +111,67 @@ def generate_vaccination_schedule(dob: date, guideline: str) -> List[Dict]:
     
     return vaccination_schedule
 
-def get_vaccine_status(due_date: date, administered_date: date = None) -> str:
-    """Determine the status of a vaccine based on dates."""
-    today = date.today()
+def generate_cohort_schedules(dobs: Sequence, guideline: str) -> Dict[str, np.ndarray]:
+    """Generate the schedules of many children at once as parallel columns.
     
+    `dobs` are dates or ISO date strings. Returns child_index (position in
+    `dobs`), vaccine_id, vaccine_name and due_date (datetime64[D]) arrays with
+    one entry per dose, ordered by child and then by the guideline's order.
+    """
+    schedule = get_schedule_for_guideline(guideline)
+    dob_days = np.asarray(dobs, dtype='datetime64[D]')
+    offsets = np.array([vaccine["age_weeks"] * 7 for vaccine in schedule], dtype='timedelta64[D]')
+    vaccine_index = np.tile(np.arange(len(schedule)), len(dob_days))
+    
+    return {
+        "child_index": np.repeat(np.arange(len(dob_days)), len(schedule)),
+        "vaccine_id": np.array([vaccine["id"] for vaccine in schedule], dtype=object)[vaccine_index],
+        "vaccine_name": np.array([vaccine["name"] for vaccine in schedule], dtype=object)[vaccine_index],
+        "due_date": (dob_days[:, None] + offsets[None, :]).ravel(),
+    }
+
+def parse_received_vaccines(text: str) -> List[str]:
+    """Split a comma-separated list of received vaccine names into lowercase names."""
+    return [v.strip().lower() for v in (text or "").split(',') if v.strip()]
+
+def is_vaccine_received(vacc: Dict, received_list: List[str]) -> bool:
+    """Whether a schedule entry matches any of the (lowercase) received vaccine names."""
+    name = vacc['vaccine_name'].lower()
+    code = vacc['vaccine_code'].lower()
+    return any(recv in name or name in recv or recv in code for recv in received_list)
+
+def apply_received_vaccines(schedule: List[Dict], received_list: List[str],
+                            administered_date: date) -> List[Dict]:
+    """Mark the schedule entries that were already received as completed."""
+    marked = []
+    for vacc in schedule:
+        if received_list and is_vaccine_received(vacc, received_list):
+            vacc = {
+                **vacc,
+                "status": "completed",
+                "administered_date": administered_date,
+                "status_notes": "Marked as already received during profile creation",
+            }
+        marked.append(vacc)
+    return marked
+
+def get_vaccine_status(due_date: date, administered_date: date = None,
+                       as_of: Optional[date] = None) -> str:
+    """Determine the status of a vaccine based on dates (as of today by default)."""
     if administered_date:
         return "completed"
-    elif due_date < today:
-        return "overdue"
-    elif due_date <= today + timedelta(days=30):
-        return "upcoming"
-    else:
-        return "pending"
+    return OPEN_STATUSES[bisect_right(status_boundaries(as_of or date.today()), due_date)]
 
-def categorize_vaccinations(vaccinations: List[Dict]) -> Dict[str, List[Dict]]:
-    """Categorize vaccinations into different status groups."""
-    today = date.today()
-    categories = {
-        "overdue": [],
-        "upcoming": [],
-        "completed": [],
-        "pending": []
-    }
-    
-    for vacc in vaccinations:
-        due_date = vacc.get('due_date')
-        if isinstance(due_date, str):
-            due_date = date.fromisoformat(due_date)
-        
-        if vacc.get('status') == 'completed':
-            categories["completed"].append(vacc)
-        elif due_date < today:
-            categories["overdue"].append(vacc)
-        elif due_date <= today + timedelta(days=30):
-            categories["upcoming"].append(vacc)
-        else:
-            categories["pending"].append(vacc)
+def categorize_vaccinations(vaccinations: Union[List[VaccinationRecord], SortedVaccinations],
+                            as_of: Optional[date] = None) -> Dict[str, List[VaccinationRecord]]:
+    """Categorize vaccinations into status groups as of a date (default today).
     
-    return categories
+    Pass db.get_sorted_vaccinations(child_id) to reuse the cached due-date
+    index instead of sorting the list again.
+    """
+    if not isinstance(vaccinations, SortedVaccinations):
+        vaccinations = SortedVaccinations(vaccinations)
+    return {status: list(group) for status, group in vaccinations.classify(as_of).items()}
 
 def get_age_string(dob: date) -> str:
     """Get a human-readable age string from a date of birth."""
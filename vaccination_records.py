@@ -0,0 +1,169 @@
+"""Compact, read-only vaccination rows as returned by database.get_vaccinations.
+
+VaccinationRecord stores the vaccinations columns in __slots__ with
+due_date/administered_date parsed to date objects once, when the row is
+read, and status as a VaccinationStatus. It is a Mapping, so existing
+dict-style code (vacc['due_date'], vacc.get('notes'), dict(vacc),
+pd.DataFrame(records)) keeps working.
+
+SortedVaccinations holds a child's open doses sorted by due date and
+splits them into overdue/upcoming/pending for any as-of date with two
+binary searches.
+"""
+from bisect import bisect_left
+from collections.abc import Mapping
+from datetime import date, timedelta
+from enum import Enum
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+# Days ahead in which an open dose counts as upcoming
+UPCOMING_DAYS = 30
+# Status of an open dose by where its due date falls relative to status_boundaries()
+OPEN_STATUSES = ("overdue", "upcoming", "pending")
+
+
+class VaccinationStatus(str, Enum):
+    """Stored vaccination status; compares equal to its string value."""
+    PENDING = "pending"
+    COMPLETED = "completed"
+
+    def __str__(self):
+        return self.value
+
+    def __format__(self, format_spec):
+        return format(self.value, format_spec)
+
+    @classmethod
+    def parse(cls, value) -> Union["VaccinationStatus", str, None]:
+        """The enum member for a stored value; unknown values are kept as they are."""
+        try:
+            return cls(value)
+        except ValueError:
+            return value
+
+
+def _parse_date(value) -> Optional[Union[date, str]]:
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class VaccinationRecord(Mapping):
+    """One vaccinations row with dates parsed and a typed status."""
+
+    FIELDS = ("id", "child_id", "vaccine_name", "vaccine_code", "due_date", "administered_date",
+              "status", "notes", "administered_by", "batch_number", "created_at", "updated_at")
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, values.get(field))
+
+    @classmethod
+    def from_row(cls, row) -> "VaccinationRecord":
+        """Build a record from a sqlite3.Row (or dict) of the vaccinations table."""
+        values = dict(row)
+        values["due_date"] = _parse_date(values.get("due_date"))
+        values["administered_date"] = _parse_date(values.get("administered_date"))
+        values["status"] = VaccinationStatus.parse(values.get("status"))
+        return cls(**values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("VaccinationRecord is read-only")
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"VaccinationRecord({self.id}, {self.vaccine_name!r}, due {self.due_date}, {self.status})"
+
+    def to_dict(self) -> Dict:
+        """Plain dict with ISO date strings, e.g. for JSON."""
+        values = dict(self)
+        for field in ("due_date", "administered_date"):
+            if isinstance(values[field], date):
+                values[field] = values[field].isoformat()
+        if isinstance(values["status"], VaccinationStatus):
+            values["status"] = values["status"].value
+        return values
+
+
+def status_boundaries(as_of: date) -> Tuple[date, date]:
+    """Due dates before the first are overdue, before the second upcoming, the rest pending."""
+    return as_of, as_of + timedelta(days=UPCOMING_DAYS + 1)
+
+
+class SortedVaccinations:
+    """A child's records split into completed and open doses, the open ones sorted by due date.
+
+    classify() memoizes its latest result, so repeated calls for the same
+    as-of date (by default today, i.e. until the next midnight) are free.
+    Built once per cache fill and shared, so it is treated as read-only.
+    """
+
+    __slots__ = ("completed", "open", "undated", "_due_dates", "_last")
+
+    def __init__(self, vaccinations: Iterable[Mapping]):
+        completed, dated, undated = [], [], []
+        for vacc in vaccinations:
+            if vacc.get("status") == "completed":
+                completed.append(vacc)
+            elif isinstance(vacc.get("due_date"), date):
+                dated.append(vacc)
+            else:
+                undated.append(vacc)
+        # get_vaccinations already orders by due date, so this sort is a linear pass
+        dated.sort(key=lambda vacc: vacc["due_date"])
+        self.completed = tuple(completed)
+        self.open = tuple(dated)
+        # Open doses without a usable due date are listed as pending
+        self.undated = tuple(undated)
+        self._due_dates = [vacc["due_date"] for vacc in dated]
+        self._last = None
+
+    def __len__(self) -> int:
+        return len(self.completed) + len(self.open) + len(self.undated)
+
+    def _split(self, as_of: date) -> Tuple[int, int]:
+        overdue_before, upcoming_before = status_boundaries(as_of)
+        overdue_end = bisect_left(self._due_dates, overdue_before)
+        return overdue_end, bisect_left(self._due_dates, upcoming_before, overdue_end)
+
+    def counts(self, as_of: Optional[date] = None) -> Dict[str, int]:
+        """Number of doses per status, in O(log n)."""
+        overdue_end, upcoming_end = self._split(as_of or date.today())
+        return {
+            "overdue": overdue_end,
+            "upcoming": upcoming_end - overdue_end,
+            "completed": len(self.completed),
+            "pending": len(self.open) - upcoming_end + len(self.undated),
+        }
+
+    def classify(self, as_of: Optional[date] = None) -> Dict[str, Tuple]:
+        """Doses per status as of a date (default today), each group in due-date order."""
+        as_of = as_of or date.today()
+        last = self._last
+        if last is not None and last[0] == as_of:
+            return dict(last[1])
+        overdue_end, upcoming_end = self._split(as_of)
+        groups = {
+            "overdue": self.open[:overdue_end],
+            "upcoming": self.open[overdue_end:upcoming_end],
+            "completed": self.completed,
+            "pending": self.open[upcoming_end:] + self.undated,
+        }
+        self._last = (as_of, groups)
+        return dict(groups)